@@ -0,0 +1,79 @@
+"""
+Requests per second for a 1000-row employee listing, before and after the
+serialization fast path.
+
+    python -m benchmarks.bench_serialization [--rows 1000] [--requests 200]
+
+Both routes return the same in-memory documents so the database is taken out
+of the measurement: "response_model" is the old path (FastAPI validates every
+row into Employee, then serialises), "document_response" encodes the raw
+documents with orjson (utils/serialization.py).
+"""
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+from models.employee import Employee, EMPLOYEE_FIELD_PRESETS
+from utils.codec import utc_now, to_bson_date
+from utils.serialization import document_response
+from typing import List
+import argparse
+import asyncio
+import time
+import uuid
+
+def _docs(rows: int) -> List[dict]:
+    now = utc_now()
+    return [{
+        "id": str(uuid.uuid4()), "employee_code": f"E{i:05d}", "company_id": "bench",
+        "first_name": "Jane", "last_name": f"Doe {i}", "email": f"jane.doe{i}@example.com",
+        "phone": "+1 555 0100", "date_of_birth": to_bson_date("1990-04-12"), "gender": "female",
+        "nationality": "US", "address": "1 Main St", "city": "Springfield", "state": "IL",
+        "country": "US", "postal_code": "62701", "designation": "Engineer",
+        "department_id": str(uuid.uuid4()), "employment_type": "full_time", "employment_status": "active",
+        "date_of_joining": to_bson_date("2020-01-06"), "passport_number": "X1234567",
+        "passport_expiry": to_bson_date("2030-01-01"), "tax_id": "123-45-6789",
+        "emergency_contact_name": "John Doe", "emergency_contact_phone": "+1 555 0101",
+        "is_deleted": False, "created_at": now, "updated_at": now,
+    } for i in range(rows)]
+
+def build_app(docs: List[dict]) -> FastAPI:
+    app = FastAPI()
+    summary = EMPLOYEE_FIELD_PRESETS["summary"]
+
+    @app.get("/before", response_model=List[Employee])
+    async def before():
+        return docs
+
+    @app.get("/after", response_model=List[Employee])
+    async def after():
+        return document_response(Employee, docs)
+
+    @app.get("/after-summary", response_model=List[Employee])
+    async def after_summary():
+        return document_response(summary, docs)
+
+    return app
+
+async def _rps(client: AsyncClient, path: str, requests: int) -> tuple:
+    await client.get(path)  # warm up
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = await client.get(path)
+    elapsed = time.perf_counter() - start
+    return requests / elapsed, len(response.content)
+
+async def main(rows: int, requests: int):
+    app = build_app(_docs(rows))
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        print(f"{rows} rows, {requests} requests each")
+        for label, path in [("response_model (before)", "/before"),
+                            ("document_response (after)", "/after"),
+                            ("document_response, summary preset", "/after-summary")]:
+            rps, size = await _rps(client, path, requests)
+            print(f"{label:<36} {rps:8.1f} req/s   {size / 1024:8.1f} KiB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.requests))
@@ -0,0 +1,94 @@
+"""
+Compare mutation round trips against a live MongoDB.
+
+    python -m benchmarks.bench_write_paths [--iterations 2000]
+
+"write + re-read" is the pattern the handlers used before; "single round trip"
+is insert-and-return-in-memory / find_one_and_update(ReturnDocument.AFTER).
+Runs against a throwaway "<DB_NAME>_bench" database which is dropped afterwards.
+"""
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pathlib import Path
+from dotenv import load_dotenv
+from datetime import datetime, timezone
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import uuid
+
+def _summary(label: str, samples: list) -> str:
+    samples = sorted(samples)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    return f"{label:<40} mean {statistics.mean(samples):7.3f} ms   p50 {statistics.median(samples):7.3f} ms   p99 {p99:7.3f} ms"
+
+async def _timed(samples: list, coro):
+    start = time.perf_counter()
+    result = await coro
+    samples.append((time.perf_counter() - start) * 1000)
+    return result
+
+def _doc() -> dict:
+    now = datetime.now(timezone.utc).isoformat()
+    return {"id": str(uuid.uuid4()), "company_id": "bench", "status": "pending", "is_deleted": False,
+            "created_at": now, "updated_at": now}
+
+async def insert_then_read(coll, samples):
+    async def op():
+        doc = _doc()
+        await coll.insert_one(doc)
+        return await coll.find_one({"id": doc["id"]}, {"_id": 0})
+    await _timed(samples, op())
+
+async def insert_only(coll, samples):
+    async def op():
+        doc = _doc()
+        await coll.insert_one(doc)
+        return doc
+    await _timed(samples, op())
+
+async def update_then_read(coll, doc_id, samples):
+    async def op():
+        await coll.update_one({"id": doc_id, "is_deleted": False}, {"$set": {"updated_at": datetime.now(timezone.utc).isoformat()}})
+        return await coll.find_one({"id": doc_id}, {"_id": 0})
+    await _timed(samples, op())
+
+async def find_one_and_update(coll, doc_id, samples):
+    await _timed(samples, coll.find_one_and_update(
+        {"id": doc_id, "is_deleted": False},
+        {"$set": {"updated_at": datetime.now(timezone.utc).isoformat()}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    ))
+
+async def main(iterations: int):
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    db = client[os.environ["DB_NAME"] + "_bench"]
+    coll = db.bench_writes
+    await coll.create_index("id", unique=True)
+    try:
+        seed = _doc()
+        await coll.insert_one(seed)
+
+        results = {name: [] for name in ("insert + find_one", "insert (return in-memory doc)",
+                                         "update_one + find_one", "find_one_and_update(AFTER)")}
+        for _ in range(iterations):
+            await insert_then_read(coll, results["insert + find_one"])
+            await insert_only(coll, results["insert (return in-memory doc)"])
+            await update_then_read(coll, seed["id"], results["update_one + find_one"])
+            await find_one_and_update(coll, seed["id"], results["find_one_and_update(AFTER)"])
+
+        for name, samples in results.items():
+            print(_summary(name, samples))
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+if __name__ == "__main__":
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations))
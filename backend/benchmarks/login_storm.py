@@ -0,0 +1,77 @@
+"""
+Login-storm load test against a running API server.
+
+    python -m benchmarks.login_storm --base-url http://localhost:8000 \\
+        --email admin@nexushr.com --password password123 --logins 500 --concurrency 100
+
+A probe request (GET /api/health-check) is issued every --probe-interval
+seconds, first on an idle server and then while --logins concurrent logins
+are in flight. With password work off the event loop the probe p99 during
+the storm should stay close to the idle p99.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+
+def _percentile(samples: list, pct: float) -> float:
+    samples = sorted(samples)
+    return samples[max(0, int(len(samples) * pct) - 1)]
+
+def _report(label: str, samples: list):
+    print(f"{label:<22} n={len(samples):<5} p50 {statistics.median(samples):8.2f} ms   "
+          f"p99 {_percentile(samples, 0.99):8.2f} ms   max {max(samples):8.2f} ms")
+
+async def probe(client: httpx.AsyncClient, interval: float, stop: asyncio.Event) -> list:
+    samples = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/api/health-check")
+        samples.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+    return samples
+
+async def login_storm(client: httpx.AsyncClient, email: str, password: str, total: int, concurrency: int) -> dict:
+    limit = asyncio.Semaphore(concurrency)
+    statuses = {}
+
+    async def one():
+        async with limit:
+            response = await client.post("/api/auth/login", json={"email": email, "password": password})
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    await asyncio.gather(*(one() for _ in range(total)))
+    return statuses
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.concurrency + 10)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        stop = asyncio.Event()
+        idle_task = asyncio.create_task(probe(client, args.probe_interval, stop))
+        await asyncio.sleep(args.idle_seconds)
+        stop.set()
+        idle = await idle_task
+
+        stop = asyncio.Event()
+        storm_probe = asyncio.create_task(probe(client, args.probe_interval, stop))
+        start = time.perf_counter()
+        statuses = await login_storm(client, args.email, args.password, args.logins, args.concurrency)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        during = await storm_probe
+
+    _report("probe (idle)", idle)
+    _report("probe (login storm)", during)
+    print(f"{args.logins} logins in {elapsed:.2f}s ({args.logins / elapsed:.1f}/s), status codes: {statuses}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--logins", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--probe-interval", type=float, default=0.02)
+    parser.add_argument("--idle-seconds", type=float, default=3)
+    asyncio.run(main(parser.parse_args()))
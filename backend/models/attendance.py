@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional
+from typing import Optional, List, Union, Literal
+from typing_extensions import Annotated
 from datetime import datetime, date, time, timezone
 from enum import Enum
 
@@ -57,3 +58,75 @@ class ClockInRequest(BaseModel):
 
 class ClockOutRequest(BaseModel):
     attendance_id: str
+
+class AttendanceRollup(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    id: str
+    company_id: str
+    employee_id: str
+    year: int
+    month: int
+    records: int = 0
+    days_present: int = 0
+    half_days: int = 0
+    days_absent: int = 0
+    days_on_leave: int = 0
+    hours_worked: float = 0.0
+    overtime_hours: float = 0.0
+    updated_at: Optional[datetime] = None
+
+# --- BULK CLOCK EVENTS (badge readers / kiosk gateways) ---
+MAX_BULK_CLOCK_EVENTS = 5000
+
+class BulkClockInEvent(ClockInRequest):
+    type: Literal["clock_in"] = "clock_in"
+
+class BulkClockOutEvent(ClockOutRequest):
+    type: Literal["clock_out"] = "clock_out"
+
+BulkClockEvent = Annotated[Union[BulkClockInEvent, BulkClockOutEvent], Field(discriminator="type")]
+
+class BulkClockRequest(BaseModel):
+    events: List[BulkClockEvent] = Field(..., min_length=1, max_length=MAX_BULK_CLOCK_EVENTS)
+
+class BulkClockEventResult(BaseModel):
+    index: int
+    type: str
+    status: str  # clocked_in | clocked_out | already_clocked_in | already_clocked_out | not_found | forbidden | error
+    attendance_id: Optional[str] = None
+    employee_id: Optional[str] = None
+    detail: Optional[str] = None
+
+class BulkClockResponse(BaseModel):
+    processed: int
+    succeeded: int
+    failed: int
+    results: List[BulkClockEventResult]
+
+# --- ANALYTICS (utils/attendance_analytics.py) ---
+class AttendanceReportRow(BaseModel):
+    group_id: Optional[str] = None
+    name: Optional[str] = None
+    employees: int = 0
+    records: int = 0
+    hours_worked: float = 0.0
+    overtime_hours: float = 0.0
+    arrivals: int = 0
+    late_arrivals: int = 0
+    late_rate: float = 0.0
+    avg_late_minutes: float = 0.0
+    expected_days: float = 0.0
+    days_attended: float = 0.0
+    leave_days: float = 0.0
+    absent_days: float = 0.0
+    absenteeism_rate: float = 0.0
+
+class AttendanceReport(BaseModel):
+    company_id: str
+    start_date: date
+    end_date: date
+    group_by: Literal["employee", "department", "branch"]
+    overtime_threshold: float
+    totals: AttendanceReportRow
+    rows: List[AttendanceReportRow]
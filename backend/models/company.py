@@ -1,6 +1,10 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional, List
-from datetime import datetime, timezone
+from typing import Optional, List, Annotated
+from datetime import datetime, date, timezone
+
+# Day of the week as in date.weekday(): Monday = 0 ... Sunday = 6
+Weekday = Annotated[int, Field(ge=0, le=6)]
+DEFAULT_WORKING_DAYS = [0, 1, 2, 3, 4]
 
 # --- COMPANY MODELS ---
 class Company(BaseModel):
@@ -17,6 +21,7 @@ class Company(BaseModel):
     email: Optional[str] = None
     website: Optional[str] = None
     logo_url: Optional[str] = None
+    working_days: List[Weekday] = Field(default_factory=lambda: list(DEFAULT_WORKING_DAYS))
     is_active: bool = True
     is_deleted: bool = False
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -32,6 +37,7 @@ class CompanyCreate(BaseModel):
     phone: Optional[str] = None
     email: Optional[str] = None
     website: Optional[str] = None
+    working_days: List[Weekday] = Field(default_factory=lambda: list(DEFAULT_WORKING_DAYS), min_length=1)
 
 class CompanyUpdate(BaseModel):
     name: Optional[str] = None
@@ -42,8 +48,25 @@ class CompanyUpdate(BaseModel):
     phone: Optional[str] = None
     email: Optional[str] = None
     website: Optional[str] = None
+    working_days: Optional[List[Weekday]] = Field(None, min_length=1)
     is_active: Optional[bool] = None
 
+# --- HOLIDAY MODELS ---
+class Holiday(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    id: str
+    company_id: str
+    date: date
+    name: str
+    is_deleted: bool = False
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class HolidayCreate(BaseModel):
+    date: date
+    name: str
+
 # --- BRANCH MODELS ---
 class Branch(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -115,4 +138,13 @@ class TeamCreate(BaseModel):
     department_id: str
     name: str
     code: str
-    manager_id: Optional[str] = None
\ No newline at end of file
+    manager_id: Optional[str] = None
+
+# --- ORGANISATION STRUCTURE ---
+class OrgStructure(BaseModel):
+    company_id: str
+    # Content hash of the structure; also sent as the ETag
+    version: str
+    branches: List[Branch]
+    departments: List[Department]
+    teams: List[Team]
@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import date
+
+class DashboardSummary(BaseModel):
+    company_id: Optional[str] = None
+    date: date
+    total_employees: int = 0
+    active_employees: int = 0
+    today_attendance: int = 0
+    pending_leaves: int = 0
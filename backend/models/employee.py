@@ -71,6 +71,53 @@ class Employee(BaseModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class EmployeeSummary(BaseModel):
+    """Just enough to label an employee in lists and pickers."""
+    model_config = ConfigDict(extra="ignore")
+
+    id: str
+    employee_code: str
+    first_name: str
+    last_name: str
+    designation: Optional[str] = None
+    department_id: Optional[str] = None
+    employment_status: EmploymentStatus = EmploymentStatus.ACTIVE
+
+class EmployeeDirectoryEntry(EmployeeSummary):
+    """Contact card for directory views; no personal or legal data."""
+    # Already validated on write, so plain str avoids re-running email validation per row
+    email: str
+    phone: Optional[str] = None
+    profile_photo_url: Optional[str] = None
+    team_id: Optional[str] = None
+    branch_id: Optional[str] = None
+    manager_id: Optional[str] = None
+
+class EmployeeSearchResult(EmployeeDirectoryEntry):
+    employment_type: EmploymentType = EmploymentType.FULL_TIME
+    date_of_joining: Optional[date] = None
+    # Relevance; results are returned best first
+    score: float = 0
+
+class EmployeeNode(EmployeeSummary):
+    """An employee's place in the reporting hierarchy."""
+    manager_id: Optional[str] = None
+    # Levels below the top of the chart (0 = no manager)
+    manager_depth: int = 0
+
+class ReportsHeadcount(BaseModel):
+    employee_id: str
+    direct_reports: int = 0
+    total_reports: int = 0
+    # Reports per level below the employee (by_level[0] = direct reports); single-employee queries only
+    by_level: Optional[List[int]] = None
+
+# Named field sets accepted by GET /employees?fields=
+EMPLOYEE_FIELD_PRESETS = {
+    "summary": EmployeeSummary,
+    "directory": EmployeeDirectoryEntry,
+}
+
 class EmployeeCreate(BaseModel):
     employee_code: str
     company_id: str
@@ -117,3 +164,15 @@ class EmployeeUpdate(BaseModel):
     emergency_contact_name: Optional[str] = None
     emergency_contact_relationship: Optional[str] = None
     emergency_contact_phone: Optional[str] = None
+
+class EmployeeImportError(BaseModel):
+    row: int
+    employee_code: Optional[str] = None
+    errors: List[str]
+
+class EmployeeImportReport(BaseModel):
+    total_rows: int = 0
+    inserted: int = 0
+    failed: int = 0
+    errors: List[EmployeeImportError] = Field(default_factory=list)
+    errors_truncated: bool = False
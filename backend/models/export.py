@@ -0,0 +1,47 @@
+from pydantic import BaseModel, Field, ConfigDict
+from typing import Optional
+from datetime import datetime, date, timezone
+from enum import Enum
+
+class ExportKind(str, Enum):
+    ATTENDANCE = "attendance"
+    LEAVES = "leaves"
+
+class ExportFormat(str, Enum):
+    CSV = "csv"
+    XLSX = "xlsx"
+    PARQUET = "parquet"
+
+class ExportStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class ExportRequest(BaseModel):
+    kind: ExportKind
+    format: ExportFormat = ExportFormat.CSV
+    # Required for super admins; everyone else exports their own company
+    company_id: Optional[str] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+
+class ExportJob(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    id: str
+    company_id: str
+    kind: ExportKind
+    format: ExportFormat
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    status: ExportStatus = ExportStatus.QUEUED
+    rows_total: Optional[int] = None
+    rows_written: int = 0
+    file_size: Optional[int] = None
+    error: Optional[str] = None
+    created_by: str
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
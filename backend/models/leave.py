@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional
+from typing import Optional, List, Literal
 from datetime import datetime, date, timezone
 from enum import Enum
 
@@ -43,9 +43,36 @@ class LeaveCreate(BaseModel):
     leave_type: LeaveType
     start_date: date
     end_date: date
-    days_count: float
+    # Ignored: computed on the server from the company's working days and holidays
+    days_count: Optional[float] = None
     reason: str
 
+MAX_DECISIONS_PER_BATCH = 500
+
+class LeaveDecision(BaseModel):
+    leave_id: str
+    status: Literal["approved", "rejected"]
+    rejection_reason: Optional[str] = None
+
+class LeaveDecisionBatch(BaseModel):
+    decisions: List[LeaveDecision] = Field(..., min_length=1, max_length=MAX_DECISIONS_PER_BATCH)
+
+class LeaveDecisionError(BaseModel):
+    leave_id: str
+    error: str
+
+class LeaveDecisionReport(BaseModel):
+    total: int = 0
+    approved: int = 0
+    rejected: int = 0
+    failed: int = 0
+    errors: List[LeaveDecisionError] = Field(default_factory=list)
+
+class LeaveDays(BaseModel):
+    start_date: date
+    end_date: date
+    days_count: float
+
 class LeaveUpdate(BaseModel):
     status: LeaveStatus
     rejection_reason: Optional[str] = None
@@ -62,5 +89,50 @@ class LeaveBalance(BaseModel):
     used: float
     balance: float
     carried_forward: float = 0.0
+    # Days moved on to the next year by carry-forward
+    carried_out: float = 0.0
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+# --- LEAVE LEDGER ---
+class LedgerEntryKind(str, Enum):
+    ALLOCATION = "allocation"
+    USAGE = "usage"
+    REVERSAL = "reversal"
+    CARRY_OUT = "carry_out"
+    CARRY_IN = "carry_in"
+    ADJUSTMENT = "adjustment"
+
+class LeaveLedgerEntry(BaseModel):
+    """Append-only record of one change to a leave balance."""
+    model_config = ConfigDict(extra="ignore")
+
+    id: str
+    employee_id: str
+    company_id: str
+    year: int
+    leave_type: LeaveType
+    kind: LedgerEntryKind
+    # Signed effect on the balance (usage is negative)
+    days: float
+    leave_id: Optional[str] = None
+    note: Optional[str] = None
+    created_by: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class LeaveAllocationCreate(BaseModel):
+    employee_id: str
+    year: int
+    leave_type: LeaveType
+    days: float = Field(..., gt=0)
+    note: Optional[str] = None
+
+class CarryForwardRequest(BaseModel):
+    company_id: Optional[str] = None
+    from_year: int
+    leave_type: LeaveType
+    max_days: float = Field(..., gt=0)
+
+class CarryForwardResult(BaseModel):
+    employees: int
+    days: float
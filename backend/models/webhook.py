@@ -0,0 +1,45 @@
+from pydantic import BaseModel, Field, ConfigDict, HttpUrl
+from typing import List, Optional
+from datetime import datetime, timezone
+from enum import Enum
+
+class EventType(str, Enum):
+    EMPLOYEE_CREATED = "employee.created"
+    EMPLOYEE_UPDATED = "employee.updated"
+    EMPLOYEE_DELETED = "employee.deleted"
+    LEAVE_CREATED = "leave.created"
+    LEAVE_APPROVED = "leave.approved"
+    LEAVE_REJECTED = "leave.rejected"
+    LEAVE_CANCELLED = "leave.cancelled"
+    ATTENDANCE_CLOCK_IN = "attendance.clock_in"
+    ATTENDANCE_CLOCK_OUT = "attendance.clock_out"
+    ATTENDANCE_UPDATED = "attendance.updated"
+    COMPANY_UPDATED = "company.updated"
+    USER_UPDATED = "user.updated"
+
+class WebhookCreate(BaseModel):
+    url: HttpUrl
+    # Empty: every event type
+    event_types: List[EventType] = []
+    description: Optional[str] = None
+    # Required for super admins; everyone else registers for their own company
+    company_id: Optional[str] = None
+
+class Webhook(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    id: str
+    company_id: str
+    url: str
+    event_types: List[EventType] = []
+    description: Optional[str] = None
+    active: bool = True
+    failures: int = 0
+    last_delivery_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    last_error_at: Optional[datetime] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class WebhookWithSecret(Webhook):
+    # Only returned when the webhook is created; receivers verify X-NexusHR-Signature with it
+    secret: str
@@ -1,40 +1,35 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
-from motor.motor_asyncio import AsyncIOMotorClient
-from models.attendance import Attendance, AttendanceCreate, AttendanceUpdate, ClockInRequest, ClockOutRequest, AttendanceStatus
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
+from fastapi.responses import StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import BulkWriteError
+from models.attendance import (
+    Attendance, AttendanceCreate, AttendanceUpdate, ClockInRequest, ClockOutRequest, AttendanceStatus,
+    BulkClockRequest, BulkClockResponse, BulkClockEventResult, AttendanceRollup, AttendanceReport
+)
+from utils.database import get_db
 from utils.auth import get_current_user
-from utils.helpers import generate_id, calculate_working_hours
-from datetime import datetime, date, timezone
-from typing import List, Optional
-import os
+from utils.helpers import generate_id, calculate_working_hours, calculate_overtime_hours, STANDARD_WORKING_HOURS
+from utils.attendance_rollups import apply_rollup_changes, ROLLUP_COLLECTION
+from utils.attendance_store import attendance_store
+from utils.attendance_analytics import MAX_REPORT_DAYS, attendance_report
+from utils.attendance_board import attendance_board
+from utils.pagination import PageParams, paginate
+from utils.serialization import document_response
+from utils.codec import utc_now, to_bson_date, to_bson_datetime, parse_datetime
+from utils.events import event as domain_event, publish, publish_many
+from models.webhook import EventType
+from datetime import date
+from typing import List, Literal, Optional
 
 router = APIRouter(prefix="/attendance", tags=["Attendance"])
 
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
-@router.post("/clock-in", response_model=Attendance)
-async def clock_in(request: ClockInRequest, current_user: dict = Depends(get_current_user)):
-    today = date.today()
-    
-    existing = await db.attendance.find_one({
-        "employee_id": request.employee_id,
-        "date": today.isoformat(),
-        "is_deleted": False
-    })
-    
-    if existing and existing.get("clock_in"):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Already clocked in for today"
-        )
-    
-    attendance_dict = {
+def build_clock_in_record(employee_id: str, company_id: str, today: date, now) -> dict:
+    return {
         "id": generate_id(),
-        "employee_id": request.employee_id,
-        "company_id": request.company_id,
-        "date": today.isoformat(),
-        "clock_in": datetime.now(timezone.utc).isoformat(),
+        "employee_id": employee_id,
+        "company_id": company_id,
+        "date": to_bson_date(today),
+        "clock_in": now,
         "clock_out": None,
         "shift_type": "morning",
         "status": AttendanceStatus.PRESENT,
@@ -43,20 +38,29 @@ async def clock_in(request: ClockInRequest, current_user: dict = Depends(get_cur
         "break_hours": None,
         "notes": None,
         "is_deleted": False,
-        "created_at": datetime.now(timezone.utc).isoformat(),
-        "updated_at": datetime.now(timezone.utc).isoformat()
+        "created_at": now,
+        "updated_at": now
     }
+
+@router.post("/clock-in", response_model=Attendance)
+async def clock_in(request: ClockInRequest, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
+    attendance_dict = build_clock_in_record(
+        request.employee_id, request.company_id, date.today(), utc_now()
+    )
+    
+    if not await attendance_store.clock_in(db, attendance_dict):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Already clocked in for today"
+        )
     
-    await db.attendance.insert_one(attendance_dict)
-    attendance = await db.attendance.find_one({"id": attendance_dict["id"]}, {"_id": 0})
-    return Attendance(**attendance)
+    await apply_rollup_changes(db, [(None, attendance_dict)])
+    await publish(db, EventType.ATTENDANCE_CLOCK_IN.value, attendance_dict["company_id"], attendance_dict["id"], attendance_dict, Attendance)
+    return document_response(Attendance, attendance_dict)
 
 @router.post("/clock-out", response_model=Attendance)
-async def clock_out(request: ClockOutRequest, current_user: dict = Depends(get_current_user)):
-    attendance = await db.attendance.find_one({
-        "id": request.attendance_id,
-        "is_deleted": False
-    })
+async def clock_out(request: ClockOutRequest, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
+    attendance = await attendance_store.find_one(db, request.attendance_id)
     
     if not attendance:
         raise HTTPException(
@@ -70,31 +74,163 @@ async def clock_out(request: ClockOutRequest, current_user: dict = Depends(get_c
             detail="Already clocked out"
         )
     
-    clock_out_time = datetime.now(timezone.utc)
-    clock_in_time = datetime.fromisoformat(attendance["clock_in"])
+    clock_out_time = utc_now()
+    clock_in_time = parse_datetime(attendance["clock_in"])
     working_hours = calculate_working_hours(clock_in_time, clock_out_time)
     
     update_dict = {
-        "clock_out": clock_out_time.isoformat(),
+        "clock_out": clock_out_time,
         "working_hours": working_hours,
-        "updated_at": datetime.now(timezone.utc).isoformat()
+        "overtime_hours": calculate_overtime_hours(working_hours),
+        "updated_at": utc_now()
     }
     
-    await db.attendance.update_one(
-        {"id": request.attendance_id},
-        {"$set": update_dict}
-    )
+    # Guard on clock_out so a concurrent clock-out cannot overwrite this one
+    updated_attendance = await attendance_store.update(db, request.attendance_id, update_dict, {"clock_out": None})
+    if not updated_attendance:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Already clocked out"
+        )
     
-    updated_attendance = await db.attendance.find_one({"id": request.attendance_id}, {"_id": 0})
-    return Attendance(**updated_attendance)
+    await apply_rollup_changes(db, [(attendance, updated_attendance)])
+    await publish(db, EventType.ATTENDANCE_CLOCK_OUT.value, updated_attendance["company_id"], request.attendance_id, updated_attendance, Attendance)
+    return document_response(Attendance, updated_attendance)
+
+@router.post("/bulk", response_model=BulkClockResponse)
+async def bulk_clock(request: BulkClockRequest, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
+    """
+    Apply a batch of clock-in / clock-out events (badge readers, kiosks) with
+    one unordered bulk_write. Clock-ins are upserts on (employee_id, date), so
+    repeated swipes are reported as duplicates instead of creating records.
+    """
+    if current_user["role"] not in ["super_admin", "company_admin", "manager"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Insufficient permissions"
+        )
+    
+    now = utc_now()
+    today = date.today()
+    results: List[Optional[BulkClockEventResult]] = [None] * len(request.events)
+    operations = []
+    op_events = []  # operations[i] belongs to event index op_events[i]
+    op_changes = []  # (before, after) attendance records per operation, for the rollups
+    
+    def allowed(company_id: str) -> bool:
+        return current_user["role"] == "super_admin" or company_id == current_user["company_id"]
+    
+    # Clock-outs need the clock-in time; fetch all referenced records at once
+    clock_out_ids = list({e.attendance_id for e in request.events if e.type == "clock_out"})
+    open_records = {}
+    if clock_out_ids:
+        open_records = await attendance_store.find_many(db, clock_out_ids)
+    
+    seen_employees = set()
+    seen_attendance = set()
+    for index, event in enumerate(request.events):
+        if event.type == "clock_in":
+            if not allowed(event.company_id):
+                results[index] = BulkClockEventResult(index=index, type=event.type, status="forbidden", employee_id=event.employee_id)
+                continue
+            if event.employee_id in seen_employees:
+                results[index] = BulkClockEventResult(index=index, type=event.type, status="already_clocked_in", employee_id=event.employee_id)
+                continue
+            seen_employees.add(event.employee_id)
+            
+            record = build_clock_in_record(event.employee_id, event.company_id, today, now)
+            operations.append(attendance_store.clock_in_operation(record))
+            op_events.append(index)
+            op_changes.append((None, record))
+            results[index] = BulkClockEventResult(
+                index=index, type=event.type, status="already_clocked_in",
+                attendance_id=record["id"], employee_id=event.employee_id
+            )
+        else:
+            record = open_records.get(event.attendance_id)
+            if not record:
+                results[index] = BulkClockEventResult(index=index, type=event.type, status="not_found", attendance_id=event.attendance_id)
+                continue
+            if not allowed(record["company_id"]):
+                results[index] = BulkClockEventResult(index=index, type=event.type, status="forbidden", attendance_id=event.attendance_id)
+                continue
+            if record.get("clock_out") or event.attendance_id in seen_attendance or not record.get("clock_in"):
+                results[index] = BulkClockEventResult(
+                    index=index, type=event.type, status="already_clocked_out",
+                    attendance_id=event.attendance_id, employee_id=record["employee_id"]
+                )
+                continue
+            seen_attendance.add(event.attendance_id)
+            
+            working_hours = calculate_working_hours(parse_datetime(record["clock_in"]), now)
+            changes = {
+                "clock_out": now,
+                "working_hours": working_hours,
+                "overtime_hours": calculate_overtime_hours(working_hours),
+                "updated_at": now
+            }
+            operations.append(attendance_store.clock_out_operation(event.attendance_id, changes))
+            op_events.append(index)
+            op_changes.append((record, {**record, **changes}))
+            results[index] = BulkClockEventResult(
+                index=index, type=event.type, status="clocked_out",
+                attendance_id=event.attendance_id, employee_id=record["employee_id"]
+            )
+    
+    if operations:
+        try:
+            outcome = (await db[attendance_store.collection].bulk_write(operations, ordered=False)).bulk_api_result
+        except BulkWriteError as e:
+            outcome = e.details
+        
+        upserted = {upsert["index"] for upsert in outcome.get("upserted", [])}
+        errors = {error["index"]: error for error in outcome.get("writeErrors", [])}
+        for op_index, event_index in enumerate(op_events):
+            result = results[event_index]
+            error = errors.get(op_index)
+            if error and error.get("code") != 11000:
+                result.status = "error"
+                result.detail = error.get("errmsg")
+            elif result.type == "clock_in":
+                applied = attendance_store.clock_in_applied(op_index in upserted, error is not None)
+                result.status = "clocked_in" if applied else "already_clocked_in"
+        
+        applied = [
+            (change, results[index]) for change, index in zip(op_changes, op_events)
+            if results[index].status in ("clocked_in", "clocked_out")
+        ]
+        await apply_rollup_changes(db, [change for change, _ in applied])
+        await publish_many(db, [
+            domain_event(f"attendance.{result.type}", after["company_id"], after["id"], after, Attendance)
+            for (_, after), result in applied
+        ])
+    
+    # Existing day records are reported with their real id, not the discarded one
+    duplicates = [r for r in results if r.type == "clock_in" and r.status == "already_clocked_in"]
+    if duplicates:
+        existing = await attendance_store.day_ids(db, [r.employee_id for r in duplicates], today)
+        for r in duplicates:
+            r.attendance_id = existing.get(r.employee_id)
+    
+    succeeded = sum(1 for r in results if r.status in ("clocked_in", "clocked_out"))
+    return BulkClockResponse(
+        processed=len(results),
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        results=results
+    )
 
 @router.get("", response_model=List[Attendance])
 async def list_attendance(
+    response: Response,
     employee_id: Optional[str] = Query(None),
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
-    current_user: dict = Depends(get_current_user)
+    page: PageParams = Depends(),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
+    """Attendance records newest first, optionally within [start_date, end_date] (either bound may be omitted)."""
     query = {"is_deleted": False}
     
     if current_user["role"] == "employee" and current_user.get("employee_id"):
@@ -105,21 +241,176 @@ async def list_attendance(
     if current_user["role"] != "super_admin":
         query["company_id"] = current_user["company_id"]
     
-    if start_date and end_date:
-        query["date"] = {
-            "$gte": start_date.isoformat(),
-            "$lte": end_date.isoformat()
-        }
+    return await attendance_store.list(db, query, start_date, end_date, page, response, Attendance)
+
+@router.get("/rollups", response_model=List[AttendanceRollup])
+async def list_attendance_rollups(
+    response: Response,
+    year: int = Query(..., ge=2000, le=2100),
+    month: Optional[int] = Query(None, ge=1, le=12),
+    employee_id: Optional[str] = Query(None),
+    company_id: Optional[str] = Query(None, description="Super admins only"),
+    page: PageParams = Depends(),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Monthly totals per employee (hours worked, days present, half days,
+    overtime), one document per employee per month.
+    """
+    query = {"year": year}
+    if month:
+        query["month"] = month
+    
+    if current_user["role"] != "super_admin":
+        query["company_id"] = current_user["company_id"]
+    elif company_id:
+        query["company_id"] = company_id
+    
+    if current_user["role"] == "employee":
+        # Employees only see their own totals, never the company's
+        if not current_user.get("employee_id"):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="No employee profile is linked to this account"
+            )
+        query["employee_id"] = current_user["employee_id"]
+    elif employee_id:
+        query["employee_id"] = employee_id
     
-    attendance_records = await db.attendance.find(query, {"_id": 0}).sort("date", -1).to_list(1000)
-    return attendance_records
+    return await paginate(db[ROLLUP_COLLECTION], query, ("employee_id", 1), page, response, model=AttendanceRollup)
+
+@router.get("/report", response_model=AttendanceReport)
+async def get_attendance_report(
+    start_date: date = Query(...),
+    end_date: date = Query(...),
+    group_by: Literal["employee", "department", "branch"] = Query("department"),
+    overtime_threshold: float = Query(STANDARD_WORKING_HOURS, ge=0, le=24, description="Daily hours before overtime"),
+    company_id: Optional[str] = Query(None, description="Super admins only"),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Lateness, overtime and absenteeism for [start_date, end_date], per
+    employee, department or branch, with company totals.
+    """
+    if current_user["role"] not in ["super_admin", "company_admin", "manager"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Insufficient permissions"
+        )
+    if current_user["role"] != "super_admin":
+        company_id = current_user["company_id"]
+    if not company_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="company_id is required"
+        )
+    if end_date < start_date or (end_date - start_date).days >= MAX_REPORT_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Date range must be between 1 and {MAX_REPORT_DAYS} days"
+        )
+    report = await attendance_report(db, company_id, start_date, end_date, group_by, overtime_threshold)
+    return AttendanceReport(**report)
+
+@router.get("/board")
+async def attendance_board_stream(
+    company_id: Optional[str] = Query(None, description="Super admins only"),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Server-Sent Events: a `snapshot` of today's attendance, then a `delta`
+    for every clock-in, clock-out or correction. Apply deltas by record id;
+    a new `snapshot` replaces everything received so far.
+    """
+    if current_user["role"] not in ["super_admin", "company_admin", "manager"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Insufficient permissions"
+        )
+    if current_user["role"] != "super_admin":
+        company_id = current_user["company_id"]
+    if not company_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="company_id is required"
+        )
+    if attendance_board.full:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many board connections; try again later"
+        )
+    return StreamingResponse(
+        attendance_board.stream(db, company_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.get("/{attendance_id}", response_model=Attendance)
-async def get_attendance(attendance_id: str, current_user: dict = Depends(get_current_user)):
-    attendance = await db.attendance.find_one({"id": attendance_id, "is_deleted": False}, {"_id": 0})
+async def get_attendance(attendance_id: str, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
+    attendance = await attendance_store.find_one(db, attendance_id)
     if not attendance:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Attendance record not found"
         )
-    return Attendance(**attendance)
+    return document_response(Attendance, attendance)
+
+@router.put("/{attendance_id}", response_model=Attendance)
+async def update_attendance(
+    attendance_id: str,
+    update_data: AttendanceUpdate,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Correct an attendance record. Working and overtime hours are recomputed
+    when clock times change, and the monthly rollup is adjusted by the difference.
+    """
+    if current_user["role"] not in ["super_admin", "company_admin", "manager"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Insufficient permissions"
+        )
+    
+    company_id = current_user["company_id"] if current_user["role"] != "super_admin" else None
+    attendance = await attendance_store.find_one(db, attendance_id, company_id)
+    if not attendance:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Attendance record not found"
+        )
+    
+    update_dict = {k: v for k, v in update_data.model_dump().items() if v is not None}
+    for time_field in ["clock_in", "clock_out"]:
+        if time_field in update_dict:
+            update_dict[time_field] = to_bson_datetime(update_dict[time_field])
+    
+    if "clock_in" in update_dict or "clock_out" in update_dict:
+        clock_in_value = update_dict.get("clock_in", attendance.get("clock_in"))
+        clock_out_value = update_dict.get("clock_out", attendance.get("clock_out"))
+        if clock_in_value and clock_out_value:
+            working_hours = calculate_working_hours(
+                parse_datetime(clock_in_value), parse_datetime(clock_out_value)
+            )
+            update_dict["working_hours"] = working_hours
+            update_dict["overtime_hours"] = calculate_overtime_hours(working_hours)
+    
+    update_dict["updated_at"] = utc_now()
+    
+    # Match the version we read so the rollup delta is computed against it
+    guard = {"updated_at": attendance["updated_at"]}
+    if company_id:
+        guard["company_id"] = company_id
+    updated_attendance = await attendance_store.update(db, attendance_id, update_dict, guard)
+    if not updated_attendance:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Attendance record was modified concurrently, please retry"
+        )
+    
+    await apply_rollup_changes(db, [(attendance, updated_attendance)])
+    await publish(db, EventType.ATTENDANCE_UPDATED.value, updated_attendance["company_id"], attendance_id, updated_attendance, Attendance)
+    return document_response(Attendance, updated_attendance)
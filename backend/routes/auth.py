@@ -1,19 +1,16 @@
 from fastapi import APIRouter, HTTPException, status, Depends
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from models.user import UserCreate, UserLogin, UserResponse, TokenResponse, User
-from utils.auth import get_password_hash, verify_password, create_access_token, get_current_user
+from utils.database import get_db
+from utils.auth import get_password_hash_async, verify_password_async, create_access_token, get_current_user
 from utils.helpers import generate_id
-from datetime import datetime, timezone
-import os
+from utils.codec import utc_now
+from utils.entity_cache import cached_user
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate):
+async def register(user_data: UserCreate, db: AsyncIOMotorDatabase = Depends(get_db)):
     existing_user = await db.users.find_one({"email": user_data.email, "is_deleted": False})
     if existing_user:
         raise HTTPException(
@@ -23,11 +20,11 @@ async def register(user_data: UserCreate):
     
     user_dict = user_data.model_dump()
     user_dict["id"] = generate_id()
-    user_dict["password_hash"] = get_password_hash(user_data.password)
+    user_dict["password_hash"] = await get_password_hash_async(user_data.password)
     user_dict["is_active"] = True
     user_dict["is_deleted"] = False
-    user_dict["created_at"] = datetime.now(timezone.utc).isoformat()
-    user_dict["updated_at"] = datetime.now(timezone.utc).isoformat()
+    user_dict["created_at"] = utc_now()
+    user_dict["updated_at"] = utc_now()
     del user_dict["password"]
     
     await db.users.insert_one(user_dict)
@@ -42,9 +39,9 @@ async def register(user_data: UserCreate):
     )
 
 @router.post("/login", response_model=TokenResponse)
-async def login(credentials: UserLogin):
+async def login(credentials: UserLogin, db: AsyncIOMotorDatabase = Depends(get_db)):
     user = await db.users.find_one({"email": credentials.email, "is_deleted": False})
-    if not user or not verify_password(credentials.password, user["password_hash"]):
+    if not user or not await verify_password_async(credentials.password, user["password_hash"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
@@ -60,7 +57,8 @@ async def login(credentials: UserLogin):
         "sub": user["id"],
         "email": user["email"],
         "role": user["role"],
-        "company_id": user.get("company_id")
+        "company_id": user.get("company_id"),
+        "employee_id": user.get("employee_id")
     })
     
     return TokenResponse(
@@ -77,8 +75,8 @@ async def login(credentials: UserLogin):
     )
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: dict = Depends(get_current_user)):
-    user = await db.users.find_one({"id": current_user["sub"], "is_deleted": False})
+async def get_current_user_info(current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
+    user = await cached_user(db, current_user["sub"])
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
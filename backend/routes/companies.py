@@ -1,23 +1,29 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query, Path
-from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Path, Request, Response
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
 from models.company import (
     Company, CompanyCreate, CompanyUpdate, 
     Branch, BranchCreate, 
     Department, DepartmentCreate, DepartmentUpdate,
-    Team, TeamCreate
+    Team, TeamCreate,
+    Holiday, HolidayCreate,
+    OrgStructure
 )
+from utils.database import get_db
 from utils.auth import get_current_user
 from utils.helpers import generate_id
-from datetime import datetime, timezone
+from utils.pagination import PageParams, paginate, paginate_documents
+from utils.serialization import document_response, serializer_for, dumps
+from utils.org_cache import org_cache
+from utils.entity_cache import entity_cache, cached_company, company_tag
+from utils.events import publish
+from models.webhook import EventType
+from utils.codec import utc_now, to_bson_date, date_eq, date_range
+from datetime import date
 from typing import List, Optional
-import os
 
 router = APIRouter(prefix="/companies", tags=["Companies"])
 
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
 # ==========================================
 # HELPER FUNCTIONS (PERMISSIONS & VALIDATION)
 # ==========================================
@@ -56,7 +62,7 @@ def verify_admin_privileges(user: dict):
 # ==========================================
 
 @router.post("", response_model=Company, status_code=status.HTTP_201_CREATED)
-async def create_company(company_data: CompanyCreate, current_user: dict = Depends(get_current_user)):
+async def create_company(company_data: CompanyCreate, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
     """Only Super Admins can create a new company entity."""
     if current_user["role"] != "super_admin":
         raise HTTPException(
@@ -73,66 +79,70 @@ async def create_company(company_data: CompanyCreate, current_user: dict = Depen
     company_dict["id"] = generate_id()
     company_dict["is_active"] = True
     company_dict["is_deleted"] = False
-    company_dict["created_at"] = datetime.now(timezone.utc).isoformat()
-    company_dict["updated_at"] = datetime.now(timezone.utc).isoformat()
+    company_dict["created_at"] = utc_now()
+    company_dict["updated_at"] = utc_now()
     
     await db.companies.insert_one(company_dict)
-    return Company(**company_dict)
+    return document_response(Company, company_dict, status_code=status.HTTP_201_CREATED)
 
 @router.get("", response_model=List[Company])
-async def list_companies(current_user: dict = Depends(get_current_user)):
+async def list_companies(
+    response: Response,
+    page: PageParams = Depends(),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
     """
     List companies. 
     Super Admins see all. Company Admins/Employees see only their own.
     """
-    if current_user["role"] == "super_admin":
-        companies = await db.companies.find({"is_deleted": False}, {"_id": 0}).to_list(1000)
-    else:
+    query = {"is_deleted": False}
+    if current_user["role"] != "super_admin":
         # Restrict to user's company
-        companies = await db.companies.find(
-            {"id": current_user["company_id"], "is_deleted": False},
-            {"_id": 0}
-        ).to_list(1000)
-    return companies
+        query["id"] = current_user["company_id"]
+    return await paginate(db.companies, query, ("created_at", 1), page, response, model=Company)
 
 @router.get("/{company_id}", response_model=Company)
-async def get_company(company_id: str, current_user: dict = Depends(get_current_user)):
+async def get_company(company_id: str, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
     # Verify access first
     if current_user["role"] != "super_admin":
         if current_user["company_id"] != company_id:
              raise HTTPException(status_code=403, detail="Access denied")
 
-    company = await db.companies.find_one({"id": company_id, "is_deleted": False}, {"_id": 0})
+    company = await cached_company(db, company_id)
     if not company:
         raise HTTPException(status_code=404, detail="Company not found")
-    return Company(**company)
+    return document_response(Company, company)
 
 @router.put("/{company_id}", response_model=Company)
-async def update_company(company_id: str, update_data: CompanyUpdate, current_user: dict = Depends(get_current_user)):
+async def update_company(company_id: str, update_data: CompanyUpdate, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
     """Update company details."""
     verify_admin_privileges(current_user)
     verify_company_access(company_id, current_user)
     
     update_dict = {k: v for k, v in update_data.model_dump().items() if v is not None}
-    update_dict["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_dict["updated_at"] = utc_now()
     
-    result = await db.companies.update_one(
+    company = await db.companies.find_one_and_update(
         {"id": company_id, "is_deleted": False},
-        {"$set": update_dict}
+        {"$set": update_dict},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
     
-    if result.matched_count == 0:
+    if not company:
         raise HTTPException(status_code=404, detail="Company not found")
     
-    company = await db.companies.find_one({"id": company_id}, {"_id": 0})
-    return Company(**company)
+    await entity_cache.invalidate(company_tag(company_id))
+    await publish(db, EventType.COMPANY_UPDATED.value, company_id, company_id, company, Company)
+    return document_response(Company, company)
 
 # ==========================================
 # BRANCH ROUTES
 # ==========================================
 
 @router.post("/{company_id}/branches", response_model=Branch, status_code=status.HTTP_201_CREATED)
-async def create_branch(company_id: str, branch_data: BranchCreate, current_user: dict = Depends(get_current_user)):
+async def create_branch(company_id: str, branch_data: BranchCreate, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
     verify_admin_privileges(current_user)
     verify_company_access(company_id, current_user)
 
@@ -142,20 +152,26 @@ async def create_branch(company_id: str, branch_data: BranchCreate, current_user
     branch_dict["company_id"] = company_id 
     branch_dict["is_active"] = True
     branch_dict["is_deleted"] = False
-    branch_dict["created_at"] = datetime.now(timezone.utc).isoformat()
-    branch_dict["updated_at"] = datetime.now(timezone.utc).isoformat()
+    branch_dict["created_at"] = utc_now()
+    branch_dict["updated_at"] = utc_now()
     
     await db.branches.insert_one(branch_dict)
-    return Branch(**branch_dict)
+    org_cache.invalidate(company_id)
+    return document_response(Branch, branch_dict, status_code=status.HTTP_201_CREATED)
 
 @router.get("/{company_id}/branches", response_model=List[Branch])
-async def list_branches(company_id: str, current_user: dict = Depends(get_current_user)):
+async def list_branches(
+    company_id: str,
+    page: PageParams = Depends(),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
     # Employees can view branches of their company
     if current_user["role"] != "super_admin" and current_user["company_id"] != company_id:
         raise HTTPException(status_code=403, detail="Access denied")
 
-    branches = await db.branches.find({"company_id": company_id, "is_deleted": False}, {"_id": 0}).to_list(1000)
-    return branches
+    snapshot = await org_cache.get(db, company_id)
+    return paginate_documents(snapshot.branches, ("created_at", 1), page, Branch)
 
 # ==========================================
 # DEPARTMENT ROUTES
@@ -165,7 +181,8 @@ async def list_branches(company_id: str, current_user: dict = Depends(get_curren
 async def create_department(
     company_id: str, 
     dept_data: DepartmentCreate, 
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     Create a new department for a company.
@@ -181,12 +198,7 @@ async def create_department(
     # If a branch_id is provided, we must ensure that branch belongs to THIS company.
     # We cannot allow assigning a department to a branch from a different company.
     if dept_data.branch_id:
-        branch = await db.branches.find_one({
-            "id": dept_data.branch_id,
-            "company_id": company_id,
-            "is_deleted": False
-        })
-        if not branch:
+        if not await org_cache.branch_exists(db, company_id, dept_data.branch_id):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid branch_id. The branch does not exist or does not belong to this company."
@@ -210,17 +222,20 @@ async def create_department(
     dept_dict["company_id"] = company_id # Enforce path param
     dept_dict["is_active"] = True
     dept_dict["is_deleted"] = False
-    dept_dict["created_at"] = datetime.now(timezone.utc).isoformat()
-    dept_dict["updated_at"] = datetime.now(timezone.utc).isoformat()
+    dept_dict["created_at"] = utc_now()
+    dept_dict["updated_at"] = utc_now()
     
     await db.departments.insert_one(dept_dict)
-    return Department(**dept_dict)
+    org_cache.invalidate(company_id)
+    return document_response(Department, dept_dict, status_code=status.HTTP_201_CREATED)
 
 @router.get("/{company_id}/departments", response_model=List[Department])
 async def list_departments(
     company_id: str, 
     branch_id: Optional[str] = Query(None, description="Filter by Branch ID"),
-    current_user: dict = Depends(get_current_user)
+    page: PageParams = Depends(),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     List all departments for a company.
@@ -230,21 +245,20 @@ async def list_departments(
     if current_user["role"] != "super_admin" and current_user["company_id"] != company_id:
         raise HTTPException(status_code=403, detail="Access denied")
 
-    query = {"company_id": company_id, "is_deleted": False}
+    snapshot = await org_cache.get(db, company_id)
     
     # Apply branch filter if provided
-    if branch_id:
-        query["branch_id"] = branch_id
+    departments = snapshot.departments_in_branch(branch_id) if branch_id else snapshot.departments
 
-    departments = await db.departments.find(query, {"_id": 0}).to_list(1000)
-    return departments
+    return paginate_documents(departments, ("created_at", 1), page, Department)
 
 @router.put("/{company_id}/departments/{department_id}", response_model=Department)
 async def update_department(
     company_id: str, 
     department_id: str, 
     update_data: DepartmentUpdate, 
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     Update department details.
@@ -254,36 +268,34 @@ async def update_department(
 
     # If updating branch_id, validate it again
     if update_data.branch_id:
-        branch = await db.branches.find_one({
-            "id": update_data.branch_id,
-            "company_id": company_id,
-            "is_deleted": False
-        })
-        if not branch:
+        if not await org_cache.branch_exists(db, company_id, update_data.branch_id):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid branch_id. The branch does not belong to this company."
             )
 
     update_dict = {k: v for k, v in update_data.model_dump().items() if v is not None}
-    update_dict["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_dict["updated_at"] = utc_now()
 
-    result = await db.departments.update_one(
+    dept = await db.departments.find_one_and_update(
         {"id": department_id, "company_id": company_id, "is_deleted": False},
-        {"$set": update_dict}
+        {"$set": update_dict},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
 
-    if result.matched_count == 0:
+    if not dept:
         raise HTTPException(status_code=404, detail="Department not found")
 
-    dept = await db.departments.find_one({"id": department_id}, {"_id": 0})
-    return Department(**dept)
+    org_cache.invalidate(company_id)
+    return document_response(Department, dept)
 
 @router.delete("/{company_id}/departments/{department_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_department(
     company_id: str, 
     department_id: str, 
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     Soft delete a department.
@@ -303,9 +315,10 @@ async def delete_department(
         {"id": department_id},
         {"$set": {
             "is_deleted": True,
-            "updated_at": datetime.now(timezone.utc).isoformat()
+            "updated_at": utc_now()
         }}
     )
+    org_cache.invalidate(company_id)
     return
 
 # ==========================================
@@ -313,7 +326,7 @@ async def delete_department(
 # ==========================================
 
 @router.post("/{company_id}/teams", response_model=Team, status_code=status.HTTP_201_CREATED)
-async def create_team(company_id: str, team_data: TeamCreate, current_user: dict = Depends(get_current_user)):
+async def create_team(company_id: str, team_data: TeamCreate, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
     verify_admin_privileges(current_user)
     verify_company_access(company_id, current_user)
     
@@ -322,16 +335,122 @@ async def create_team(company_id: str, team_data: TeamCreate, current_user: dict
     team_dict["company_id"] = company_id
     team_dict["is_active"] = True
     team_dict["is_deleted"] = False
-    team_dict["created_at"] = datetime.now(timezone.utc).isoformat()
-    team_dict["updated_at"] = datetime.now(timezone.utc).isoformat()
+    team_dict["created_at"] = utc_now()
+    team_dict["updated_at"] = utc_now()
     
     await db.teams.insert_one(team_dict)
-    return Team(**team_dict)
+    org_cache.invalidate(company_id)
+    return document_response(Team, team_dict, status_code=status.HTTP_201_CREATED)
 
 @router.get("/{company_id}/teams", response_model=List[Team])
-async def list_teams(company_id: str, current_user: dict = Depends(get_current_user)):
+async def list_teams(
+    company_id: str,
+    page: PageParams = Depends(),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
     if current_user["role"] != "super_admin" and current_user["company_id"] != company_id:
         raise HTTPException(status_code=403, detail="Access denied")
         
-    teams = await db.teams.find({"company_id": company_id, "is_deleted": False}, {"_id": 0}).to_list(1000)
-    return teams
\ No newline at end of file
+    snapshot = await org_cache.get(db, company_id)
+    return paginate_documents(snapshot.teams, ("created_at", 1), page, Team)
+
+# ==========================================
+# HOLIDAY CALENDAR
+# ==========================================
+
+@router.post("/{company_id}/holidays", response_model=Holiday, status_code=status.HTTP_201_CREATED)
+async def create_holiday(company_id: str, holiday_data: HolidayCreate, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
+    """Add a company holiday. Leave requested after this no longer counts the day."""
+    verify_admin_privileges(current_user)
+    verify_company_access(company_id, current_user)
+
+    existing = await db.holidays.find_one({
+        "company_id": company_id,
+        "date": date_eq(holiday_data.date),
+        "is_deleted": False
+    })
+    if existing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A holiday on {holiday_data.date.isoformat()} already exists in this company."
+        )
+
+    holiday_dict = holiday_data.model_dump()
+    holiday_dict["id"] = generate_id()
+    holiday_dict["company_id"] = company_id
+    holiday_dict["date"] = to_bson_date(holiday_dict["date"])
+    holiday_dict["is_deleted"] = False
+    holiday_dict["created_at"] = utc_now()
+    holiday_dict["updated_at"] = utc_now()
+
+    await db.holidays.insert_one(holiday_dict)
+    return document_response(Holiday, holiday_dict, status_code=status.HTTP_201_CREATED)
+
+@router.get("/{company_id}/holidays", response_model=List[Holiday])
+async def list_holidays(
+    company_id: str,
+    response: Response,
+    year: Optional[int] = Query(None, description="Only holidays in this calendar year"),
+    page: PageParams = Depends(),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    if current_user["role"] != "super_admin" and current_user["company_id"] != company_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    query = {"company_id": company_id, "is_deleted": False}
+    if year is not None:
+        query.update(date_range("date", date(year, 1, 1), date(year, 12, 31)))
+    return await paginate(db.holidays, query, ("date", 1), page, response, model=Holiday)
+
+@router.delete("/{company_id}/holidays/{holiday_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_holiday(
+    company_id: str,
+    holiday_id: str,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    verify_admin_privileges(current_user)
+    verify_company_access(company_id, current_user)
+
+    result = await db.holidays.update_one(
+        {"id": holiday_id, "company_id": company_id, "is_deleted": False},
+        {"$set": {"is_deleted": True, "updated_at": utc_now()}}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Holiday not found")
+    return
+
+# ==========================================
+# ORGANISATION STRUCTURE
+# ==========================================
+
+@router.get("/{company_id}/structure", response_model=OrgStructure)
+async def get_org_structure(
+    company_id: str,
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Branches, departments and teams of a company in one response, served from
+    the org cache. Send the returned ETag as If-None-Match to get a 304 when
+    nothing has changed.
+    """
+    if current_user["role"] != "super_admin" and current_user["company_id"] != company_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    snapshot = await org_cache.get(db, company_id)
+    etag = f'"{snapshot.version}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    body = dumps({
+        "company_id": company_id,
+        "version": snapshot.version,
+        "branches": [serializer_for(Branch).prepare(b) for b in snapshot.branches],
+        "departments": [serializer_for(Department).prepare(d) for d in snapshot.departments],
+        "teams": [serializer_for(Team).prepare(t) for t in snapshot.teams],
+    })
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
\ No newline at end of file
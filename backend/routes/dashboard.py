@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, Query
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from models.dashboard import DashboardSummary
+from models.employee import EmploymentStatus
+from models.leave import LeaveStatus
+from utils.database import get_db
+from utils.auth import get_current_user
+from utils.attendance_store import attendance_store
+from datetime import date
+from typing import Optional
+
+router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
+
+def _count(match: dict) -> list:
+    return [{"$match": match}, {"$count": "n"}]
+
+@router.get("/summary", response_model=DashboardSummary)
+async def get_dashboard_summary(
+    company_id: Optional[str] = Query(None, description="Super admins only; defaults to all companies"),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Headcount, active headcount, today's attendance and pending leaves,
+    computed in a single aggregation scoped to the caller's company.
+    """
+    scope = {"is_deleted": False}
+    if current_user["role"] != "super_admin":
+        company_id = current_user["company_id"]
+    if company_id:
+        scope["company_id"] = company_id
+
+    today = date.today()
+
+    pipeline = [
+        {"$match": scope},
+        {"$project": {"_id": 0, "kind": {"$literal": "employee"}, "employment_status": 1}},
+        {"$unionWith": {"coll": attendance_store.collection, "pipeline": [
+            *attendance_store.record_pipeline(scope, today, today),
+            {"$project": {"_id": 0, "kind": {"$literal": "attendance"}}},
+        ]}},
+        {"$unionWith": {"coll": "leaves", "pipeline": [
+            {"$match": {**scope, "status": LeaveStatus.PENDING.value}},
+            {"$project": {"_id": 0, "kind": {"$literal": "leave"}}},
+        ]}},
+        {"$facet": {
+            "total_employees": _count({"kind": "employee"}),
+            "active_employees": _count({"kind": "employee", "employment_status": EmploymentStatus.ACTIVE.value}),
+            "today_attendance": _count({"kind": "attendance"}),
+            "pending_leaves": _count({"kind": "leave"}),
+        }},
+    ]
+
+    result = await db.employees.aggregate(pipeline).to_list(1)
+    facets = result[0] if result else {}
+    counts = {name: (rows[0]["n"] if rows else 0) for name, rows in facets.items()}
+
+    return DashboardSummary(company_id=company_id, date=today, **counts)
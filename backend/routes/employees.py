@@ -1,20 +1,32 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
-from motor.motor_asyncio import AsyncIOMotorClient
-from models.employee import Employee, EmployeeCreate, EmployeeUpdate, EmploymentStatus
-from utils.auth import get_current_user
-from utils.helpers import generate_id
-from datetime import datetime, timezone
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response, UploadFile, File
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from models.employee import (
+    Employee, EmployeeCreate, EmployeeUpdate, EmployeeImportReport, EmployeeSearchResult,
+    EmployeeNode, ReportsHeadcount, EmploymentStatus, EMPLOYEE_FIELD_PRESETS
+)
+from utils.database import get_db
+from utils.auth import get_current_user, set_employee_users_active
+from utils.employees import build_employee_record, detect_format, import_employees, SUPPORTED_FORMATS
+from utils.employee_search import find_employees, search_keys, MAX_QUERY_LENGTH, SEARCH_MODES
+from utils.hierarchy import manager_path_for, move_subtree, reports_query, approval_chain, headcount, headcount_rollup
+from utils.pagination import PageParams, paginate
+from utils.serialization import document_response
+from utils.projection import resolve_fields, projection_for
+from utils.codec import utc_now, to_bson_date
+from utils.entity_cache import entity_cache, cached_employee, employee_tag
+from utils.events import publish
+from models.webhook import EventType
 from typing import List, Optional
-import os
+import io
 
 router = APIRouter(prefix="/employees", tags=["Employees"])
 
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Employees in any other status can no longer sign in
+SIGN_IN_STATUSES = {EmploymentStatus.ACTIVE, EmploymentStatus.ON_LEAVE}
 
 @router.post("", response_model=Employee, status_code=status.HTTP_201_CREATED)
-async def create_employee(employee_data: EmployeeCreate, current_user: dict = Depends(get_current_user)):
+async def create_employee(employee_data: EmployeeCreate, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
     if current_user["role"] not in ["super_admin", "company_admin", "manager"]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -32,29 +44,69 @@ async def create_employee(employee_data: EmployeeCreate, current_user: dict = De
             detail="Employee code already exists"
         )
     
-    employee_dict = employee_data.model_dump()
-    employee_dict["id"] = generate_id()
-    employee_dict["employment_status"] = EmploymentStatus.ACTIVE
-    employee_dict["is_deleted"] = False
-    employee_dict["created_at"] = datetime.now(timezone.utc).isoformat()
-    employee_dict["updated_at"] = datetime.now(timezone.utc).isoformat()
-    
-    if employee_dict.get("date_of_birth"):
-        employee_dict["date_of_birth"] = employee_dict["date_of_birth"].isoformat()
-    if employee_dict.get("date_of_joining"):
-        employee_dict["date_of_joining"] = employee_dict["date_of_joining"].isoformat()
+    employee_dict = build_employee_record(employee_data)
+    employee_dict["manager_path"] = await manager_path_for(db, employee_data.company_id, employee_data.manager_id)
+    employee_dict["manager_depth"] = len(employee_dict["manager_path"])
     
     await db.employees.insert_one(employee_dict)
-    employee = await db.employees.find_one({"id": employee_dict["id"]}, {"_id": 0})
-    return Employee(**employee)
+    await publish(db, EventType.EMPLOYEE_CREATED.value, employee_dict["company_id"], employee_dict["id"], employee_dict, Employee)
+    return document_response(Employee, employee_dict, status_code=status.HTTP_201_CREATED)
+
+@router.post("/import", response_model=EmployeeImportReport)
+async def import_employees_file(
+    file: UploadFile = File(..., description="CSV (with header row) or NDJSON"),
+    company_id: Optional[str] = Query(None, description="Company to import into; overrides the company_id column"),
+    format: Optional[str] = Query(None, description="csv or ndjson; inferred from the file name if omitted"),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Bulk import employees. Rows are validated and inserted in chunks and the
+    response lists every rejected row with its errors.
+    """
+    if current_user["role"] not in ["super_admin", "company_admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Insufficient permissions"
+        )
+    
+    if current_user["role"] != "super_admin":
+        company_id = current_user["company_id"]
+    
+    fmt = format or detect_format(file.filename, file.content_type)
+    if fmt not in SUPPORTED_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported import format; use one of: {', '.join(SUPPORTED_FORMATS)}"
+        )
+    
+    text = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        return await import_employees(db, text, fmt, company_id)
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Import file must be UTF-8 encoded"
+        )
+    finally:
+        text.detach()
 
 @router.get("", response_model=List[Employee])
 async def list_employees(
+    response: Response,
     company_id: Optional[str] = Query(None),
     department_id: Optional[str] = Query(None),
     status: Optional[str] = Query(None),
-    current_user: dict = Depends(get_current_user)
+    fields: Optional[str] = Query(None, description="Comma-separated field names and/or presets: summary, directory"),
+    page: PageParams = Depends(),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
+    """
+    List employees. With `fields`, only the requested fields are read from
+    MongoDB and returned (the response then does not match the Employee schema).
+    """
+    model = resolve_fields(fields, Employee, EMPLOYEE_FIELD_PRESETS)
     query = {"is_deleted": False}
     
     if current_user["role"] != "super_admin":
@@ -67,24 +119,118 @@ async def list_employees(
     if status:
         query["employment_status"] = status
     
-    employees = await db.employees.find(query, {"_id": 0}).to_list(1000)
-    return employees
+    if model is None:
+        return await paginate(db.employees, query, ("created_at", 1), page, response, model=Employee)
+    return await paginate(db.employees, query, ("created_at", 1), page, response, projection_for(model), model=model)
+
+@router.get("/search", response_model=List[EmployeeSearchResult])
+async def search_employees(
+    q: str = Query(..., min_length=1, max_length=MAX_QUERY_LENGTH, description="Name, email, employee code or designation"),
+    company_id: Optional[str] = Query(None, description="Required for super admins"),
+    limit: int = Query(20, ge=1, le=100),
+    mode: str = Query("auto", description="auto, prefix (typeahead only) or text (full-text only)"),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Ranked employee search within one company. "prefix" matches the start of
+    first name, last name, full name, email or employee code; "text" is
+    word-based full-text search that also covers designation.
+    """
+    if mode not in SEARCH_MODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"mode must be one of: {', '.join(SEARCH_MODES)}"
+        )
+    
+    if current_user["role"] != "super_admin":
+        company_id = current_user["company_id"]
+    elif not company_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="company_id is required"
+        )
+    
+    projection = projection_for(EmployeeSearchResult)
+    projection.pop("score")
+    results = await find_employees(db, company_id, q, projection, limit, mode)
+    return document_response(EmployeeSearchResult, results)
+
+@router.get("/headcount", response_model=List[ReportsHeadcount])
+async def get_headcount_rollup(
+    company_id: Optional[str] = Query(None, description="Required for super admins"),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Direct and total reports for every manager in the company, largest teams first."""
+    if current_user["role"] != "super_admin":
+        company_id = current_user["company_id"]
+    elif not company_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="company_id is required"
+        )
+    
+    return document_response(ReportsHeadcount, await headcount_rollup(db, company_id))
+
+async def get_visible_employee(db: AsyncIOMotorDatabase, employee_id: str, current_user: dict) -> dict:
+    employee = await db.employees.find_one(
+        {"id": employee_id, "is_deleted": False},
+        {"_id": 0, "id": 1, "company_id": 1, "manager_path": 1, "manager_depth": 1}
+    )
+    if not employee:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Employee not found"
+        )
+    if current_user["role"] != "super_admin" and current_user["company_id"] != employee["company_id"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied"
+        )
+    return employee
+
+@router.get("/{employee_id}/reports", response_model=List[EmployeeNode])
+async def list_reports(
+    employee_id: str,
+    response: Response,
+    depth: Optional[int] = Query(None, ge=1, description="Levels below the employee; 1 = direct reports only. Omit for all."),
+    page: PageParams = Depends(),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Direct and indirect reports, level by level."""
+    employee = await get_visible_employee(db, employee_id, current_user)
+    query = reports_query(employee, depth)
+    return await paginate(db.employees, query, ("manager_depth", 1), page, response, projection_for(EmployeeNode), model=EmployeeNode)
+
+@router.get("/{employee_id}/chain", response_model=List[EmployeeNode])
+async def get_approval_chain(employee_id: str, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
+    """The employee's managers, from the direct manager up to the top of the chart."""
+    employee = await get_visible_employee(db, employee_id, current_user)
+    return document_response(EmployeeNode, await approval_chain(db, employee, projection_for(EmployeeNode)))
+
+@router.get("/{employee_id}/headcount", response_model=ReportsHeadcount)
+async def get_headcount(employee_id: str, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
+    employee = await get_visible_employee(db, employee_id, current_user)
+    return document_response(ReportsHeadcount, await headcount(db, employee))
 
 @router.get("/{employee_id}", response_model=Employee)
-async def get_employee(employee_id: str, current_user: dict = Depends(get_current_user)):
-    employee = await db.employees.find_one({"id": employee_id, "is_deleted": False}, {"_id": 0})
+async def get_employee(employee_id: str, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
+    employee = await cached_employee(db, employee_id)
     if not employee:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Employee not found"
         )
-    return Employee(**employee)
+    return document_response(Employee, employee)
 
 @router.put("/{employee_id}", response_model=Employee)
 async def update_employee(
     employee_id: str,
     update_data: EmployeeUpdate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     if current_user["role"] not in ["super_admin", "company_admin", "manager"]:
         raise HTTPException(
@@ -93,41 +239,70 @@ async def update_employee(
         )
     
     update_dict = {k: v for k, v in update_data.model_dump().items() if v is not None}
-    update_dict["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_dict["updated_at"] = utc_now()
     
     for date_field in ["date_of_birth", "passport_expiry", "visa_expiry"]:
         if date_field in update_dict and update_dict[date_field]:
-            update_dict[date_field] = update_dict[date_field].isoformat()
+            update_dict[date_field] = to_bson_date(update_dict[date_field])
     
-    result = await db.employees.update_one(
+    # Re-parenting: validate the new manager and move the reporting line with it
+    moved_from = None
+    if "manager_id" in update_dict:
+        current = await db.employees.find_one(
+            {"id": employee_id, "is_deleted": False},
+            {"_id": 0, "company_id": 1, "manager_id": 1, "manager_path": 1}
+        )
+        if current and current.get("manager_id") != update_dict["manager_id"]:
+            update_dict["manager_path"] = await manager_path_for(db, current["company_id"], update_dict["manager_id"], employee_id)
+            update_dict["manager_depth"] = len(update_dict["manager_path"])
+            moved_from = current
+    
+    employee = await db.employees.find_one_and_update(
         {"id": employee_id, "is_deleted": False},
-        {"$set": update_dict}
+        {"$set": update_dict},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
     
-    if result.matched_count == 0:
+    if not employee:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Employee not found"
         )
     
-    employee = await db.employees.find_one({"id": employee_id}, {"_id": 0})
-    return Employee(**employee)
+    if "first_name" in update_dict or "last_name" in update_dict:
+        await db.employees.update_one({"id": employee_id}, {"$set": {"search_keys": search_keys(employee)}})
+    
+    if moved_from is not None:
+        await move_subtree(db, moved_from["company_id"], employee_id, update_dict["manager_path"])
+    
+    if "employment_status" in update_dict:
+        await set_employee_users_active(db, employee_id, update_dict["employment_status"] in SIGN_IN_STATUSES)
+    
+    await entity_cache.invalidate(employee_tag(employee_id))
+    await publish(db, EventType.EMPLOYEE_UPDATED.value, employee["company_id"], employee_id, employee, Employee)
+    return document_response(Employee, employee)
 
 @router.delete("/{employee_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_employee(employee_id: str, current_user: dict = Depends(get_current_user)):
+async def delete_employee(employee_id: str, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
     if current_user["role"] not in ["super_admin", "company_admin"]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Insufficient permissions"
         )
     
-    result = await db.employees.update_one(
+    employee = await db.employees.find_one_and_update(
         {"id": employee_id},
-        {"$set": {"is_deleted": True, "updated_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"is_deleted": True, "updated_at": utc_now()}},
+        projection={"_id": 0, "id": 1, "company_id": 1}
     )
     
-    if result.matched_count == 0:
+    if not employee:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Employee not found"
         )
+    
+    await set_employee_users_active(db, employee_id, False)
+    await entity_cache.invalidate(employee_tag(employee_id))
+    await publish(db, EventType.EMPLOYEE_DELETED.value, employee["company_id"], employee_id, {"id": employee_id})
@@ -0,0 +1,145 @@
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
+from fastapi.responses import StreamingResponse, FileResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from models.export import ExportJob, ExportRequest, ExportKind, ExportFormat, ExportStatus
+from utils.database import get_db
+from utils.auth import get_current_user
+from utils.helpers import generate_id
+from utils.pagination import PageParams, paginate
+from utils.serialization import document_response
+from utils.codec import utc_now, to_bson_date
+from utils.exports import (
+    EXPORT_TTL_HOURS, MEDIA_TYPES, FORMAT_PACKAGES,
+    export_runner, export_path, download_name, format_available, csv_stream
+)
+from datetime import date, timedelta
+from typing import List, Optional
+import os
+
+router = APIRouter(prefix="/exports", tags=["Exports"])
+
+def _check_export_role(current_user: dict):
+    if current_user["role"] not in ["super_admin", "company_admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Insufficient permissions to export data"
+        )
+
+def _export_company(current_user: dict, company_id: Optional[str]) -> str:
+    """The company an export covers: admins export their own, super admins must name one."""
+    _check_export_role(current_user)
+    if current_user["role"] != "super_admin":
+        return current_user["company_id"]
+    if not company_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="company_id is required"
+        )
+    return company_id
+
+def _check_range(start: Optional[date], end: Optional[date]):
+    if start and end and end < start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end_date must not be before start_date"
+        )
+
+async def _get_job(db: AsyncIOMotorDatabase, job_id: str, current_user: dict) -> dict:
+    query = {"id": job_id}
+    if current_user["role"] != "super_admin":
+        query["company_id"] = current_user["company_id"]
+    job = await db.export_jobs.find_one(query, {"_id": 0})
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Export not found"
+        )
+    return job
+
+@router.get("/stream")
+async def stream_export(
+    kind: ExportKind = Query(...),
+    company_id: Optional[str] = Query(None),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """CSV of every record in range, streamed as it is read (no job, no file)."""
+    company_id = _export_company(current_user, company_id)
+    _check_range(start_date, end_date)
+    filename = download_name({"kind": kind.value, "format": "csv", "start_date": start_date, "end_date": end_date})
+    return StreamingResponse(
+        csv_stream(db, kind, company_id, start_date, end_date),
+        media_type=MEDIA_TYPES[ExportFormat.CSV],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.post("", response_model=ExportJob, status_code=status.HTTP_202_ACCEPTED)
+async def create_export(request: ExportRequest, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
+    """Start a background export; poll GET /exports/{id} and download when completed."""
+    company_id = _export_company(current_user, request.company_id)
+    _check_range(request.start_date, request.end_date)
+    if not format_available(request.format):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{request.format.value} exports need the {FORMAT_PACKAGES[request.format]} package"
+        )
+
+    now = utc_now()
+    job = {
+        "id": generate_id(),
+        "company_id": company_id,
+        "kind": request.kind.value,
+        "format": request.format.value,
+        "start_date": to_bson_date(request.start_date),
+        "end_date": to_bson_date(request.end_date),
+        "status": ExportStatus.QUEUED.value,
+        "rows_total": None,
+        "rows_written": 0,
+        "file_size": None,
+        "error": None,
+        "created_by": current_user["sub"],
+        "created_at": now,
+        "updated_at": now,
+        "started_at": None,
+        "finished_at": None,
+        "expires_at": now + timedelta(hours=EXPORT_TTL_HOURS),
+    }
+    await db.export_jobs.insert_one(job)
+    job.pop("_id", None)
+    export_runner.submit(db, job)
+    return document_response(ExportJob, job, status_code=status.HTTP_202_ACCEPTED)
+
+@router.get("", response_model=List[ExportJob])
+async def list_exports(
+    response: Response,
+    company_id: Optional[str] = Query(None),
+    page: PageParams = Depends(),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    query = {"company_id": _export_company(current_user, company_id)}
+    return await paginate(db.export_jobs, query, ("created_at", -1), page, response, model=ExportJob)
+
+@router.get("/{job_id}", response_model=ExportJob)
+async def get_export(job_id: str, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
+    _check_export_role(current_user)
+    return document_response(ExportJob, await _get_job(db, job_id, current_user))
+
+@router.get("/{job_id}/download")
+async def download_export(job_id: str, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
+    _check_export_role(current_user)
+    job = await _get_job(db, job_id, current_user)
+    if job["status"] != ExportStatus.COMPLETED.value:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Export is {job['status']}"
+        )
+    path = export_path(job)
+    if not os.path.exists(path):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Export file is no longer available"
+        )
+    return FileResponse(path, media_type=MEDIA_TYPES[ExportFormat(job["format"])], filename=download_name(job))
@@ -1,44 +1,112 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
-from motor.motor_asyncio import AsyncIOMotorClient
-from models.leave import Leave, LeaveCreate, LeaveUpdate, LeaveBalance, LeaveStatus
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from models.leave import (
+    Leave, LeaveCreate, LeaveUpdate, LeaveBalance, LeaveStatus, LeaveDays,
+    LeaveLedgerEntry, LeaveAllocationCreate, CarryForwardRequest, CarryForwardResult,
+    LeaveDecisionBatch, LeaveDecisionReport
+)
+from utils.database import get_db
 from utils.auth import get_current_user
 from utils.helpers import generate_id
-from datetime import datetime, timezone
+from utils.pagination import PageParams, paginate
+from utils.serialization import document_response
+from utils.codec import utc_now, to_bson_date, parse_datetime
+from utils.leave_approvals import pending_query, report_ids, apply_decisions
+from utils.leave_calendar import leave_days, overlap_query
+from utils.leave_ledger import LEDGER_COLLECTION, allocate, debit_leave, credit_leave, carry_forward
+from utils.events import publish
+from models.webhook import EventType
+from datetime import date
 from typing import List, Optional
-import os
 
 router = APIRouter(prefix="/leaves", tags=["Leave Management"])
 
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Allowed status changes; approved leaves can still be cancelled (their days are credited back)
+STATUS_TRANSITIONS = {
+    LeaveStatus.PENDING: {LeaveStatus.APPROVED, LeaveStatus.REJECTED, LeaveStatus.CANCELLED},
+    LeaveStatus.APPROVED: {LeaveStatus.CANCELLED},
+}
+
+async def _working_days(db: AsyncIOMotorDatabase, company_id: str, start: date, end: date) -> float:
+    if end < start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end_date must not be before start_date"
+        )
+    return await leave_days(db, company_id, start, end)
+
+def _overlap_error() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Leave overlaps an existing pending or approved leave"
+    )
 
 @router.post("", response_model=Leave, status_code=status.HTTP_201_CREATED)
-async def create_leave(leave_data: LeaveCreate, current_user: dict = Depends(get_current_user)):
+async def create_leave(leave_data: LeaveCreate, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
+    days_count = await _working_days(db, leave_data.company_id, leave_data.start_date, leave_data.end_date)
+    if days_count == 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Leave covers no working days"
+        )
+    overlaps = overlap_query(leave_data.employee_id, leave_data.start_date, leave_data.end_date)
+    if await db.leaves.find_one(overlaps, {"_id": 0, "id": 1}):
+        raise _overlap_error()
+    
     leave_dict = leave_data.model_dump()
     leave_dict["id"] = generate_id()
+    leave_dict["days_count"] = days_count
     leave_dict["status"] = LeaveStatus.PENDING
     leave_dict["approved_by"] = None
     leave_dict["approved_at"] = None
     leave_dict["rejection_reason"] = None
     leave_dict["is_deleted"] = False
-    leave_dict["created_at"] = datetime.now(timezone.utc).isoformat()
-    leave_dict["updated_at"] = datetime.now(timezone.utc).isoformat()
+    leave_dict["created_at"] = utc_now()
+    leave_dict["updated_at"] = utc_now()
     
-    if leave_dict.get("start_date"):
-        leave_dict["start_date"] = leave_dict["start_date"].isoformat()
-    if leave_dict.get("end_date"):
-        leave_dict["end_date"] = leave_dict["end_date"].isoformat()
+    leave_dict["start_date"] = to_bson_date(leave_dict["start_date"])
+    leave_dict["end_date"] = to_bson_date(leave_dict["end_date"])
     
     await db.leaves.insert_one(leave_dict)
-    leave = await db.leaves.find_one({"id": leave_dict["id"]}, {"_id": 0})
-    return Leave(**leave)
+    
+    # Two requests may both have passed the check above; the later one (by created_at, id) backs out
+    rivals = await db.leaves.find(
+        {**overlaps, "id": {"$ne": leave_dict["id"]}}, {"_id": 0, "id": 1, "created_at": 1}
+    ).to_list(None)
+    if any((parse_datetime(r["created_at"]), r["id"]) < (leave_dict["created_at"], leave_dict["id"]) for r in rivals):
+        await db.leaves.delete_one({"id": leave_dict["id"]})
+        raise _overlap_error()
+    await publish(db, EventType.LEAVE_CREATED.value, leave_dict["company_id"], leave_dict["id"], leave_dict, Leave)
+    return document_response(Leave, leave_dict, status_code=status.HTTP_201_CREATED)
+
+@router.get("/days", response_model=LeaveDays)
+async def get_leave_days(
+    start_date: date,
+    end_date: date,
+    company_id: Optional[str] = Query(None),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Working days a leave from start_date to end_date would use."""
+    if current_user["role"] != "super_admin":
+        company_id = current_user["company_id"]
+    if not company_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="company_id is required"
+        )
+    days_count = await _working_days(db, company_id, start_date, end_date)
+    return document_response(LeaveDays, {"start_date": start_date, "end_date": end_date, "days_count": days_count})
 
 @router.get("", response_model=List[Leave])
 async def list_leaves(
+    response: Response,
     employee_id: Optional[str] = Query(None),
     status: Optional[LeaveStatus] = Query(None),
-    current_user: dict = Depends(get_current_user)
+    page: PageParams = Depends(),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     query = {"is_deleted": False}
     
@@ -53,53 +121,200 @@ async def list_leaves(
     if status:
         query["status"] = status
     
-    leaves = await db.leaves.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    return leaves
+    return await paginate(db.leaves, query, ("created_at", -1), page, response, model=Leave)
+
+@router.get("/inbox", response_model=List[Leave])
+async def get_approval_inbox(
+    response: Response,
+    depth: Optional[int] = Query(1, ge=1, description="Manager role: levels of reports to include (1 = direct reports)"),
+    company_id: Optional[str] = Query(None),
+    page: PageParams = Depends(),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Pending leaves awaiting the current user's decision, newest first:
+    their reports' for managers, the whole company's for admins.
+    """
+    if current_user["role"] not in ["super_admin", "company_admin", "manager"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Insufficient permissions to approve/reject leaves"
+        )
+    if current_user["role"] != "super_admin":
+        company_id = current_user["company_id"]
+    
+    employee_ids = None
+    if current_user["role"] == "manager":
+        employee_ids = await report_ids(db, company_id, current_user["employee_id"], depth) if current_user.get("employee_id") else []
+    return await paginate(db.leaves, pending_query(company_id, employee_ids), ("created_at", -1), page, response, model=Leave)
+
+@router.post("/decisions", response_model=LeaveDecisionReport)
+async def decide_leaves(batch: LeaveDecisionBatch, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
+    """
+    Approve or reject many pending leaves at once. Decisions are applied
+    independently; the report lists the ones that could not be.
+    """
+    if current_user["role"] not in ["super_admin", "company_admin", "manager"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Insufficient permissions to approve/reject leaves"
+        )
+    report = await apply_decisions(db, batch.decisions, current_user)
+    return document_response(LeaveDecisionReport, report)
 
 @router.get("/{leave_id}", response_model=Leave)
-async def get_leave(leave_id: str, current_user: dict = Depends(get_current_user)):
+async def get_leave(leave_id: str, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
     leave = await db.leaves.find_one({"id": leave_id, "is_deleted": False}, {"_id": 0})
     if not leave:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Leave request not found"
         )
-    return Leave(**leave)
+    return document_response(Leave, leave)
 
 @router.put("/{leave_id}", response_model=Leave)
-async def update_leave(leave_id: str, update_data: LeaveUpdate, current_user: dict = Depends(get_current_user)):
+async def update_leave(leave_id: str, update_data: LeaveUpdate, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
     if current_user["role"] not in ["super_admin", "company_admin", "manager"]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Insufficient permissions to approve/reject leaves"
         )
     
-    leave = await db.leaves.find_one({"id": leave_id, "is_deleted": False})
+    leave = await db.leaves.find_one({"id": leave_id, "is_deleted": False}, {"_id": 0})
     if not leave:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Leave request not found"
         )
+    current_status = LeaveStatus(leave["status"])
+    if update_data.status == current_status:
+        return document_response(Leave, leave)
+    if update_data.status not in STATUS_TRANSITIONS.get(current_status, set()):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cannot change leave status from {current_status.value} to {update_data.status.value}"
+        )
     
     update_dict = update_data.model_dump()
-    update_dict["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_dict["updated_at"] = utc_now()
     
     if update_data.status == LeaveStatus.APPROVED:
         update_dict["approved_by"] = current_user["sub"]
-        update_dict["approved_at"] = datetime.now(timezone.utc).isoformat()
+        update_dict["approved_at"] = utc_now()
     
-    await db.leaves.update_one(
-        {"id": leave_id},
-        {"$set": update_dict}
+    # Claim the transition first so two approvers cannot both debit the balance
+    updated_leave = await db.leaves.find_one_and_update(
+        {"id": leave_id, "is_deleted": False, "status": current_status.value},
+        {"$set": update_dict},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
+    if not updated_leave:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Leave request was changed concurrently; reload and try again"
+        )
     
-    updated_leave = await db.leaves.find_one({"id": leave_id}, {"_id": 0})
-    return Leave(**updated_leave)
+    if update_data.status == LeaveStatus.APPROVED:
+        if not await debit_leave(db, updated_leave, current_user["sub"]):
+            await db.leaves.update_one(
+                {"id": leave_id, "status": LeaveStatus.APPROVED.value},
+                {"$set": {"status": current_status.value, "approved_by": leave.get("approved_by"),
+                          "approved_at": leave.get("approved_at"), "updated_at": utc_now()}}
+            )
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Insufficient leave balance"
+            )
+    elif current_status == LeaveStatus.APPROVED:
+        await credit_leave(db, updated_leave, current_user["sub"])
+    # Leave status and event names match: leave.approved, leave.rejected, leave.cancelled
+    await publish(db, f"leave.{update_data.status.value}", updated_leave["company_id"], leave_id, updated_leave, Leave)
+    return document_response(Leave, updated_leave)
+
+def _scope_company(current_user: dict, company_id: Optional[str]) -> Optional[str]:
+    if current_user["role"] != "super_admin":
+        return current_user["company_id"]
+    return company_id
+
+async def _check_employee_access(db: AsyncIOMotorDatabase, employee_id: str, current_user: dict) -> dict:
+    # Employees only see their own records; employee_id is resolved from the user record when the token lacks it
+    if current_user["role"] == "employee" and (not current_user.get("employee_id") or current_user["employee_id"] != employee_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied"
+        )
+    employee = await db.employees.find_one({"id": employee_id, "is_deleted": False}, {"_id": 0, "id": 1, "company_id": 1})
+    if not employee:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Employee not found"
+        )
+    if current_user["role"] != "super_admin" and current_user["company_id"] != employee["company_id"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied"
+        )
+    return employee
+
+@router.post("/balance/allocate", response_model=LeaveBalance)
+async def allocate_leave(allocation: LeaveAllocationCreate, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
+    if current_user["role"] not in ["super_admin", "company_admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Insufficient permissions to allocate leave"
+        )
+    employee = await _check_employee_access(db, allocation.employee_id, current_user)
+    balance = await allocate(
+        db, employee["id"], employee["company_id"], allocation.year, allocation.leave_type,
+        allocation.days, note=allocation.note, created_by=current_user["sub"]
+    )
+    return document_response(LeaveBalance, balance)
+
+@router.post("/balance/carry-forward", response_model=CarryForwardResult)
+async def carry_forward_balances(request: CarryForwardRequest, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
+    """Move up to max_days of every remaining from_year balance into the next year."""
+    if current_user["role"] not in ["super_admin", "company_admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Insufficient permissions to carry forward leave"
+        )
+    company_id = _scope_company(current_user, request.company_id)
+    if not company_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="company_id is required"
+        )
+    result = await carry_forward(db, company_id, request.from_year, request.leave_type, request.max_days, current_user["sub"])
+    return document_response(CarryForwardResult, result)
 
 @router.get("/balance/{employee_id}", response_model=List[LeaveBalance])
-async def get_leave_balance(employee_id: str, year: int = Query(2025), current_user: dict = Depends(get_current_user)):
+async def get_leave_balance(
+    employee_id: str,
+    year: Optional[int] = Query(None, description="Defaults to the current year"),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    await _check_employee_access(db, employee_id, current_user)
     balances = await db.leave_balances.find(
-        {"employee_id": employee_id, "year": year},
+        {"employee_id": employee_id, "year": year or utc_now().year},
         {"_id": 0}
     ).to_list(100)
-    return balances
+    return document_response(LeaveBalance, balances)
+
+@router.get("/ledger/{employee_id}", response_model=List[LeaveLedgerEntry])
+async def get_leave_ledger(
+    employee_id: str,
+    response: Response,
+    year: Optional[int] = Query(None),
+    page: PageParams = Depends(),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Every change to the employee's balances, newest first."""
+    await _check_employee_access(db, employee_id, current_user)
+    query = {"employee_id": employee_id}
+    if year is not None:
+        query["year"] = year
+    return await paginate(db[LEDGER_COLLECTION], query, ("created_at", -1), page, response, model=LeaveLedgerEntry)
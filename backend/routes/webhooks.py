@@ -0,0 +1,110 @@
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from models.webhook import Webhook, WebhookCreate, WebhookWithSecret
+from utils.database import get_db
+from utils.auth import get_current_user
+from utils.helpers import generate_id
+from utils.pagination import PageParams, paginate
+from utils.serialization import document_response
+from utils.events import webhook_url_error
+from utils.codec import utc_now
+from typing import List, Optional
+import secrets
+
+router = APIRouter(prefix="/webhooks", tags=["Webhooks"])
+
+def _check_webhook_role(current_user: dict):
+    if current_user["role"] not in ["super_admin", "company_admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Insufficient permissions to manage webhooks"
+        )
+
+def _webhook_company(current_user: dict, company_id: Optional[str]) -> str:
+    """Admins manage their own company's webhooks, super admins must name one."""
+    _check_webhook_role(current_user)
+    if current_user["role"] != "super_admin":
+        return current_user["company_id"]
+    if not company_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="company_id is required"
+        )
+    return company_id
+
+def _webhook_query(current_user: dict, webhook_id: str) -> dict:
+    _check_webhook_role(current_user)
+    query = {"id": webhook_id, "is_deleted": False}
+    if current_user["role"] != "super_admin":
+        query["company_id"] = current_user["company_id"]
+    return query
+
+@router.post("", response_model=WebhookWithSecret, status_code=status.HTTP_201_CREATED)
+async def create_webhook(webhook_data: WebhookCreate, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
+    """
+    Register a URL to receive the company's events. The response carries the
+    signing secret, which is not shown again.
+    """
+    company_id = _webhook_company(current_user, webhook_data.company_id)
+    error = await webhook_url_error(str(webhook_data.url))
+    if error:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=error
+        )
+    webhook_dict = {
+        "id": generate_id(),
+        "company_id": company_id,
+        "url": str(webhook_data.url),
+        "event_types": [t.value for t in webhook_data.event_types],
+        "description": webhook_data.description,
+        "secret": secrets.token_urlsafe(32),
+        "active": True,
+        "failures": 0,
+        "last_delivery_at": None,
+        "last_error": None,
+        "last_error_at": None,
+        "is_deleted": False,
+        "created_by": current_user["sub"],
+        "created_at": utc_now(),
+        "updated_at": utc_now(),
+    }
+    await db.webhooks.insert_one(webhook_dict)
+    return document_response(WebhookWithSecret, webhook_dict, status_code=status.HTTP_201_CREATED)
+
+@router.get("", response_model=List[Webhook])
+async def list_webhooks(
+    response: Response,
+    company_id: Optional[str] = Query(None),
+    page: PageParams = Depends(),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    query = {"company_id": _webhook_company(current_user, company_id), "is_deleted": False}
+    return await paginate(db.webhooks, query, ("created_at", 1), page, response, {"_id": 0, "secret": 0}, model=Webhook)
+
+@router.post("/{webhook_id}/enable", response_model=Webhook)
+async def enable_webhook(webhook_id: str, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
+    """Resume deliveries to a webhook switched off after repeated failures."""
+    webhook = await db.webhooks.find_one_and_update(
+        _webhook_query(current_user, webhook_id),
+        {"$set": {"active": True, "failures": 0, "updated_at": utc_now()}},
+        projection={"_id": 0, "secret": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if not webhook:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Webhook not found"
+        )
+    return document_response(Webhook, webhook)
+
+@router.delete("/{webhook_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_webhook(webhook_id: str, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_db)):
+    result = await db.webhooks.update_one(_webhook_query(current_user, webhook_id), {"$set": {"is_deleted": True, "active": False, "updated_at": utc_now()}})
+    if result.matched_count == 0:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Webhook not found"
+        )
@@ -2,6 +2,10 @@ import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
 from utils.auth import get_password_hash
 from utils.helpers import generate_id
+from utils.codec import utc_now, to_bson_date
+from utils.employee_search import search_keys
+from utils.leave_ledger import allocate, reconcile_balances
+from utils.attendance_store import attendance_store
 from datetime import datetime, date, timedelta, timezone
 import os
 from dotenv import load_dotenv
@@ -27,8 +31,8 @@ async def seed_database():
         "employee_id": None,
         "is_active": True,
         "is_deleted": False,
-        "created_at": datetime.now(timezone.utc).isoformat(),
-        "updated_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utc_now(),
+        "updated_at": utc_now()
     }
     await db.users.insert_one(super_admin)
     print(f"✓ Created super admin: {super_admin['email']}")
@@ -47,8 +51,8 @@ async def seed_database():
         "website": "https://techcorp.com",
         "is_active": True,
         "is_deleted": False,
-        "created_at": datetime.now(timezone.utc).isoformat(),
-        "updated_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utc_now(),
+        "updated_at": utc_now()
     }
     await db.companies.insert_one(company)
     print(f"✓ Created company: {company['name']}")
@@ -64,8 +68,8 @@ async def seed_database():
             "phone": "+1-555-0100",
             "is_active": True,
             "is_deleted": False,
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "updated_at": datetime.now(timezone.utc).isoformat()
+            "created_at": utc_now(),
+            "updated_at": utc_now()
         },
         {
             "id": generate_id(),
@@ -76,8 +80,8 @@ async def seed_database():
             "phone": "+1-555-0200",
             "is_active": True,
             "is_deleted": False,
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "updated_at": datetime.now(timezone.utc).isoformat()
+            "created_at": utc_now(),
+            "updated_at": utc_now()
         }
     ]
     await db.branches.insert_many(branches)
@@ -94,8 +98,8 @@ async def seed_database():
             "manager_id": None,
             "is_active": True,
             "is_deleted": False,
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "updated_at": datetime.now(timezone.utc).isoformat()
+            "created_at": utc_now(),
+            "updated_at": utc_now()
         },
         {
             "id": generate_id(),
@@ -106,8 +110,8 @@ async def seed_database():
             "manager_id": None,
             "is_active": True,
             "is_deleted": False,
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "updated_at": datetime.now(timezone.utc).isoformat()
+            "created_at": utc_now(),
+            "updated_at": utc_now()
         },
         {
             "id": generate_id(),
@@ -118,8 +122,8 @@ async def seed_database():
             "manager_id": None,
             "is_active": True,
             "is_deleted": False,
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "updated_at": datetime.now(timezone.utc).isoformat()
+            "created_at": utc_now(),
+            "updated_at": utc_now()
         }
     ]
     await db.departments.insert_many(departments)
@@ -135,7 +139,7 @@ async def seed_database():
             "last_name": "Doe",
             "email": "john.doe@techcorp.com",
             "phone": "+1-555-1001",
-            "date_of_birth": "1990-05-15",
+            "date_of_birth": to_bson_date("1990-05-15"),
             "gender": "male",
             "nationality": "American",
             "address": "789 Main St, San Francisco, CA",
@@ -144,10 +148,10 @@ async def seed_database():
             "branch_id": branches[0]["id"],
             "employment_type": "full_time",
             "employment_status": "active",
-            "date_of_joining": "2020-01-15",
+            "date_of_joining": to_bson_date("2020-01-15"),
             "is_deleted": False,
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "updated_at": datetime.now(timezone.utc).isoformat()
+            "created_at": utc_now(),
+            "updated_at": utc_now()
         },
         {
             "id": generate_id(),
@@ -157,7 +161,7 @@ async def seed_database():
             "last_name": "Smith",
             "email": "jane.smith@techcorp.com",
             "phone": "+1-555-1002",
-            "date_of_birth": "1988-08-22",
+            "date_of_birth": to_bson_date("1988-08-22"),
             "gender": "female",
             "nationality": "American",
             "address": "456 Oak Ave, San Francisco, CA",
@@ -166,10 +170,10 @@ async def seed_database():
             "branch_id": branches[0]["id"],
             "employment_type": "full_time",
             "employment_status": "active",
-            "date_of_joining": "2019-03-10",
+            "date_of_joining": to_bson_date("2019-03-10"),
             "is_deleted": False,
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "updated_at": datetime.now(timezone.utc).isoformat()
+            "created_at": utc_now(),
+            "updated_at": utc_now()
         },
         {
             "id": generate_id(),
@@ -179,7 +183,7 @@ async def seed_database():
             "last_name": "Johnson",
             "email": "mike.johnson@techcorp.com",
             "phone": "+1-555-1003",
-            "date_of_birth": "1992-03-18",
+            "date_of_birth": to_bson_date("1992-03-18"),
             "gender": "male",
             "nationality": "American",
             "address": "321 Pine St, San Francisco, CA",
@@ -188,12 +192,16 @@ async def seed_database():
             "branch_id": branches[0]["id"],
             "employment_type": "full_time",
             "employment_status": "active",
-            "date_of_joining": "2021-06-01",
+            "date_of_joining": to_bson_date("2021-06-01"),
             "is_deleted": False,
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "updated_at": datetime.now(timezone.utc).isoformat()
+            "created_at": utc_now(),
+            "updated_at": utc_now()
         }
     ]
+    for emp in employees:
+        emp["search_keys"] = search_keys(emp)
+        emp["manager_path"] = []
+        emp["manager_depth"] = 0
     await db.employees.insert_many(employees)
     print(f"✓ Created {len(employees)} employees")
     
@@ -207,8 +215,8 @@ async def seed_database():
         "employee_id": employees[1]["id"],
         "is_active": True,
         "is_deleted": False,
-        "created_at": datetime.now(timezone.utc).isoformat(),
-        "updated_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utc_now(),
+        "updated_at": utc_now()
     }
     await db.users.insert_one(company_admin)
     print(f"✓ Created company admin: {company_admin['email']}")
@@ -223,8 +231,8 @@ async def seed_database():
         "employee_id": employees[0]["id"],
         "is_active": True,
         "is_deleted": False,
-        "created_at": datetime.now(timezone.utc).isoformat(),
-        "updated_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utc_now(),
+        "updated_at": utc_now()
     }
     await db.users.insert_one(employee_user)
     print(f"✓ Created employee user: {employee_user['email']}")
@@ -239,18 +247,18 @@ async def seed_database():
                 "id": generate_id(),
                 "employee_id": emp["id"],
                 "company_id": company["id"],
-                "date": record_date.isoformat(),
-                "clock_in": datetime.combine(record_date, datetime.min.time().replace(hour=9, minute=0)).isoformat(),
-                "clock_out": datetime.combine(record_date, datetime.min.time().replace(hour=17, minute=30)).isoformat(),
+                "date": to_bson_date(record_date),
+                "clock_in": datetime.combine(record_date, datetime.min.time().replace(hour=9, minute=0), tzinfo=timezone.utc),
+                "clock_out": datetime.combine(record_date, datetime.min.time().replace(hour=17, minute=30), tzinfo=timezone.utc),
                 "shift_type": "morning",
                 "status": "present",
                 "working_hours": 8.5,
                 "overtime_hours": 0.5,
                 "is_deleted": False,
-                "created_at": datetime.now(timezone.utc).isoformat(),
-                "updated_at": datetime.now(timezone.utc).isoformat()
+                "created_at": utc_now(),
+                "updated_at": utc_now()
             })
-    await db.attendance.insert_many(attendance_records)
+    await attendance_store.insert_many(db, attendance_records)
     print(f"✓ Created {len(attendance_records)} attendance records")
     
     # Create Sample Leave Requests
@@ -260,35 +268,44 @@ async def seed_database():
             "employee_id": employees[0]["id"],
             "company_id": company["id"],
             "leave_type": "annual",
-            "start_date": (today + timedelta(days=10)).isoformat(),
-            "end_date": (today + timedelta(days=12)).isoformat(),
+            "start_date": to_bson_date(today + timedelta(days=10)),
+            "end_date": to_bson_date(today + timedelta(days=12)),
             "days_count": 3,
             "reason": "Family vacation",
             "status": "pending",
             "is_deleted": False,
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "updated_at": datetime.now(timezone.utc).isoformat()
+            "created_at": utc_now(),
+            "updated_at": utc_now()
         },
         {
             "id": generate_id(),
             "employee_id": employees[2]["id"],
             "company_id": company["id"],
             "leave_type": "sick",
-            "start_date": (today - timedelta(days=2)).isoformat(),
-            "end_date": (today - timedelta(days=2)).isoformat(),
+            "start_date": to_bson_date(today - timedelta(days=2)),
+            "end_date": to_bson_date(today - timedelta(days=2)),
             "days_count": 1,
             "reason": "Medical appointment",
             "status": "approved",
             "approved_by": company_admin["id"],
-            "approved_at": datetime.now(timezone.utc).isoformat(),
+            "approved_at": utc_now(),
             "is_deleted": False,
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "updated_at": datetime.now(timezone.utc).isoformat()
+            "created_at": utc_now(),
+            "updated_at": utc_now()
         }
     ]
     await db.leaves.insert_many(leave_requests)
     print(f"✓ Created {len(leave_requests)} leave requests")
     
+    # Allocate this year's leave and post usage for the approved request
+    allocations = {"annual": 20, "sick": 10, "casual": 6}
+    for employee in employees:
+        for leave_type, days in allocations.items():
+            await allocate(db, employee["id"], company["id"], today.year, leave_type, days,
+                           note="Annual allocation", created_by=company_admin["id"])
+    await reconcile_balances(db, company["id"])
+    print(f"✓ Allocated leave balances for {len(employees)} employees")
+    
     print("\n✅ Database seeding completed successfully!")
     print("\n📋 Demo Credentials:")
     print("   Super Admin: admin@nexushr.com / password123")
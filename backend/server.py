@@ -1,7 +1,7 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from contextlib import asynccontextmanager
 import os
 import logging
 from pathlib import Path
@@ -20,12 +20,45 @@ for var in REQUIRED_ENV_VARS:
     if var not in os.environ:
         raise RuntimeError(f"Missing required environment variable: {var}")
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+from utils.database import connect_to_mongo, close_mongo_connection, get_client
+from utils.indexes import ensure_indexes
+from utils.auth import password_pool, token_cache, get_current_user, subscribe_token_cache
+from utils.org_cache import org_cache
+from utils.exports import export_runner
+from utils.entity_cache import entity_cache, subscribe_entity_cache
+from utils.events import event_bus, webhook_dispatcher
+from utils.attendance_board import attendance_board
 
-app = FastAPI(title="Nexus HR API", version="1.0.0")
+# MongoDB connection: one pooled client per process, owned by the lifespan
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    db = connect_to_mongo()
+    if os.environ.get('MONGO_ENSURE_INDEXES', 'true').lower() == 'true':
+        try:
+            await ensure_indexes(db)
+        except Exception as e:
+            logging.getLogger(__name__).error("Index bootstrap failed: %s", e)
+    if os.environ.get('ORG_CACHE_WATCH', 'true').lower() == 'true':
+        org_cache.start_watcher(db)
+    if os.environ.get('EVENTS_ENABLED', 'true').lower() == 'true':
+        subscribe_entity_cache(event_bus)
+        subscribe_token_cache(event_bus)
+        attendance_board.subscribe_to(event_bus)
+        event_bus.start(db)
+        if os.environ.get('WEBHOOKS_ENABLED', 'true').lower() == 'true':
+            webhook_dispatcher.start(db)
+    try:
+        yield
+    finally:
+        await org_cache.stop_watcher()
+        await webhook_dispatcher.stop()
+        await event_bus.stop()
+        await export_runner.shutdown()
+        await entity_cache.close()
+        password_pool.shutdown()
+        close_mongo_connection()
+
+app = FastAPI(title="Nexus HR API", version="1.0.0", lifespan=lifespan)
 api_router = APIRouter(prefix="/api")
 
 # --- ADDED: DETAILED HEALTH CHECK ---
@@ -39,7 +72,7 @@ async def health_check():
     
     try:
         # The 'ping' command is the fastest way to check MongoDB connectivity
-        await client.admin.command('ping')
+        await get_client().admin.command('ping')
         health_status["database"] = "connected"
     except Exception as e:
         health_status["status"] = "unstable"
@@ -47,18 +80,39 @@ async def health_check():
         
     return health_status
 
+@api_router.get("/health-check/stats")
+async def health_stats(current_user: dict = Depends(get_current_user)):
+    """Cache and live-board counters of this worker; super admins only."""
+    if current_user["role"] != "super_admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Insufficient permissions"
+        )
+    return {
+        "token_cache": token_cache.stats(),
+        "org_cache": org_cache.stats(),
+        "entity_cache": entity_cache.stats(),
+        "attendance_board": attendance_board.stats()
+    }
+
 # Import and Include routes (unchanged)
 from routes.auth import router as auth_router
 from routes.companies import router as companies_router
 from routes.employees import router as employees_router
 from routes.attendance import router as attendance_router
 from routes.leaves import router as leaves_router
+from routes.dashboard import router as dashboard_router
+from routes.exports import router as exports_router
+from routes.webhooks import router as webhooks_router
 
 api_router.include_router(auth_router)
 api_router.include_router(companies_router)
 api_router.include_router(employees_router)
 api_router.include_router(attendance_router)
 api_router.include_router(leaves_router)
+api_router.include_router(dashboard_router)
+api_router.include_router(exports_router)
+api_router.include_router(webhooks_router)
 
 app.include_router(api_router)
 
@@ -68,11 +122,8 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Content-Disposition"],
 )
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
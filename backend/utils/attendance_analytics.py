@@ -0,0 +1,262 @@
+"""
+Attendance analytics: lateness, overtime and absenteeism over a date range.
+
+A report loads the company's attendance for the range with one projected
+aggregation (through utils.attendance_store, so both storage layouts work)
+into columnar pandas/NumPy arrays and computes every metric with vectorised
+operations. There is no per-record Python arithmetic, so a report over
+millions of records costs a few array passes. The computation runs on a
+worker thread so the event loop keeps serving requests.
+
+Definitions:
+- hours worked: working_hours as stored, else clock_out - clock_in;
+- overtime: hours worked beyond `overtime_threshold` (STANDARD_WORKING_HOURS
+  by default), per record;
+- lateness: clock-in in the company's timezone against the start of the
+  record's shift (ATTENDANCE_SHIFT_STARTS); arrivals more than
+  LATE_GRACE_MINUTES after it are late. Flexible shifts are never late;
+- absenteeism: the employee's expected working days (company working days
+  minus holidays, from their joining date up to today at the latest) less
+  days attended (half days count 0.5) and approved leave days, over the
+  expected days.
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from models.attendance import AttendanceStatus, ShiftType
+from models.company import DEFAULT_WORKING_DAYS
+from models.leave import LeaveStatus
+from utils.attendance_store import attendance_store
+from utils.codec import date_range
+from utils.helpers import STANDARD_WORKING_HOURS
+from utils.leave_calendar import holidays_between
+from utils.org_cache import org_cache
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import asyncio
+import logging
+import os
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+REPORT_BATCH_SIZE = 10000
+MAX_REPORT_DAYS = 366
+LATE_GRACE_MINUTES = float(os.environ.get("LATE_GRACE_MINUTES", 10))
+
+def _shift_starts(spec: str) -> Dict[str, float]:
+    """"morning=09:00,evening=14:00" -> {"morning": 540.0, ...} (minutes after midnight)."""
+    starts = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        try:
+            shift, clock = item.split("=")
+            hours, minutes = clock.split(":")
+            starts[ShiftType(shift.strip()).value] = int(hours) * 60 + int(minutes)
+        except ValueError:
+            logger.warning("Ignoring invalid ATTENDANCE_SHIFT_STARTS entry %r", item)
+    return starts
+
+SHIFT_STARTS = _shift_starts(os.environ.get("ATTENDANCE_SHIFT_STARTS", "morning=09:00,evening=14:00,night=22:00"))
+
+RECORD_FIELDS = ("employee_id", "clock_in", "clock_out", "shift_type", "status", "working_hours")
+EMPLOYEE_FIELDS = ("id", "first_name", "last_name", "department_id", "branch_id", "date_of_joining")
+# Summed per group; the rates are derived from them afterwards
+TOTALS = (
+    "records", "hours_worked", "overtime_hours", "arrivals", "late_arrivals", "late_minutes",
+    "expected_days", "days_attended", "leave_days", "absent_days",
+)
+# Reported as integers; pandas turns them into floats along the way
+COUNTS = ("employees", "records", "arrivals", "late_arrivals")
+
+async def _columns(cursor, fields) -> Dict[str, list]:
+    columns = {field: [] for field in fields}
+    async for doc in cursor:
+        for field in fields:
+            columns[field].append(doc.get(field))
+    return columns
+
+def _timestamps(values: pd.Series) -> pd.Series:
+    # Stored as BSON datetimes, or ISO strings in databases not yet migrated
+    return pd.to_datetime(values, utc=True, format="ISO8601")
+
+def _dates(values: pd.Series) -> pd.Series:
+    return _timestamps(values).dt.tz_localize(None).dt.normalize()
+
+def _timezone(name: Optional[str]) -> str:
+    try:
+        ZoneInfo(name or "UTC")
+        return name or "UTC"
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning("Unknown company timezone %r; using UTC", name)
+        return "UTC"
+
+def working_calendar(start: date, end: date, working_days, holidays) -> np.ndarray:
+    """Cumulative working-day counts: cal[i] = working days in the first i days of [start, end]."""
+    n = (end - start).days + 1
+    weekdays = (start.weekday() + np.arange(n)) % 7
+    working = np.isin(weekdays, list(working_days))
+    holiday_index = [(h - start).days for h in holidays if start <= h <= end]
+    working[holiday_index] = False
+    return np.concatenate([[0], np.cumsum(working)])
+
+def _day_index(values: pd.Series, start: date, n: int, offset: int = 0) -> np.ndarray:
+    """Position of each date in [start, start + n), clipped to [0, n]; missing dates map to 0."""
+    days = (values - pd.Timestamp(start)).dt.days.fillna(0).to_numpy(dtype=np.int64) + offset
+    return np.clip(days, 0, n)
+
+def employee_metrics(
+    records: pd.DataFrame,
+    employees: pd.DataFrame,
+    leaves: pd.DataFrame,
+    calendar: np.ndarray,
+    start: date,
+    tz: str,
+    overtime_threshold: float,
+    shift_starts: Dict[str, float],
+    grace_minutes: float,
+    until: Optional[date] = None,
+) -> pd.DataFrame:
+    """
+    One row per employee with the TOTALS columns. Expected and leave days
+    stop at `until` (e.g. today in a range that runs into the future).
+    """
+    n = len(calendar) - 1
+    cutoff = n if until is None else int(np.clip((until - start).days + 1, 0, n))
+
+    clock_in = _timestamps(records["clock_in"])
+    clock_out = _timestamps(records["clock_out"])
+    stored = pd.to_numeric(records["working_hours"], errors="coerce")
+    hours = stored.fillna((clock_out - clock_in).dt.total_seconds() / 3600).fillna(0.0)
+
+    local = clock_in.dt.tz_convert(tz)
+    minutes = local.dt.hour * 60 + local.dt.minute + local.dt.second / 60
+    shift_start = records["shift_type"].map(shift_starts)
+    # Wrap into [-12h, +12h) so a night shift clock-in after midnight is a little late, not 22 hours early
+    late_by = ((minutes - shift_start + 720) % 1440) - 720
+    arrived = late_by.notna()
+    late = arrived & (late_by > grace_minutes)
+
+    status = records["status"]
+    attended = np.select(
+        [status == AttendanceStatus.PRESENT.value, status == AttendanceStatus.HALF_DAY.value],
+        [1.0, 0.5], 0.0
+    )
+
+    per_record = pd.DataFrame({
+        "employee_id": records["employee_id"],
+        "records": 1,
+        "hours_worked": hours,
+        "overtime_hours": (hours - overtime_threshold).clip(lower=0.0),
+        "arrivals": arrived.astype(np.int64),
+        "late_arrivals": late.astype(np.int64),
+        "late_minutes": late_by.where(late, 0.0),
+        "days_attended": attended,
+    })
+    metrics = per_record.groupby("employee_id").sum()
+
+    # Expected days from the joining date (or the range start) to the cutoff
+    joined = np.minimum(_day_index(_dates(employees["date_of_joining"]), start, n), cutoff)
+    expected = pd.Series(calendar[cutoff] - calendar[joined], index=employees["id"], name="expected_days")
+
+    leave_days = pd.Series(dtype=float, name="leave_days")
+    if len(leaves):
+        first = np.minimum(_day_index(_dates(leaves["start_date"]), start, n), cutoff)
+        last = np.minimum(_day_index(_dates(leaves["end_date"]), start, n, offset=1), cutoff)
+        leave_days = pd.Series(calendar[last] - calendar[first], index=leaves["employee_id"]).groupby(level=0).sum()
+
+    metrics = metrics.join(expected, how="outer").join(leave_days.rename("leave_days"), how="left")
+    metrics = metrics.fillna(0.0)
+    metrics["absent_days"] = (metrics["expected_days"] - metrics["days_attended"] - metrics["leave_days"]).clip(lower=0.0)
+    metrics.index.name = "employee_id"
+    return metrics[list(TOTALS)]
+
+def _rates(frame: pd.DataFrame) -> pd.DataFrame:
+    def ratio(numerator: str, denominator: str) -> pd.Series:
+        return (frame[numerator] / frame[denominator].where(frame[denominator] > 0)).fillna(0.0)
+
+    frame["late_rate"] = ratio("late_arrivals", "arrivals")
+    frame["avg_late_minutes"] = ratio("late_minutes", "late_arrivals")
+    frame["absenteeism_rate"] = ratio("absent_days", "expected_days")
+    return frame.drop(columns="late_minutes").round(4)
+
+def _counts(values: dict) -> dict:
+    return {**values, **{field: int(values[field]) for field in COUNTS}}
+
+def rollup(metrics: pd.DataFrame, employees: pd.DataFrame, group_by: str, labels: Dict[str, str]) -> Tuple[dict, List[dict]]:
+    """(company totals, one row per group) from employee_metrics()."""
+    active = metrics[(metrics["records"] > 0) | (metrics["expected_days"] > 0)]
+    totals = _rates(active.sum().to_frame().T).iloc[0].to_dict()
+    totals["employees"] = len(active)
+
+    keys = active.index.to_series()
+    if group_by != "employee":
+        keys = keys.map(employees.set_index("id")[f"{group_by}_id"])
+    grouped = active.groupby(keys.fillna(""), sort=False)
+    rows = _rates(grouped.sum())
+    rows["employees"] = grouped.size()
+
+    out = []
+    for group_id, row in rows.sort_values("hours_worked", ascending=False).iterrows():
+        out.append({"group_id": group_id or None, "name": labels.get(group_id, "Unassigned"), **_counts(row.to_dict())})
+    return _counts(totals), out
+
+async def attendance_report(
+    db: AsyncIOMotorDatabase,
+    company_id: str,
+    start: date,
+    end: date,
+    group_by: str = "department",
+    overtime_threshold: float = STANDARD_WORKING_HOURS,
+) -> dict:
+    company = await db.companies.find_one({"id": company_id}, {"_id": 0, "timezone": 1, "working_days": 1}) or {}
+    match = {"company_id": company_id, "is_deleted": False}
+
+    pipeline = [
+        *attendance_store.record_pipeline(match, start, end),
+        {"$project": {"_id": 0, **{field: 1 for field in RECORD_FIELDS}}},
+    ]
+    records = pd.DataFrame(await _columns(
+        db[attendance_store.collection].aggregate(pipeline, batchSize=REPORT_BATCH_SIZE), RECORD_FIELDS
+    ))
+    employees = pd.DataFrame(await _columns(
+        db.employees.find(match, {"_id": 0, **{field: 1 for field in EMPLOYEE_FIELDS}}).batch_size(REPORT_BATCH_SIZE),
+        EMPLOYEE_FIELDS
+    ))
+    leaves = pd.DataFrame(await _columns(
+        db.leaves.find(
+            {**match, "status": LeaveStatus.APPROVED.value,
+             "$and": [date_range("start_date", end=end), date_range("end_date", start=start)]},
+            {"_id": 0, "employee_id": 1, "start_date": 1, "end_date": 1}
+        ),
+        ("employee_id", "start_date", "end_date")
+    ))
+    holidays = await holidays_between(db, company_id, start, end)
+
+    if group_by == "employee":
+        labels = {
+            e["id"]: " ".join(part for part in (e["first_name"], e["last_name"]) if part)
+            for e in employees.to_dict("records")
+        }
+    else:
+        snapshot = await org_cache.get(db, company_id)
+        groups = snapshot.departments_by_id if group_by == "department" else snapshot.branches_by_id
+        labels = {group_id: group["name"] for group_id, group in groups.items()}
+
+    def compute() -> Tuple[dict, List[dict]]:
+        calendar = working_calendar(start, end, company.get("working_days") or DEFAULT_WORKING_DAYS, holidays)
+        metrics = employee_metrics(
+            records, employees, leaves, calendar, start, _timezone(company.get("timezone")),
+            overtime_threshold, SHIFT_STARTS, LATE_GRACE_MINUTES, until=min(end, date.today())
+        )
+        return rollup(metrics, employees, group_by, labels)
+
+    totals, rows = await asyncio.get_running_loop().run_in_executor(None, compute)
+    return {
+        "company_id": company_id,
+        "start_date": start,
+        "end_date": end,
+        "group_by": group_by,
+        "overtime_threshold": overtime_threshold,
+        "totals": totals,
+        "rows": rows,
+    }
@@ -0,0 +1,139 @@
+"""
+Live attendance board: today's clock-ins and clock-outs per company, pushed
+to supervisors over Server-Sent Events.
+
+A connection starts with a `snapshot` of today's records (one compact row
+per record, read with a single projected query) and then receives a
+`delta` per clock-in, clock-out or correction. Deltas come from the event
+bus (utils/events.py), so writes made by any worker reach every worker's
+subscribers, a few seconds after the write.
+
+Each event is encoded once and the same bytes are queued to every
+subscriber of the company, so fan-out costs one put per connection. Queues
+are bounded (BOARD_QUEUE_SIZE): a subscriber that falls behind is not
+buffered without limit, its queue is dropped and it gets a fresh snapshot
+once it catches up. Idle connections get a comment line every
+BOARD_HEARTBEAT_SECONDS, which keeps proxies from closing them, and a new
+snapshot when the day changes.
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from utils.attendance_store import attendance_store
+from utils.codec import parse_datetime
+from utils.events import EventBus
+from utils.serialization import dumps
+from datetime import date
+from typing import AsyncIterator, Dict, Optional, Set
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+BOARD_QUEUE_SIZE = int(os.environ.get("BOARD_QUEUE_SIZE", 256))
+BOARD_MAX_SUBSCRIBERS = int(os.environ.get("BOARD_MAX_SUBSCRIBERS", 10000))
+BOARD_HEARTBEAT_SECONDS = float(os.environ.get("BOARD_HEARTBEAT_SECONDS", 15))
+
+BOARD_EVENTS = ("attendance.clock_in", "attendance.clock_out", "attendance.updated")
+ROW_FIELDS = ("id", "employee_id", "clock_in", "clock_out", "status", "shift_type")
+
+def board_row(record: dict) -> dict:
+    return {field: record.get(field) for field in ROW_FIELDS}
+
+def sse(event: str, data: dict, event_id: Optional[str] = None) -> bytes:
+    head = f"event: {event}\n" + (f"id: {event_id}\n" if event_id else "")
+    return head.encode() + b"data: " + dumps(data) + b"\n\n"
+
+async def snapshot(db: AsyncIOMotorDatabase, company_id: str, day: date) -> dict:
+    pipeline = [
+        *attendance_store.record_pipeline({"company_id": company_id, "is_deleted": False}, day, day),
+        {"$project": {"_id": 0, **{field: 1 for field in ROW_FIELDS}}},
+    ]
+    records = await db[attendance_store.collection].aggregate(pipeline).to_list(None)
+    return {"date": day, "records": [board_row(r) for r in records]}
+
+class Subscriber:
+    def __init__(self, company_id: str):
+        self.company_id = company_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=BOARD_QUEUE_SIZE)
+        # Set when deltas were dropped; the stream sends a snapshot instead
+        self.overflowed = False
+
+    def offer(self, message: bytes):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            # Wake the stream so it resyncs without waiting for the heartbeat
+            self.queue.put_nowait(b"")
+
+class AttendanceBoard:
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Subscriber]] = {}
+        self._count = 0
+        self.overflows = 0
+
+    def subscribe_to(self, bus: EventBus):
+        bus.subscribe(self.on_event, BOARD_EVENTS)
+
+    @property
+    def full(self) -> bool:
+        return self._count >= BOARD_MAX_SUBSCRIBERS
+
+    async def on_event(self, event: dict):
+        subscribers = self._subscribers.get(event["company_id"])
+        if not subscribers:
+            return
+        data = event["data"]
+        record_date = parse_datetime(data.get("date"))
+        if record_date is None or record_date.date() != date.today():
+            return
+        message = sse("delta", {"type": event["type"].split(".", 1)[1], **board_row(data)}, event["id"])
+        for subscriber in subscribers:
+            overflowed = subscriber.overflowed
+            subscriber.offer(message)
+            if subscriber.overflowed and not overflowed:
+                self.overflows += 1
+
+    def _add(self, subscriber: Subscriber):
+        self._subscribers.setdefault(subscriber.company_id, set()).add(subscriber)
+        self._count += 1
+
+    def _remove(self, subscriber: Subscriber):
+        subscribers = self._subscribers.get(subscriber.company_id, set())
+        subscribers.discard(subscriber)
+        if not subscribers:
+            self._subscribers.pop(subscriber.company_id, None)
+        self._count -= 1
+
+    async def stream(self, db: AsyncIOMotorDatabase, company_id: str) -> AsyncIterator[bytes]:
+        """SSE stream for one connection: a snapshot, then deltas until the client goes away."""
+        subscriber = Subscriber(company_id)
+        # Subscribe before reading the snapshot so no delta falls between the two
+        self._add(subscriber)
+        try:
+            day = date.today()
+            yield sse("snapshot", await snapshot(db, company_id, day))
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), BOARD_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    message = b": ping\n\n"
+                if subscriber.overflowed or date.today() != day:
+                    subscriber.overflowed = False
+                    while not subscriber.queue.empty():
+                        subscriber.queue.get_nowait()
+                    day = date.today()
+                    yield sse("snapshot", await snapshot(db, company_id, day))
+                    continue
+                yield message
+        finally:
+            self._remove(subscriber)
+
+    def stats(self) -> dict:
+        return {"subscribers": self._count, "companies": len(self._subscribers), "overflows": self.overflows}
+
+attendance_board = AttendanceBoard()
@@ -0,0 +1,199 @@
+"""
+Monthly attendance rollups: one document per (company_id, employee_id, year, month).
+
+Write handlers keep the rollups current by $inc-ing the difference between a
+record's contribution before and after the write. Because that is a separate
+write from the attendance update, a crash in between can leave a rollup off by
+one record; the rebuild job recomputes rollups from the stored attendance records:
+
+    python -m utils.attendance_rollups --company-id <id> [--year 2025 --month 3]
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from models.attendance import AttendanceStatus
+from utils.codec import utc_now, year_month_expression
+from utils.attendance_store import attendance_store
+from datetime import date
+import calendar
+from typing import Dict, List, Optional, Tuple
+import logging
+
+ROLLUP_COLLECTION = "attendance_rollups"
+
+# Counter fields maintained on every rollup document
+ROLLUP_FIELDS = ("records", "days_present", "half_days", "days_absent", "days_on_leave", "hours_worked", "overtime_hours")
+
+def _year_month(record: dict) -> Tuple[int, int]:
+    value = record["date"]
+    if isinstance(value, str):
+        return int(value[0:4]), int(value[5:7])
+    # Native BSON date (midnight UTC) or a date object
+    return value.year, value.month
+
+def rollup_id(company_id: str, employee_id: str, year: int, month: int) -> str:
+    # Deterministic so incremental upserts and the rebuild agree on identity
+    return f"{company_id}:{employee_id}:{year:04d}-{month:02d}"
+
+def rollup_key(record: dict) -> dict:
+    year, month = _year_month(record)
+    return {
+        "company_id": record["company_id"],
+        "employee_id": record["employee_id"],
+        "year": year,
+        "month": month,
+    }
+
+def contribution(record: Optional[dict]) -> Dict[str, float]:
+    """What a single attendance record adds to its month's rollup."""
+    if not record or record.get("is_deleted"):
+        return {field: 0 for field in ROLLUP_FIELDS}
+    record_status = record.get("status")
+    return {
+        "records": 1,
+        "days_present": 1 if record_status == AttendanceStatus.PRESENT else 0,
+        "half_days": 1 if record_status == AttendanceStatus.HALF_DAY else 0,
+        "days_absent": 1 if record_status == AttendanceStatus.ABSENT else 0,
+        "days_on_leave": 1 if record_status == AttendanceStatus.ON_LEAVE else 0,
+        "hours_worked": record.get("working_hours") or 0,
+        "overtime_hours": record.get("overtime_hours") or 0,
+    }
+
+def _upsert(key: dict, increments: Dict[str, float]) -> UpdateOne:
+    now = utc_now()
+    return UpdateOne(
+        key,
+        {
+            "$inc": increments,
+            "$set": {"updated_at": now},
+            "$setOnInsert": {"id": rollup_id(**key), "created_at": now},
+        },
+        upsert=True
+    )
+
+def rollup_operations(changes: List[Tuple[Optional[dict], Optional[dict]]]) -> List[UpdateOne]:
+    """
+    Build $inc upserts for a list of (before, after) attendance records.
+    Either side may be None (insert / delete). A record that moved to another
+    month or employee is subtracted from the old rollup and added to the new one.
+    """
+    totals: Dict[tuple, Dict[str, float]] = {}
+
+    def add(record: dict, sign: int):
+        key = tuple(rollup_key(record).items())
+        bucket = totals.setdefault(key, {field: 0 for field in ROLLUP_FIELDS})
+        for field, value in contribution(record).items():
+            bucket[field] += sign * value
+
+    for before, after in changes:
+        if before:
+            add(before, -1)
+        if after:
+            add(after, +1)
+
+    operations = []
+    for key, increments in totals.items():
+        increments = {field: round(value, 2) if isinstance(value, float) else value
+                      for field, value in increments.items() if value}
+        if increments:
+            operations.append(_upsert(dict(key), increments))
+    return operations
+
+async def apply_rollup_changes(db: AsyncIOMotorDatabase, changes: List[Tuple[Optional[dict], Optional[dict]]]):
+    operations = rollup_operations(changes)
+    if operations:
+        await db[ROLLUP_COLLECTION].bulk_write(operations, ordered=False)
+
+async def rebuild_rollups(
+    db: AsyncIOMotorDatabase,
+    company_id: Optional[str] = None,
+    year: Optional[int] = None,
+    month: Optional[int] = None,
+) -> int:
+    """
+    Recompute rollups from the attendance collection with a single
+    aggregation that $merges into the rollup collection. Existing rollups in
+    scope are removed first so employees with no remaining records drop out.
+    Returns the number of rollup documents in scope afterwards.
+    """
+    scope = {}
+    match = {"is_deleted": False}
+    start = end = None
+    if company_id:
+        scope["company_id"] = company_id
+        match["company_id"] = company_id
+    if year:
+        scope["year"] = year
+        if month:
+            scope["month"] = month
+            start = date(year, month, 1)
+            end = date(year, month, calendar.monthrange(year, month)[1])
+        else:
+            start, end = date(year, 1, 1), date(year, 12, 31)
+
+    await db[ROLLUP_COLLECTION].delete_many(scope)
+
+    now = utc_now()
+    pipeline = [
+        *attendance_store.record_pipeline(match, start, end),
+        {"$group": {
+            "_id": {
+                "company_id": "$company_id",
+                "employee_id": "$employee_id",
+                "ym": year_month_expression("date"),
+            },
+            "records": {"$sum": 1},
+            "days_present": {"$sum": {"$cond": [{"$eq": ["$status", AttendanceStatus.PRESENT.value]}, 1, 0]}},
+            "half_days": {"$sum": {"$cond": [{"$eq": ["$status", AttendanceStatus.HALF_DAY.value]}, 1, 0]}},
+            "days_absent": {"$sum": {"$cond": [{"$eq": ["$status", AttendanceStatus.ABSENT.value]}, 1, 0]}},
+            "days_on_leave": {"$sum": {"$cond": [{"$eq": ["$status", AttendanceStatus.ON_LEAVE.value]}, 1, 0]}},
+            "hours_worked": {"$sum": {"$ifNull": ["$working_hours", 0]}},
+            "overtime_hours": {"$sum": {"$ifNull": ["$overtime_hours", 0]}},
+        }},
+        {"$project": {
+            "_id": 0,
+            "id": {"$concat": ["$_id.company_id", ":", "$_id.employee_id", ":", "$_id.ym"]},
+            "company_id": "$_id.company_id",
+            "employee_id": "$_id.employee_id",
+            "year": {"$toInt": {"$substrCP": ["$_id.ym", 0, 4]}},
+            "month": {"$toInt": {"$substrCP": ["$_id.ym", 5, 2]}},
+            **{field: 1 for field in ROLLUP_FIELDS},
+            "created_at": {"$literal": now},
+            "updated_at": {"$literal": now},
+        }},
+        {"$merge": {
+            "into": ROLLUP_COLLECTION,
+            "on": ["company_id", "employee_id", "year", "month"],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert",
+        }},
+    ]
+    await db[attendance_store.collection].aggregate(pipeline).to_list(None)
+    return await db[ROLLUP_COLLECTION].count_documents(scope)
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from utils.database import connect_to_mongo, close_mongo_connection
+
+    parser = argparse.ArgumentParser(description="Rebuild monthly attendance rollups")
+    parser.add_argument("--company-id", help="limit to one company")
+    parser.add_argument("--year", type=int)
+    parser.add_argument("--month", type=int, help="requires --year")
+    args = parser.parse_args()
+    if args.month and not args.year:
+        parser.error("--month requires --year")
+
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+    logging.basicConfig(level=logging.INFO)
+
+    async def main():
+        db = connect_to_mongo()
+        try:
+            count = await rebuild_rollups(db, args.company_id, args.year, args.month)
+        finally:
+            close_mongo_connection()
+        print(f"Rebuilt {count} rollup documents")
+
+    asyncio.run(main())
@@ -0,0 +1,444 @@
+"""
+Attendance storage layouts.
+
+ATTENDANCE_STORAGE selects how day records are stored:
+
+- "documents" (default): one document per employee per day in `attendance`.
+- "buckets": one document per employee per month in `attendance_buckets`,
+  holding that month's day records in a `days` array:
+
+      {"id": "<employee_id>:2025-03", "employee_id", "company_id",
+       "month": <first day of the month>, "days": [{id, date, clock_in, ...}]}
+
+  A month of records shares one _id, one copy of employee_id/company_id and
+  one entry in each (employee_id, month) / (company_id, month) index, so the
+  collection and its indexes are far smaller and a range scan reads one
+  document per employee-month instead of one per day. Day records keep their
+  ids; clock-outs and corrections update them in place with the positional
+  operator through the unique days.id index.
+
+MongoDB time-series collections were considered, but they cannot hold the
+unique (employee, day) constraint clock-in relies on, nor the in-place
+updates of clock-out and corrections.
+
+Routes talk to `attendance_store`, which exposes the same operations for both
+layouts and always returns flat attendance records. Switch an existing
+database to buckets with
+
+    python -m utils.attendance_store [--company-id <id>] [--dry-run]
+
+then set ATTENDANCE_STORAGE=buckets and run it once more to pick up records
+written in between. The `attendance` collection is left in place.
+"""
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pydantic import BaseModel
+from pymongo import UpdateOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from utils.codec import to_bson_date, date_eq, date_range, parse_datetime, utc_now
+from utils.pagination import (
+    PageParams, paginate, encode_cursor, decode_cursor, _keyset_filter, _ndjson_lines,
+    NEXT_CURSOR_HEADER, NDJSON_MEDIA_TYPE
+)
+from utils.serialization import document_response
+from datetime import date, datetime
+from itertools import groupby
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Type, Union
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+ATTENDANCE_STORAGE = os.environ.get("ATTENDANCE_STORAGE", "documents").lower()
+BUCKET_COLLECTION = "attendance_buckets"
+# Stored once per bucket rather than on every day record
+BUCKET_FIELDS = ("employee_id", "company_id")
+
+def _as_date(value: Union[date, datetime, str]) -> date:
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+def month_start(value: Union[date, datetime, str]) -> datetime:
+    return to_bson_date(_as_date(value).replace(day=1))
+
+class DocumentStore:
+    """One document per employee per day."""
+    collection = "attendance"
+
+    def clock_in_upsert(self, record: dict) -> Tuple[dict, dict]:
+        """
+        Filter and update that insert the day's record only if the employee has
+        none yet. The unique (employee_id, date) index makes this race-free.
+        """
+        return (
+            {"employee_id": record["employee_id"], "date": date_eq(record["date"]), "is_deleted": False},
+            {"$setOnInsert": record}
+        )
+
+    def clock_in_operation(self, record: dict) -> UpdateOne:
+        return UpdateOne(*self.clock_in_upsert(record), upsert=True)
+
+    def clock_in_applied(self, upserted: bool, failed: bool) -> bool:
+        """Whether a clock_in_operation inside a bulk_write created the record."""
+        return upserted
+
+    async def clock_in(self, db: AsyncIOMotorDatabase, record: dict) -> bool:
+        query, update = self.clock_in_upsert(record)
+        try:
+            result = await db[self.collection].update_one(query, update, upsert=True)
+        except DuplicateKeyError:
+            return False
+        return self.clock_in_applied(result.upserted_id is not None, False)
+
+    def clock_out_operation(self, attendance_id: str, changes: dict) -> UpdateOne:
+        return UpdateOne({"id": attendance_id, "clock_out": None}, {"$set": changes})
+
+    async def find_one(self, db: AsyncIOMotorDatabase, attendance_id: str, company_id: Optional[str] = None) -> Optional[dict]:
+        query = {"id": attendance_id, "is_deleted": False}
+        if company_id:
+            query["company_id"] = company_id
+        return await db[self.collection].find_one(query, {"_id": 0})
+
+    async def find_many(self, db: AsyncIOMotorDatabase, attendance_ids: List[str]) -> Dict[str, dict]:
+        cursor = db[self.collection].find({"id": {"$in": attendance_ids}, "is_deleted": False}, {"_id": 0})
+        return {record["id"]: record async for record in cursor}
+
+    async def update(self, db: AsyncIOMotorDatabase, attendance_id: str, changes: dict, guard: dict) -> Optional[dict]:
+        """Apply changes if the record still matches guard; returns the updated record."""
+        return await db[self.collection].find_one_and_update(
+            {"id": attendance_id, "is_deleted": False, **guard},
+            {"$set": changes},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def day_ids(self, db: AsyncIOMotorDatabase, employee_ids: List[str], day: date) -> Dict[str, str]:
+        """{employee_id: attendance id} of the employees' records on `day`."""
+        cursor = db[self.collection].find(
+            {"employee_id": {"$in": employee_ids}, "date": date_eq(day), "is_deleted": False},
+            {"_id": 0, "id": 1, "employee_id": 1}
+        )
+        return {r["employee_id"]: r["id"] async for r in cursor}
+
+    def record_pipeline(self, match: dict, start: Optional[date] = None, end: Optional[date] = None) -> List[dict]:
+        """Aggregation stages producing the attendance records matching `match` in [start, end]."""
+        return [{"$match": {**match, **date_range("date", start, end)}}]
+
+    async def list(
+        self,
+        db: AsyncIOMotorDatabase,
+        match: dict,
+        start: Optional[date],
+        end: Optional[date],
+        page: PageParams,
+        response: Response,
+        model: Type[BaseModel],
+    ) -> Response:
+        """Records newest first, as one keyset page or an NDJSON stream."""
+        query = {**match, **date_range("date", start, end)}
+        return await paginate(db[self.collection], query, ("date", -1), page, response, model=model)
+
+    async def insert_many(self, db: AsyncIOMotorDatabase, records: List[dict]):
+        if records:
+            await db[self.collection].insert_many(records)
+
+class BucketStore(DocumentStore):
+    """One document per employee per month, day records in `days`."""
+    collection = BUCKET_COLLECTION
+
+    @staticmethod
+    def _day(record: dict) -> dict:
+        return {k: v for k, v in record.items() if k not in BUCKET_FIELDS and k not in ("_id", "is_deleted")}
+
+    @staticmethod
+    def _reshape() -> List[dict]:
+        """Stages turning unwound buckets into flat records."""
+        return [
+            {"$addFields": {"days.employee_id": "$employee_id", "days.company_id": "$company_id", "days.is_deleted": False}},
+            {"$replaceRoot": {"newRoot": "$days"}},
+        ]
+
+    @classmethod
+    def _flatten(cls) -> List[dict]:
+        return [{"$unwind": "$days"}, *cls._reshape()]
+
+    @classmethod
+    def _in_days(cls, condition):
+        """A filter on flat record fields, rewritten for the `days.` fields of unwound buckets."""
+        if isinstance(condition, list):
+            return [cls._in_days(c) for c in condition]
+        return {
+            key if key.startswith("$") else f"days.{key}": cls._in_days(value) if key.startswith("$") else value
+            for key, value in condition.items()
+        }
+
+    @staticmethod
+    def _record(bucket: dict) -> Optional[dict]:
+        days = bucket.get("days") or []
+        if not days:
+            return None
+        return {"employee_id": bucket["employee_id"], "company_id": bucket["company_id"], **days[0], "is_deleted": False}
+
+    @staticmethod
+    def _bucket_match(match: dict) -> dict:
+        return {field: match[field] for field in BUCKET_FIELDS if field in match}
+
+    def clock_in_upsert(self, record: dict) -> Tuple[dict, dict]:
+        """
+        Push the day's record into its month unless that day is already there.
+        If it is, the filter misses and the upsert collides with the unique
+        (employee_id, month) index, which reports it as a duplicate.
+        """
+        month = month_start(record["date"])
+        return (
+            {"employee_id": record["employee_id"], "month": month, "days.date": {"$ne": record["date"]}},
+            {
+                "$push": {"days": self._day(record)},
+                "$set": {"updated_at": record["updated_at"]},
+                "$setOnInsert": {
+                    "id": f"{record['employee_id']}:{month:%Y-%m}",
+                    "company_id": record["company_id"],
+                    "created_at": record["created_at"],
+                },
+            }
+        )
+
+    def clock_in_applied(self, upserted: bool, failed: bool) -> bool:
+        # Pushing into an existing month is not an upsert; any operation that did not fail added the day
+        return not failed
+
+    def clock_out_operation(self, attendance_id: str, changes: dict) -> UpdateOne:
+        return UpdateOne(
+            {"days": {"$elemMatch": {"id": attendance_id, "clock_out": None}}},
+            {"$set": {**{f"days.$.{k}": v for k, v in changes.items()}, "updated_at": utc_now()}}
+        )
+
+    async def find_one(self, db: AsyncIOMotorDatabase, attendance_id: str, company_id: Optional[str] = None) -> Optional[dict]:
+        query = {"days.id": attendance_id}
+        if company_id:
+            query["company_id"] = company_id
+        bucket = await db[self.collection].find_one(
+            query, {"_id": 0, "employee_id": 1, "company_id": 1, "days": {"$elemMatch": {"id": attendance_id}}}
+        )
+        return self._record(bucket) if bucket else None
+
+    async def find_many(self, db: AsyncIOMotorDatabase, attendance_ids: List[str]) -> Dict[str, dict]:
+        pipeline = [
+            {"$match": {"days.id": {"$in": attendance_ids}}},
+            *self._flatten(),
+            {"$match": {"id": {"$in": attendance_ids}}},
+        ]
+        return {record["id"]: record async for record in db[self.collection].aggregate(pipeline)}
+
+    async def update(self, db: AsyncIOMotorDatabase, attendance_id: str, changes: dict, guard: dict) -> Optional[dict]:
+        bucket_guard = {k: v for k, v in guard.items() if k in BUCKET_FIELDS}
+        day_guard = {k: v for k, v in guard.items() if k not in BUCKET_FIELDS}
+        bucket = await db[self.collection].find_one_and_update(
+            {**bucket_guard, "days": {"$elemMatch": {"id": attendance_id, **day_guard}}},
+            {"$set": {**{f"days.$.{k}": v for k, v in changes.items()}, "updated_at": utc_now()}},
+            projection={"_id": 0, "employee_id": 1, "company_id": 1, "days": {"$elemMatch": {"id": attendance_id}}},
+            return_document=ReturnDocument.AFTER
+        )
+        return self._record(bucket) if bucket else None
+
+    async def day_ids(self, db: AsyncIOMotorDatabase, employee_ids: List[str], day: date) -> Dict[str, str]:
+        day_value = to_bson_date(day)
+        cursor = db[self.collection].find(
+            {"employee_id": {"$in": employee_ids}, "month": month_start(day)},
+            {"_id": 0, "employee_id": 1, "days": {"$elemMatch": {"date": day_value}}}
+        )
+        return {b["employee_id"]: b["days"][0]["id"] async for b in cursor if b.get("days")}
+
+    def record_pipeline(self, match: dict, start: Optional[date] = None, end: Optional[date] = None) -> List[dict]:
+        bucket_match = self._bucket_match(match)
+        if start or end:
+            bucket_match["month"] = {
+                **({"$gte": month_start(start)} if start else {}),
+                **({"$lte": month_start(end)} if end else {}),
+            }
+        return [
+            {"$match": bucket_match},
+            *self._flatten(),
+            {"$match": {**match, **date_range("date", start, end)}},
+        ]
+
+    async def _records(
+        self,
+        db: AsyncIOMotorDatabase,
+        match: dict,
+        start: Optional[date],
+        end: Optional[date],
+        after: Optional[list] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[dict]:
+        """
+        Records newest first, one month of buckets at a time, so a page only
+        reads the months it returns. `after` is a decoded (date, id) cursor.
+        Each month's buckets come from the (company_id|employee_id, month)
+        index; the day filter, cursor bound and limit apply right after
+        $unwind, so only the records returned are sorted and reshaped.
+        """
+        bucket_match = self._bucket_match(match)
+        if after:
+            end = min(end, _as_date(after[0])) if end else _as_date(after[0])
+        months = await db[self.collection].distinct("month", self.record_pipeline(match, start, end)[0]["$match"])
+        # Buckets only hold live records, and their own fields are matched per bucket
+        day_match = {k: v for k, v in match.items() if k not in BUCKET_FIELDS and k != "is_deleted"}
+        day_filter = self._in_days({**day_match, **date_range("date", start, end)})
+        if after:
+            day_filter = {"$and": [day_filter, self._in_days(_keyset_filter("date", -1, parse_datetime(after[0]), after[1]))]}
+        for month in sorted(months, reverse=True):
+            pipeline = [
+                {"$match": {**bucket_match, "month": month}},
+                {"$unwind": "$days"},
+                {"$match": day_filter},
+                {"$sort": {"days.date": -1, "days.id": -1}},
+                *([{"$limit": limit}] if limit is not None else []),
+                *self._reshape(),
+            ]
+            async for record in db[self.collection].aggregate(pipeline):
+                yield record
+                if limit is not None:
+                    limit -= 1
+            if limit == 0:
+                return
+
+    async def list(
+        self,
+        db: AsyncIOMotorDatabase,
+        match: dict,
+        start: Optional[date],
+        end: Optional[date],
+        page: PageParams,
+        response: Response,
+        model: Type[BaseModel],
+    ) -> Response:
+        if page.stream:
+            return StreamingResponse(_ndjson_lines(self._records(db, match, start, end), model), media_type=NDJSON_MEDIA_TYPE)
+
+        after = decode_cursor(page.cursor) if page.cursor else None
+        docs = [record async for record in self._records(db, match, start, end, after, page.limit + 1)]
+
+        headers = None
+        if len(docs) > page.limit:
+            docs = docs[:page.limit]
+            headers = {NEXT_CURSOR_HEADER: encode_cursor([docs[-1]["date"], docs[-1]["id"]])}
+        return document_response(model, docs, headers=headers)
+
+    def merge_operations(self, records: List[dict]) -> List[UpdateOne]:
+        """
+        Upserts adding records to their month buckets, skipping days a bucket
+        already holds, so loading the same records twice is harmless.
+        """
+        now = utc_now()
+        operations = []
+        key = lambda r: (r["employee_id"], month_start(r["date"]))
+        for (employee_id, month), group in groupby(sorted(records, key=key), key=key):
+            group = list(group)
+            days = [self._day({**r, "date": to_bson_date(r["date"])}) for r in group]
+            existing = {"$ifNull": ["$days", []]}
+            operations.append(UpdateOne(
+                {"employee_id": employee_id, "month": month},
+                [
+                    {"$set": {
+                        "id": f"{employee_id}:{month:%Y-%m}",
+                        "company_id": group[0]["company_id"],
+                        "days": {"$concatArrays": [existing, {"$filter": {
+                            "input": {"$literal": days},
+                            "cond": {"$not": [{"$in": ["$$this.date", {"$ifNull": ["$days.date", []]}]}]},
+                        }}]},
+                        "created_at": {"$ifNull": ["$created_at", now]},
+                        "updated_at": now,
+                    }},
+                ],
+                upsert=True
+            ))
+        return operations
+
+    async def insert_many(self, db: AsyncIOMotorDatabase, records: List[dict]):
+        operations = self.merge_operations(records)
+        if operations:
+            await db[self.collection].bulk_write(operations, ordered=False)
+
+def _store() -> DocumentStore:
+    if ATTENDANCE_STORAGE == "buckets":
+        return BucketStore()
+    if ATTENDANCE_STORAGE != "documents":
+        logger.warning("Unknown ATTENDANCE_STORAGE %r; using documents", ATTENDANCE_STORAGE)
+    return DocumentStore()
+
+attendance_store = _store()
+
+# --- migration: attendance -> attendance_buckets ---
+
+async def migrate_to_buckets(
+    db: AsyncIOMotorDatabase,
+    company_id: Optional[str] = None,
+    batch_size: int = 5000,
+    dry_run: bool = False,
+) -> dict:
+    """
+    Copy day records into month buckets in employee order, batch_size records
+    at a time. Idempotent: days already in a bucket are skipped.
+    """
+    store = BucketStore()
+    query = {"is_deleted": False}
+    if company_id:
+        query["company_id"] = company_id
+    records = 0
+    buckets = 0
+    batch: List[dict] = []
+
+    async def flush():
+        nonlocal buckets
+        operations = store.merge_operations(batch)
+        buckets += len(operations)
+        if operations and not dry_run:
+            await db[BUCKET_COLLECTION].bulk_write(operations, ordered=False)
+        batch.clear()
+
+    # The unique (employee_id, date) index serves this order
+    cursor = db.attendance.find(query, {"_id": 0}).sort([("employee_id", 1), ("date", 1)]).batch_size(batch_size)
+    async for record in cursor:
+        # Keep an employee's month in one batch so its bucket is written once
+        if len(batch) >= batch_size and (batch[-1]["employee_id"], month_start(batch[-1]["date"])) != (record["employee_id"], month_start(record["date"])):
+            await flush()
+        record["date"] = to_bson_date(record["date"])
+        for field in ("clock_in", "clock_out", "created_at", "updated_at"):
+            if isinstance(record.get(field), str):
+                record[field] = parse_datetime(record[field])
+        batch.append(record)
+        records += 1
+    await flush()
+    return {"records": records, "buckets": buckets}
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from utils.database import connect_to_mongo, close_mongo_connection
+
+    parser = argparse.ArgumentParser(description="Copy attendance records into monthly buckets")
+    parser.add_argument("--company-id", help="limit to one company")
+    parser.add_argument("--batch-size", type=int, default=5000, help="records per bulk write")
+    parser.add_argument("--dry-run", action="store_true", help="count only, write nothing")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+    logging.basicConfig(level=logging.INFO)
+
+    async def main():
+        db = connect_to_mongo()
+        try:
+            result = await migrate_to_buckets(db, args.company_id, args.batch_size, args.dry_run)
+        finally:
+            close_mongo_connection()
+        verb = "Would write" if args.dry_run else "Wrote"
+        print(f"{verb} {result['records']} records into {result['buckets']} month buckets")
+
+    asyncio.run(main())
@@ -4,7 +4,17 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from concurrent.futures import ThreadPoolExecutor
+from utils.cache import TTLCache
+from utils.database import get_db
+from utils.entity_cache import cached_user, entity_cache, user_tag
+from utils.events import EventBus, event, publish_many
+from utils.codec import utc_now
+import asyncio
+import hashlib
 import os
+import time
 
 SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
@@ -19,6 +29,59 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+class PasswordWorkPool:
+    """
+    Runs bcrypt off the event loop on a bounded thread pool.
+    At most `workers` hashes run at once and at most `max_pending` more may
+    wait; beyond that callers wait up to `acquire_timeout` seconds and then
+    get a 503 so a login storm cannot queue unbounded work.
+    """
+    def __init__(self, workers: int, max_pending: int, acquire_timeout: float):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.acquire_timeout = acquire_timeout
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _ensure_started(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-work")
+            self._slots = asyncio.Semaphore(self.workers + self.max_pending)
+
+    async def run(self, fn, *args):
+        self._ensure_started()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service is busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        self._slots = None
+
+password_pool = PasswordWorkPool(
+    workers=int(os.environ.get("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1))),
+    max_pending=int(os.environ.get("PASSWORD_HASH_MAX_PENDING", 64)),
+    acquire_timeout=float(os.environ.get("PASSWORD_HASH_ACQUIRE_TIMEOUT", 5)),
+)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_pool.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_pool.run(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -29,6 +92,33 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# Verified JWT payloads keyed by token digest. Entries never outlive the
+# token's own "exp", so a hit is exactly as valid as a fresh decode. Only the
+# signature check is cached: role, company and employee are read from the
+# user record on every request (see get_current_user).
+token_cache = TTLCache(
+    maxsize=int(os.environ.get("JWT_CACHE_SIZE", 10000)),
+    ttl=float(os.environ.get("JWT_CACHE_TTL", 300)),
+)
+
+def _token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def invalidate_token(token: str) -> bool:
+    """Drop a single token from the cache, e.g. on logout/revocation."""
+    return token_cache.delete(_token_digest(token))
+
+def invalidate_user_tokens(user_id: str) -> int:
+    """Drop every cached token issued to a user, e.g. on deactivation or role change."""
+    return token_cache.delete_where(lambda _, payload: payload.get("sub") == user_id)
+
+async def on_user_event(event: dict):
+    invalidate_user_tokens(event["entity_id"])
+
+def subscribe_token_cache(bus: EventBus):
+    """Drop this worker's cached tokens of users changed by other workers."""
+    bus.subscribe(on_user_event, ["user.updated"])
+
 def decode_token(token: str):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -40,13 +130,51 @@ def decode_token(token: str):
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def decode_token_cached(token: str):
+    digest = _token_digest(token)
+    payload = token_cache.get(digest)
+    if payload is None:
+        payload = decode_token(token)
+        exp = payload.get("exp")
+        remaining = exp - time.time() if exp is not None else token_cache.ttl
+        token_cache.set(digest, payload, ttl=remaining)
+    return payload
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: AsyncIOMotorDatabase = Depends(get_db)):
     token = credentials.credentials
-    payload = decode_token(token)
+    payload = decode_token_cached(token)
     user_id = payload.get("sub")
     if user_id is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials"
         )
-    return payload
+    user = await cached_user(db, user_id)
+    if not user or not user.get("is_active", True):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User account is inactive or no longer exists"
+        )
+    # Claims come from the account, so deactivations and role changes apply to tokens already issued
+    return {**payload, "role": user["role"], "company_id": user.get("company_id"), "employee_id": user.get("employee_id")}
+
+async def set_employee_users_active(db: AsyncIOMotorDatabase, employee_id: str, active: bool) -> int:
+    """
+    Enable or disable the accounts linked to an employee and drop their
+    cached tokens and user records. Other workers drop theirs on the
+    user.updated events published here.
+    """
+    query = {"employee_id": employee_id, "is_deleted": False, "is_active": not active}
+    users = await db.users.find(query, {"_id": 0, "id": 1, "role": 1, "company_id": 1}).to_list(None)
+    if not users:
+        return 0
+    await db.users.update_many(query, {"$set": {"is_active": active, "updated_at": utc_now()}})
+    for user in users:
+        invalidate_user_tokens(user["id"])
+    await entity_cache.invalidate(*[user_tag(user["id"]) for user in users])
+    await publish_many(db, [
+        event("user.updated", user.get("company_id"), user["id"],
+              {"id": user["id"], "employee_id": employee_id, "role": user["role"], "is_active": active})
+        for user in users
+    ])
+    return len(users)
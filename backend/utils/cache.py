@@ -0,0 +1,269 @@
+from bson import CodecOptions
+import bson
+from collections import OrderedDict
+from datetime import timezone
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    In-process LRU cache with a per-entry time-to-live.
+    Not thread-safe; intended for use from the event loop only.
+    """
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+        value, expires_at = entry
+        if expires_at <= self._clock():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        self._data[key] = (value, self._clock() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Hashable) -> bool:
+        return self._data.pop(key, _MISSING) is not _MISSING
+
+    def delete_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Remove every entry for which predicate(key, value) is true."""
+        doomed = [key for key, (value, _) in self._data.items() if predicate(key, value)]
+        for key in doomed:
+            del self._data[key]
+        return len(doomed)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+# --- shared read-through cache (utils/entity_cache.py) ---
+#
+# Entries carry tags. Invalidating a tag bumps its version, and an entry is
+# only served while the versions it was stored with are current, so one
+# write invalidates every entry with that tag without tracking them. The tag
+# versions are read before loading, which also makes an invalidation that
+# lands while a load is in flight win over the load.
+
+class LocalBackend:
+    """Per-process LRU; other workers only see invalidations after CACHE_TTL."""
+    shared = False
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._entries = TTLCache(maxsize, ttl)
+        self._versions: Dict[str, int] = {}
+
+    async def get(self, key: str, tags: Sequence[str]) -> Tuple[Any, List[int]]:
+        versions = [self._versions.get(tag, 0) for tag in tags]
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING or entry[1] != versions:
+            return _MISSING, versions
+        return entry[0], versions
+
+    async def set(self, key: str, value: Any, versions: List[int], ttl: float):
+        self._entries.set(key, (value, versions), ttl)
+
+    async def invalidate(self, tags: Sequence[str]):
+        for tag in tags:
+            self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    async def lock(self, key: str, ttl: float) -> bool:
+        return True
+
+    async def unlock(self, key: str):
+        pass
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": "local", "size": len(self._entries), "maxsize": self._entries.maxsize}
+
+class RedisBackend:
+    """
+    Shared by every worker through Redis (or any server speaking its
+    protocol). Values are stored as BSON so dates round-trip exactly. Redis
+    errors degrade to cache misses: requests fall through to MongoDB.
+    """
+    shared = True
+
+    def __init__(self, client, prefix: str = "nexushr"):
+        from redis.exceptions import RedisError
+        self._redis = client
+        self._errors = (RedisError, OSError)
+        self._prefix = prefix
+        self._codec = CodecOptions(tz_aware=True, tzinfo=timezone.utc)
+        self._last_warning = 0.0
+        self.errors = 0
+
+    @classmethod
+    def from_url(cls, url: str, prefix: str = "nexushr") -> "RedisBackend":
+        import redis.asyncio as redis
+        return cls(redis.Redis.from_url(url), prefix)
+
+    def _warn(self, error: Exception):
+        self.errors += 1
+        if time.monotonic() - self._last_warning > 30:
+            self._last_warning = time.monotonic()
+            logger.warning("Cache backend unavailable (%s); serving from the database", error)
+
+    async def get(self, key: str, tags: Sequence[str]) -> Tuple[Any, List[int]]:
+        try:
+            raw = await self._redis.mget([f"{self._prefix}:c:{key}", *[f"{self._prefix}:t:{tag}" for tag in tags]])
+        except self._errors as e:
+            self._warn(e)
+            return _MISSING, None
+        versions = [int(v or 0) for v in raw[1:]]
+        if raw[0] is None:
+            return _MISSING, versions
+        entry = bson.decode(raw[0], codec_options=self._codec)
+        if entry["t"] != versions:
+            return _MISSING, versions
+        return entry["v"], versions
+
+    async def set(self, key: str, value: Any, versions: List[int], ttl: float):
+        try:
+            await self._redis.set(f"{self._prefix}:c:{key}", bson.encode({"v": value, "t": versions}), px=int(ttl * 1000))
+        except self._errors as e:
+            self._warn(e)
+
+    async def invalidate(self, tags: Sequence[str]):
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for tag in tags:
+                    pipe.incr(f"{self._prefix}:t:{tag}")
+                await pipe.execute()
+        except self._errors as e:
+            self._warn(e)
+
+    async def lock(self, key: str, ttl: float) -> bool:
+        try:
+            return bool(await self._redis.set(f"{self._prefix}:l:{key}", b"1", nx=True, px=int(ttl * 1000)))
+        except self._errors as e:
+            self._warn(e)
+            return True
+
+    async def unlock(self, key: str):
+        try:
+            await self._redis.delete(f"{self._prefix}:l:{key}")
+        except self._errors as e:
+            self._warn(e)
+
+    async def close(self):
+        await self._redis.aclose()
+
+    def stats(self) -> dict:
+        return {"backend": "redis", "errors": self.errors}
+
+class ReadThroughCache:
+    """
+    get_or_load() serves a cached value or loads it, with stampede
+    protection: concurrent misses in one process share a single load, and
+    with a shared backend one process loads while the others wait briefly
+    for its result.
+    """
+    def __init__(self, backend, ttl: float, lock_ttl: float = 2.0, lock_wait: float = 1.0):
+        self.backend = backend
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.lock_wait = lock_wait
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_load(self, key: str, tags: Sequence[str], loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Cached value for key, else loader()'s result (None results are not cached)."""
+        value, versions = await self.backend.get(key, tags)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+        self.misses += 1
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+        future = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting; don't log an unretrieved exception
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        try:
+            value = await self._load(key, tags, versions, loader)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _load(self, key: str, tags: Sequence[str], versions: Optional[List[int]], loader) -> Any:
+        if not await self.backend.lock(key, self.lock_ttl):
+            # Another worker is loading it; give it a moment before loading ourselves
+            deadline = time.monotonic() + self.lock_wait
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+                value, versions = await self.backend.get(key, tags)
+                if value is not _MISSING:
+                    return value
+            return await loader()
+        try:
+            value = await loader()
+            if value is not None and versions is not None:
+                await self.backend.set(key, value, versions, self.ttl)
+            return value
+        finally:
+            await self.backend.unlock(key)
+
+    async def invalidate(self, *tags: str):
+        await self.backend.invalidate(tags)
+
+    async def close(self):
+        await self.backend.close()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            **self.backend.stats(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,81 @@
+"""
+Storage codec for dates and timestamps.
+
+Documents are written with native BSON datetimes: timestamps as UTC
+datetimes (millisecond precision, matching BSON) and calendar dates as
+midnight UTC. Older documents may still hold ISO strings until
+utils.migrate_dates has run, so while STORAGE_DATE_COMPAT is enabled the
+query helpers below match both representations. Reads need no special
+handling: the Pydantic models accept either form.
+"""
+from datetime import date, datetime, time, timezone
+from typing import Any, Optional, Union
+import os
+
+DATE_COMPAT = os.environ.get("STORAGE_DATE_COMPAT", "true").lower() == "true"
+
+def utc_now() -> datetime:
+    """Current UTC time truncated to what BSON can store."""
+    now = datetime.now(timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+def to_bson_date(value: Optional[Union[date, str]]) -> Optional[datetime]:
+    """Calendar date -> midnight UTC datetime."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        value = value.date()
+    return datetime.combine(value, time.min, tzinfo=timezone.utc)
+
+def to_bson_datetime(value: Optional[Union[datetime, str]]) -> Optional[datetime]:
+    """Timestamp (datetime or ISO string) -> UTC datetime at millisecond precision."""
+    value = parse_datetime(value)
+    if value is None:
+        return None
+    value = value.astimezone(timezone.utc)
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+def parse_datetime(value: Any) -> Optional[datetime]:
+    """Accept a stored timestamp in either format; naive values are UTC."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+def date_eq(value: Union[date, datetime]) -> Any:
+    """Query value matching a calendar date field."""
+    native = to_bson_date(value)
+    if DATE_COMPAT:
+        return {"$in": [native, native.date().isoformat()]}
+    return native
+
+def date_range(field: str, start: Optional[date] = None, end: Optional[date] = None) -> dict:
+    """Query fragment for start <= field <= end (either bound optional)."""
+    if not start and not end:
+        return {}
+    def bounds(convert):
+        condition = {}
+        if start:
+            condition["$gte"] = convert(start)
+        if end:
+            condition["$lte"] = convert(end)
+        return condition
+
+    native = {field: bounds(to_bson_date)}
+    if not DATE_COMPAT:
+        return native
+    # Legacy strings hold the bare date, which sorts before any timestamp of that day
+    return {"$or": [native, {field: bounds(lambda d: to_bson_date(d).date().isoformat())}]}
+
+def year_month_expression(field: str) -> dict:
+    """Aggregation expression giving "YYYY-MM" for a date field in either format."""
+    return {"$cond": [
+        {"$eq": [{"$type": f"${field}"}, "string"]},
+        {"$substrCP": [f"${field}", 0, 7]},
+        {"$dateToString": {"format": "%Y-%m", "date": f"${field}"}},
+    ]}
@@ -0,0 +1,65 @@
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from typing import Optional
+from datetime import timezone
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Single process-wide client. It is created by the application lifespan
+# (see server.py) and shared by every route module through get_db().
+_client: Optional[AsyncIOMotorClient] = None
+_db: Optional[AsyncIOMotorDatabase] = None
+
+def _int_env(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+def get_client_options() -> dict:
+    """
+    Connection pool and timeout settings, overridable through the environment.
+    """
+    return {
+        "maxPoolSize": _int_env("MONGO_MAX_POOL_SIZE", 100),
+        "minPoolSize": _int_env("MONGO_MIN_POOL_SIZE", 0),
+        "maxIdleTimeMS": _int_env("MONGO_MAX_IDLE_TIME_MS", 300000),
+        "waitQueueTimeoutMS": _int_env("MONGO_WAIT_QUEUE_TIMEOUT_MS", 10000),
+        "serverSelectionTimeoutMS": _int_env("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000),
+        "connectTimeoutMS": _int_env("MONGO_CONNECT_TIMEOUT_MS", 10000),
+        "socketTimeoutMS": _int_env("MONGO_SOCKET_TIMEOUT_MS", 30000),
+        "appname": os.environ.get("MONGO_APP_NAME", "nexus-hr-api"),
+        # Dates are stored as native BSON datetimes (see utils/codec.py)
+        "tz_aware": True,
+        "tzinfo": timezone.utc,
+    }
+
+def connect_to_mongo() -> AsyncIOMotorDatabase:
+    """Create the shared client. Safe to call more than once."""
+    global _client, _db
+    if _client is None:
+        _client = AsyncIOMotorClient(os.environ["MONGO_URL"], **get_client_options())
+        _db = _client[os.environ["DB_NAME"]]
+        logger.info("MongoDB client created (maxPoolSize=%s)", _client.options.pool_options.max_pool_size)
+    return _db
+
+def close_mongo_connection():
+    global _client, _db
+    if _client is not None:
+        _client.close()
+        logger.info("MongoDB client closed")
+    _client = None
+    _db = None
+
+def get_client() -> AsyncIOMotorClient:
+    if _client is None:
+        raise RuntimeError("MongoDB client is not initialised; call connect_to_mongo() first")
+    return _client
+
+def get_database() -> AsyncIOMotorDatabase:
+    if _db is None:
+        raise RuntimeError("MongoDB client is not initialised; call connect_to_mongo() first")
+    return _db
+
+async def get_db() -> AsyncIOMotorDatabase:
+    """FastAPI dependency returning the shared database handle."""
+    return get_database()
@@ -0,0 +1,144 @@
+"""
+Employee search: typeahead prefix matching plus MongoDB full-text search.
+
+Every employee document carries `search_keys`, an array of normalised
+(lower-cased, accent-stripped) values: first name, last name, full name,
+email and employee code. An anchored regex on that array is a bounded scan
+of the (company_id, search_keys) index, which keeps typeahead fast on large
+companies. Free-text queries ("senior engineer") fall back to the
+employees_text index.
+
+search_keys is written by build_employee_record and update_employee;
+documents created before it existed can be backfilled with:
+
+    python -m utils.employee_search [--company-id <id>] [--all]
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from typing import List, Optional
+import logging
+import re
+import unicodedata
+
+MAX_QUERY_LENGTH = 100
+# Candidates fetched per requested result, ranked in Python
+PREFIX_CANDIDATE_FACTOR = 5
+MAX_PREFIX_CANDIDATES = 200
+SEARCH_MODES = ("auto", "prefix", "text")
+# Whole-word text search is pointless for the first keystrokes of a typeahead
+MIN_TEXT_QUERY_LENGTH = 3
+
+def normalize(value: Optional[str]) -> str:
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+def search_keys(doc: dict) -> List[str]:
+    first = normalize(doc.get("first_name"))
+    last = normalize(doc.get("last_name"))
+    keys = [first, last, f"{first} {last}".strip(), normalize(doc.get("email")), normalize(doc.get("employee_code"))]
+    return sorted({key for key in keys if key})
+
+def _prefix_score(doc: dict, q: str) -> float:
+    names = [normalize(doc.get("first_name")), normalize(doc.get("last_name")), normalize(doc.get("employee_code"))]
+    if q in names:
+        return 3.0
+    if any(name.startswith(q) for name in names):
+        return 2.0
+    return 1.0
+
+async def prefix_search(db: AsyncIOMotorDatabase, company_id: str, q: str, projection: dict, limit: int) -> List[dict]:
+    q = normalize(q)
+    if not q:
+        return []
+    candidates = min(limit * PREFIX_CANDIDATE_FACTOR, MAX_PREFIX_CANDIDATES)
+    docs = await db.employees.find(
+        {"company_id": company_id, "is_deleted": False, "search_keys": {"$regex": f"^{re.escape(q)}"}},
+        projection
+    ).limit(candidates).to_list(candidates)
+    for doc in docs:
+        doc["score"] = _prefix_score(doc, q)
+    docs.sort(key=lambda d: (-d["score"], normalize(d.get("last_name")), normalize(d.get("first_name"))))
+    return docs[:limit]
+
+async def text_search(db: AsyncIOMotorDatabase, company_id: str, q: str, projection: dict, limit: int) -> List[dict]:
+    cursor = db.employees.find(
+        {"company_id": company_id, "is_deleted": False, "$text": {"$search": q}},
+        {**projection, "score": {"$meta": "textScore"}}
+    ).sort([("score", {"$meta": "textScore"})]).limit(limit)
+    return await cursor.to_list(limit)
+
+async def find_employees(
+    db: AsyncIOMotorDatabase,
+    company_id: str,
+    q: str,
+    projection: dict,
+    limit: int = 20,
+    mode: str = "auto",
+) -> List[dict]:
+    """
+    Ranked matches, best first. "auto" returns prefix matches and tops the
+    list up with full-text matches when there are fewer than `limit` (skipped
+    for very short queries, which are typeahead keystrokes).
+    """
+    if mode == "text":
+        return await text_search(db, company_id, q, projection, limit)
+    results = await prefix_search(db, company_id, q, projection, limit)
+    if mode == "prefix" or len(results) >= limit or len(normalize(q)) < MIN_TEXT_QUERY_LENGTH:
+        return results
+    seen = {doc["id"] for doc in results}
+    for doc in await text_search(db, company_id, q, projection, limit):
+        if doc["id"] not in seen:
+            results.append(doc)
+            if len(results) >= limit:
+                break
+    return results
+
+async def backfill_search_keys(
+    db: AsyncIOMotorDatabase,
+    company_id: Optional[str] = None,
+    rebuild: bool = False,
+    batch_size: int = 1000,
+) -> int:
+    """Write search_keys on employees missing it (or all of them with rebuild)."""
+    query = {} if rebuild else {"search_keys": {"$exists": False}}
+    if company_id:
+        query["company_id"] = company_id
+    cursor = db.employees.find(query, {"_id": 1, "first_name": 1, "last_name": 1, "email": 1, "employee_code": 1})
+    updated = 0
+    batch = []
+    async for doc in cursor.batch_size(batch_size):
+        batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"search_keys": search_keys(doc)}}))
+        if len(batch) >= batch_size:
+            updated += (await db.employees.bulk_write(batch, ordered=False)).modified_count
+            batch = []
+    if batch:
+        updated += (await db.employees.bulk_write(batch, ordered=False)).modified_count
+    return updated
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from utils.database import connect_to_mongo, close_mongo_connection
+
+    parser = argparse.ArgumentParser(description="Backfill employee search keys")
+    parser.add_argument("--company-id", help="limit to one company")
+    parser.add_argument("--all", action="store_true", help="recompute keys that already exist")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+    logging.basicConfig(level=logging.INFO)
+
+    async def main():
+        db = connect_to_mongo()
+        try:
+            count = await backfill_search_keys(db, args.company_id, args.all)
+        finally:
+            close_mongo_connection()
+        print(f"Updated search keys on {count} employees")
+
+    asyncio.run(main())
@@ -0,0 +1,225 @@
+"""
+Employee record construction and the bulk import pipeline.
+
+The import reads CSV or NDJSON in chunks, validates each row with
+EmployeeCreate, checks employee codes with one $in query per chunk and
+writes each chunk with insert_many(ordered=False). Memory is bounded by the
+chunk size plus the set of codes seen so far in the file.
+
+    python -m utils.employees employees.csv --company-id <id> [--format csv|ndjson]
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import BulkWriteError
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from models.employee import Employee, EmployeeCreate, EmploymentStatus, EmployeeImportReport, EmployeeImportError
+from utils.helpers import generate_id
+from utils.codec import utc_now, to_bson_date
+from utils.employee_search import search_keys
+from utils.hierarchy import rebuild_hierarchy
+from utils.events import event, publish_many
+from models.webhook import EventType
+from itertools import islice
+from typing import IO, Iterator, List, Optional, Tuple
+import csv
+import json
+
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 10000
+SUPPORTED_FORMATS = ("csv", "ndjson")
+
+def build_employee_record(employee_data: EmployeeCreate) -> dict:
+    """Database document for a new employee (shared by create and import)."""
+    now = utc_now()
+    employee_dict = employee_data.model_dump()
+    employee_dict["id"] = generate_id()
+    employee_dict["employment_status"] = EmploymentStatus.ACTIVE
+    employee_dict["is_deleted"] = False
+    employee_dict["created_at"] = now
+    employee_dict["updated_at"] = now
+
+    employee_dict["date_of_birth"] = to_bson_date(employee_dict.get("date_of_birth"))
+    employee_dict["date_of_joining"] = to_bson_date(employee_dict.get("date_of_joining"))
+    employee_dict["search_keys"] = search_keys(employee_dict)
+    # Reporting line; set by the caller when there is a manager (see utils/hierarchy.py)
+    employee_dict["manager_path"] = []
+    employee_dict["manager_depth"] = 0
+    return employee_dict
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    name = (filename or "").lower()
+    ctype = (content_type or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in ctype or "jsonl" in ctype:
+        return "ndjson"
+    if name.endswith(".csv") or "csv" in ctype:
+        return "csv"
+    return None
+
+def _csv_rows(text: IO[str]) -> Iterator[Tuple[int, object]]:
+    reader = csv.DictReader(text)
+    for row in reader:
+        # Empty cells mean "not provided", not empty strings
+        yield reader.line_num, {k.strip(): (v.strip() or None) for k, v in row.items() if k and v is not None}
+
+def _ndjson_rows(text: IO[str]) -> Iterator[Tuple[int, object]]:
+    for line_num, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_num, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_num, e
+
+def iter_rows(text: IO[str], fmt: str) -> Iterator[Tuple[int, object]]:
+    """Yield (row number, parsed row or parse error) from a text stream."""
+    if fmt == "csv":
+        return _csv_rows(text)
+    if fmt == "ndjson":
+        return _ndjson_rows(text)
+    raise ValueError(f"Unsupported import format: {fmt}")
+
+def _validate(row_num: int, row, company_id: Optional[str]) -> Tuple[Optional[EmployeeCreate], Optional[EmployeeImportError]]:
+    if isinstance(row, Exception):
+        return None, EmployeeImportError(row=row_num, errors=[f"Invalid JSON: {row}"])
+    if not isinstance(row, dict):
+        return None, EmployeeImportError(row=row_num, errors=["Row must be an object"])
+    if company_id:
+        row = {**row, "company_id": company_id}
+    try:
+        return EmployeeCreate.model_validate(row), None
+    except ValidationError as e:
+        messages = [f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()]
+        return None, EmployeeImportError(row=row_num, employee_code=row.get("employee_code"), errors=messages)
+
+async def _import_chunk(
+    db: AsyncIOMotorDatabase,
+    chunk: List[Tuple[int, object]],
+    company_id: Optional[str],
+    seen_codes: set,
+    managed_companies: set,
+    report: EmployeeImportReport,
+):
+    def fail(error: EmployeeImportError):
+        report.failed += 1
+        if len(report.errors) < MAX_REPORTED_ERRORS:
+            report.errors.append(error)
+
+    valid = []
+    for row_num, row in chunk:
+        employee, error = _validate(row_num, row, company_id)
+        if error:
+            fail(error)
+            continue
+        key = (employee.company_id, employee.employee_code)
+        if key in seen_codes:
+            fail(EmployeeImportError(row=row_num, employee_code=employee.employee_code, errors=["Duplicate employee code in file"]))
+            continue
+        seen_codes.add(key)
+        valid.append((row_num, employee))
+
+    if not valid:
+        return
+
+    # One round trip per chunk to find codes that already exist
+    existing = set()
+    for cid in {e.company_id for _, e in valid}:
+        codes = [e.employee_code for _, e in valid if e.company_id == cid]
+        cursor = db.employees.find(
+            {"company_id": cid, "employee_code": {"$in": codes}, "is_deleted": False},
+            {"_id": 0, "employee_code": 1}
+        )
+        existing.update([(cid, doc["employee_code"]) async for doc in cursor])
+
+    to_insert = []
+    rows = []
+    for row_num, employee in valid:
+        if (employee.company_id, employee.employee_code) in existing:
+            fail(EmployeeImportError(row=row_num, employee_code=employee.employee_code, errors=["Employee code already exists"]))
+            continue
+        to_insert.append(build_employee_record(employee))
+        if employee.manager_id:
+            managed_companies.add(employee.company_id)
+        rows.append(row_num)
+
+    if not to_insert:
+        return
+
+    failed = set()
+    try:
+        result = await db.employees.insert_many(to_insert, ordered=False)
+        report.inserted += len(result.inserted_ids)
+    except BulkWriteError as e:
+        write_errors = e.details.get("writeErrors", [])
+        report.inserted += e.details.get("nInserted", len(to_insert) - len(write_errors))
+        for err in write_errors:
+            failed.add(err["index"])
+            doc = to_insert[err["index"]]
+            message = "Employee code already exists" if err.get("code") == 11000 else err.get("errmsg", "Write failed")
+            fail(EmployeeImportError(row=rows[err["index"]], employee_code=doc["employee_code"], errors=[message]))
+
+    await publish_many(db, [
+        event(EventType.EMPLOYEE_CREATED.value, doc["company_id"], doc["id"], doc, Employee)
+        for index, doc in enumerate(to_insert) if index not in failed
+    ])
+
+async def import_employees(
+    db: AsyncIOMotorDatabase,
+    text: IO[str],
+    fmt: str,
+    company_id: Optional[str] = None,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+) -> EmployeeImportReport:
+    """
+    Import employees from a text stream. When company_id is given it
+    overrides the column in every row. Parsing runs in a worker thread one
+    chunk at a time so the event loop is never blocked on file I/O.
+    """
+    rows = iter_rows(text, fmt)
+    report = EmployeeImportReport()
+    seen_codes = set()
+    managed_companies = set()
+    while True:
+        chunk = await run_in_threadpool(lambda: list(islice(rows, chunk_size)))
+        if not chunk:
+            break
+        report.total_rows += len(chunk)
+        await _import_chunk(db, chunk, company_id, seen_codes, managed_companies, report)
+    report.errors_truncated = report.failed > len(report.errors)
+    # Managers may appear anywhere in the file, so reporting lines are resolved once at the end
+    for cid in managed_companies:
+        await rebuild_hierarchy(db, cid)
+    return report
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    import logging
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from utils.database import connect_to_mongo, close_mongo_connection
+
+    parser = argparse.ArgumentParser(description="Bulk import employees from CSV or NDJSON")
+    parser.add_argument("path", help="CSV or NDJSON file")
+    parser.add_argument("--company-id", help="company to import into (overrides the company_id column)")
+    parser.add_argument("--format", choices=SUPPORTED_FORMATS, help="defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+    logging.basicConfig(level=logging.INFO)
+
+    fmt = args.format or detect_format(args.path, None)
+    if fmt is None:
+        parser.error("cannot infer format from file name; pass --format")
+
+    async def main():
+        db = connect_to_mongo()
+        try:
+            with open(args.path, newline="", encoding="utf-8-sig") as text:
+                report = await import_employees(db, text, fmt, args.company_id, args.chunk_size)
+        finally:
+            close_mongo_connection()
+        print(report.model_dump_json(indent=2))
+        return 0 if report.failed == 0 else 1
+
+    raise SystemExit(asyncio.run(main()))
@@ -0,0 +1,83 @@
+"""
+Read-through cache for companies, employees and the current user.
+
+These documents are read on most requests and written rarely. Each worker
+is its own process, so a per-process cache is duplicated in every worker
+and goes stale there when another worker writes. CACHE_BACKEND selects
+where entries live:
+
+- "local" (default): an LRU in each worker. The worker that made the write
+  invalidates at once; the others follow from the event bus
+  (utils/events.py) a few seconds later, or after CACHE_TTL without it.
+- "redis": one copy shared by every worker (CACHE_REDIS_URL). Invalidations
+  reach all of them immediately.
+
+Entries are tagged `company:<id>`, `employee:<id>` and `user:<id>`, and the
+write handlers invalidate those tags after every write. Missing documents
+are not cached.
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from utils.cache import LocalBackend, RedisBackend, ReadThroughCache
+from utils.events import EventBus
+from typing import Optional
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "local").lower()
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_PREFIX = os.environ.get("CACHE_PREFIX", "nexushr")
+CACHE_SIZE = int(os.environ.get("CACHE_SIZE", 10000))
+CACHE_TTL = float(os.environ.get("CACHE_TTL", 60))
+
+USER_FIELDS = {"_id": 0, "id": 1, "email": 1, "role": 1, "company_id": 1, "employee_id": 1, "is_active": 1}
+
+def _backend():
+    if CACHE_BACKEND == "redis":
+        try:
+            return RedisBackend.from_url(CACHE_REDIS_URL, CACHE_PREFIX)
+        except ImportError:
+            logger.error("CACHE_BACKEND=redis needs the redis package; using the local cache")
+    elif CACHE_BACKEND != "local":
+        logger.warning("Unknown CACHE_BACKEND %r; using the local cache", CACHE_BACKEND)
+    return LocalBackend(CACHE_SIZE, CACHE_TTL)
+
+entity_cache = ReadThroughCache(_backend(), CACHE_TTL)
+
+def company_tag(company_id: str) -> str:
+    return f"company:{company_id}"
+
+def employee_tag(employee_id: str) -> str:
+    return f"employee:{employee_id}"
+
+def user_tag(user_id: str) -> str:
+    return f"user:{user_id}"
+
+async def cached_company(db: AsyncIOMotorDatabase, company_id: str) -> Optional[dict]:
+    tag = company_tag(company_id)
+    return await entity_cache.get_or_load(tag, [tag], lambda: db.companies.find_one({"id": company_id, "is_deleted": False}, {"_id": 0}))
+
+async def cached_employee(db: AsyncIOMotorDatabase, employee_id: str) -> Optional[dict]:
+    tag = employee_tag(employee_id)
+    return await entity_cache.get_or_load(tag, [tag], lambda: db.employees.find_one({"id": employee_id, "is_deleted": False}, {"_id": 0}))
+
+async def cached_user(db: AsyncIOMotorDatabase, user_id: str) -> Optional[dict]:
+    tag = user_tag(user_id)
+    return await entity_cache.get_or_load(tag, [tag], lambda: db.users.find_one({"id": user_id, "is_deleted": False}, USER_FIELDS))
+
+# Events that change a cached document, and the tag of that document
+EVENT_TAGS = {
+    "employee.updated": employee_tag,
+    "employee.deleted": employee_tag,
+    "company.updated": company_tag,
+    "user.updated": user_tag,
+}
+
+async def on_entity_event(event: dict):
+    await entity_cache.invalidate(EVENT_TAGS[event["type"]](event["entity_id"]))
+
+def subscribe_entity_cache(bus: EventBus):
+    """Invalidate this worker's entries on writes made by other workers (a shared cache needs no help)."""
+    if isinstance(entity_cache.backend, LocalBackend):
+        bus.subscribe(on_entity_event, EVENT_TAGS)
@@ -0,0 +1,321 @@
+"""
+Domain events: an outbox, an in-process bus and webhook delivery.
+
+Write handlers publish an event (`employee.updated`, `leave.approved`,
+`attendance.clock_in`, ...) into the `events` collection right after their
+write. The outbox is the only source of events: it works on a standalone
+mongod, where change streams do not, and its ObjectId order is a natural
+resume position. Without multi-document transactions the event is not
+atomic with the write: a crash between the two loses the event, which
+consumers must tolerate as they would a missed poll. Events are kept for
+EVENT_RETENTION_DAYS.
+
+Events are read in _id order, and only once they are EVENT_SETTLE_SECONDS
+old. ObjectIds from different workers are only ordered to the second, so
+this stops a slow insert from landing behind a position a reader has
+already passed.
+
+- EventBus (one per worker) tails the outbox from the moment the worker
+  starts and fans events out to in-process subscribers, e.g. the entity
+  cache of every worker.
+- WebhookDispatcher delivers events to the webhooks registered by each
+  company in batches of up to WEBHOOK_BATCH_SIZE, signed with the webhook's
+  secret. Failed posts are retried with exponential backoff. Delivery is at
+  least once: the position is stored in `event_cursors` after each batch,
+  and one worker at a time holds a lease on it, so restarts resume where
+  they stopped.
+
+Webhook URLs are chosen by company admins and receive signed requests from
+inside the network, so they must be http(s) URLs whose host resolves only
+to public addresses. This is checked on registration and again before
+each delivery (a host may be re-pointed later); redirects are not
+followed. WEBHOOK_ALLOW_PRIVATE=true lifts the address check, e.g. for
+receivers on an internal network.
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from pydantic import BaseModel
+from utils.helpers import generate_id
+from utils.codec import utc_now
+from utils.serialization import dumps
+from datetime import timedelta
+from typing import Awaitable, Callable, Iterable, List, Optional, Set, Tuple, Type
+from urllib.parse import urlsplit
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import logging
+import os
+import socket
+import httpx
+
+logger = logging.getLogger(__name__)
+
+EVENT_COLLECTION = "events"
+EVENT_RETENTION_DAYS = float(os.environ.get("EVENT_RETENTION_DAYS", 7))
+EVENT_POLL_INTERVAL = float(os.environ.get("EVENT_POLL_INTERVAL", 1))
+EVENT_SETTLE_SECONDS = float(os.environ.get("EVENT_SETTLE_SECONDS", 2))
+EVENT_BATCH_SIZE = 500
+
+WEBHOOK_BATCH_SIZE = int(os.environ.get("WEBHOOK_BATCH_SIZE", 100))
+WEBHOOK_TIMEOUT = float(os.environ.get("WEBHOOK_TIMEOUT", 10))
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get("WEBHOOK_MAX_ATTEMPTS", 5))
+# Consecutive failed batches before a webhook is switched off
+WEBHOOK_DISABLE_AFTER = int(os.environ.get("WEBHOOK_DISABLE_AFTER", 50))
+# Longer than a batch can take with all its retries
+WEBHOOK_LEASE_SECONDS = 120
+SIGNATURE_HEADER = "X-NexusHR-Signature"
+WEBHOOK_ALLOW_PRIVATE = os.environ.get("WEBHOOK_ALLOW_PRIVATE", "false").lower() == "true"
+
+Subscriber = Callable[[dict], Awaitable[None]]
+
+# --- publishing ---
+
+def event(event_type: str, company_id: str, entity_id: str, data: dict, model: Optional[Type[BaseModel]] = None) -> dict:
+    """
+    An outbox document. With `model`, data is cut down to the model's fields
+    so internal ones (search keys, manager paths, ...) are not published.
+    """
+    if model is not None:
+        data = {k: data[k] for k in model.model_fields if k in data}
+    now = utc_now()
+    return {
+        "_id": ObjectId(),
+        "id": generate_id(),
+        "type": event_type,
+        "company_id": company_id,
+        "entity_id": entity_id,
+        "data": {k: v for k, v in data.items() if k != "_id"},
+        "created_at": now,
+        "expires_at": now + timedelta(days=EVENT_RETENTION_DAYS),
+    }
+
+async def publish_many(db: AsyncIOMotorDatabase, events: List[dict]):
+    """
+    Append events to the outbox. The write they describe has already
+    happened, so a failure here is logged rather than failing the request.
+    """
+    if not events:
+        return
+    try:
+        await db[EVENT_COLLECTION].insert_many(events, ordered=False)
+    except PyMongoError:
+        logger.exception("Failed to publish %d event(s)", len(events))
+
+async def publish(
+    db: AsyncIOMotorDatabase, event_type: str, company_id: str, entity_id: str, data: dict,
+    model: Optional[Type[BaseModel]] = None
+):
+    await publish_many(db, [event(event_type, company_id, entity_id, data, model)])
+
+def public_event(doc: dict) -> dict:
+    return {k: doc.get(k) for k in ("id", "type", "company_id", "entity_id", "data", "created_at")}
+
+# --- reading ---
+
+async def read_events(db: AsyncIOMotorDatabase, after: Optional[ObjectId], limit: int) -> List[dict]:
+    """Settled events after position `after` (from the start of the outbox when None), oldest first."""
+    settled = ObjectId.from_datetime(utc_now() - timedelta(seconds=EVENT_SETTLE_SECONDS))
+    query = {"_id": {"$lt": settled, **({"$gt": after} if after else {})}}
+    return await db[EVENT_COLLECTION].find(query).sort("_id", 1).limit(limit).to_list(limit)
+
+def current_position() -> ObjectId:
+    """Position from which only events not yet read by anyone are read."""
+    return ObjectId.from_datetime(utc_now() - timedelta(seconds=EVENT_SETTLE_SECONDS))
+
+class _Worker:
+    """A background loop owned by the app lifespan."""
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, db: AsyncIOMotorDatabase):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(db))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self, db: AsyncIOMotorDatabase):
+        delay = 1
+        while True:
+            try:
+                busy = await self.step(db)
+                delay = 1
+                if not busy:
+                    await asyncio.sleep(EVENT_POLL_INTERVAL)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("%s failed (%s); retrying in %ss", type(self).__name__, e, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+
+    async def step(self, db: AsyncIOMotorDatabase) -> bool:
+        """One round of work; True if there may be more right away."""
+        raise NotImplementedError
+
+class EventBus(_Worker):
+    def __init__(self):
+        super().__init__()
+        self._subscribers: List[Tuple[Optional[Set[str]], Subscriber]] = []
+        self._position: Optional[ObjectId] = None
+
+    def subscribe(self, handler: Subscriber, types: Optional[Iterable[str]] = None):
+        """Call handler(event) for every event (or those of the given types) published by any worker."""
+        self._subscribers.append((set(types) if types else None, handler))
+
+    async def step(self, db: AsyncIOMotorDatabase) -> bool:
+        if self._position is None:
+            self._position = current_position()
+        events = await read_events(db, self._position, EVENT_BATCH_SIZE)
+        for doc in events:
+            await self.dispatch(doc)
+            self._position = doc["_id"]
+        return len(events) == EVENT_BATCH_SIZE
+
+    async def dispatch(self, doc: dict):
+        for types, handler in self._subscribers:
+            if types is None or doc["type"] in types:
+                try:
+                    await handler(doc)
+                except Exception:
+                    logger.exception("Event subscriber %s failed on %s", getattr(handler, "__name__", handler), doc["type"])
+
+# --- webhooks ---
+
+def _public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    return ip.is_global and not ip.is_multicast
+
+async def webhook_url_error(url: str) -> Optional[str]:
+    """Why a URL cannot receive webhooks, or None if it can."""
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return "Webhook URLs must be http or https URLs"
+    if WEBHOOK_ALLOW_PRIVATE:
+        return None
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(parts.hostname, parts.port or 443, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError):
+        return f"Cannot resolve webhook host {parts.hostname}"
+    if not all(_public_address(info[4][0]) for info in infos):
+        return "Webhook URLs must not point to private, loopback or link-local addresses"
+    return None
+
+def sign(secret: str, body: bytes) -> str:
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+class WebhookDispatcher(_Worker):
+    consumer = "webhooks"
+
+    def __init__(self):
+        super().__init__()
+        self._owner = generate_id()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=WEBHOOK_TIMEOUT)
+        return self._client
+
+    async def stop(self):
+        await super().stop()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _lease(self, db: AsyncIOMotorDatabase) -> Optional[dict]:
+        """Take or renew the delivery lease; None while another worker holds it."""
+        now = utc_now()
+        try:
+            return await db.event_cursors.find_one_and_update(
+                {"_id": self.consumer, "$or": [{"owner": self._owner}, {"lease_until": {"$lt": now}}]},
+                {"$set": {"owner": self._owner, "lease_until": now + timedelta(seconds=WEBHOOK_LEASE_SECONDS)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            return None
+
+    async def step(self, db: AsyncIOMotorDatabase) -> bool:
+        lease = await self._lease(db)
+        if lease is None:
+            await asyncio.sleep(WEBHOOK_LEASE_SECONDS / 2)
+            return False
+        position = lease.get("position")
+        if position is None:
+            # First run: deliver from now on rather than replaying the outbox
+            position = current_position()
+            await self._advance(db, position)
+        events = await read_events(db, position, EVENT_BATCH_SIZE)
+        if not events:
+            return False
+        await self.deliver(db, events)
+        await self._advance(db, events[-1]["_id"])
+        return len(events) == EVENT_BATCH_SIZE
+
+    async def _advance(self, db: AsyncIOMotorDatabase, position: ObjectId):
+        await db.event_cursors.update_one({"_id": self.consumer, "owner": self._owner}, {"$set": {"position": position}})
+
+    async def deliver(self, db: AsyncIOMotorDatabase, events: List[dict]):
+        companies = list({e["company_id"] for e in events})
+        hooks = await db.webhooks.find(
+            {"company_id": {"$in": companies}, "active": True, "is_deleted": False}, {"_id": 0}
+        ).to_list(None)
+        posts = []
+        for hook in hooks:
+            types = set(hook.get("event_types") or [])
+            matching = [public_event(e) for e in events if e["company_id"] == hook["company_id"] and (not types or e["type"] in types)]
+            for start in range(0, len(matching), WEBHOOK_BATCH_SIZE):
+                posts.append(self._post(db, hook, matching[start:start + WEBHOOK_BATCH_SIZE]))
+        # Webhooks are independent; a slow endpoint only delays this round
+        await asyncio.gather(*posts)
+
+    async def _post(self, db: AsyncIOMotorDatabase, hook: dict, events: List[dict]):
+        body = dumps({"webhook_id": hook["id"], "delivery_id": generate_id(), "events": events})
+        headers = {"Content-Type": "application/json", SIGNATURE_HEADER: sign(hook["secret"], body)}
+        # Checked per delivery: the host may have been re-pointed since registration
+        error = await webhook_url_error(hook["url"])
+        attempts = 0 if error else WEBHOOK_MAX_ATTEMPTS
+        for attempt in range(attempts):
+            if attempt:
+                await asyncio.sleep(min(2 ** (attempt - 1), 30))
+            try:
+                response = await self._http().post(hook["url"], content=body, headers=headers)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                continue
+            if response.status_code < 300:
+                error = None
+                break
+            error = f"HTTP {response.status_code}"
+            # Client errors other than timeouts / rate limits will not go away on retry
+            if response.status_code < 500 and response.status_code not in (408, 429):
+                break
+
+        now = utc_now()
+        if error is None:
+            await db.webhooks.update_one({"id": hook["id"]}, {"$set": {"last_delivery_at": now, "last_error": None, "failures": 0}})
+            return
+        logger.warning("Webhook %s: %d event(s) not delivered (%s)", hook["id"], len(events), error)
+        updated = await db.webhooks.find_one_and_update(
+            {"id": hook["id"]},
+            {"$set": {"last_error": error, "last_error_at": now}, "$inc": {"failures": 1}},
+            projection={"_id": 0, "failures": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if updated and updated["failures"] >= WEBHOOK_DISABLE_AFTER:
+            logger.warning("Webhook %s disabled after %d failed deliveries", hook["id"], updated["failures"])
+            await db.webhooks.update_one({"id": hook["id"]}, {"$set": {"active": False}})
+
+event_bus = EventBus()
+webhook_dispatcher = WebhookDispatcher()
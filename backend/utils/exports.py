@@ -0,0 +1,350 @@
+"""
+Attendance and leave exports.
+
+An export reads one company's records straight from a Motor cursor and
+writes them EXPORT_CHUNK_SIZE rows at a time, so memory stays flat however
+many rows there are:
+
+- csv: standard library; also streamed directly by GET /api/exports/stream;
+- xlsx: openpyxl write-only workbook, continued on a new sheet every
+  XLSX_MAX_ROWS rows (Excel's limit);
+- parquet: pyarrow, one row group per chunk.
+
+Larger exports run as background jobs (routes/exports.py). The job document
+in `export_jobs` carries status and progress and the file is written to
+EXPORT_DIR, under a temporary name until it is complete. Jobs run in the
+worker that accepted them, at most EXPORT_MAX_CONCURRENT at a time, and file
+writes happen on the runner's threads so the event loop keeps serving
+requests. With several workers or hosts EXPORT_DIR must be shared storage
+for downloads to find the file. Jobs and files expire after
+EXPORT_TTL_HOURS.
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from models.export import ExportKind, ExportFormat, ExportStatus
+from utils.attendance_store import attendance_store
+from utils.codec import to_bson_date, date_range, parse_datetime, utc_now
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+from enum import Enum
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+import asyncio
+import csv
+import importlib.util
+import io
+import logging
+import os
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+EXPORT_DIR = os.environ.get("EXPORT_DIR", os.path.join(tempfile.gettempdir(), "nexushr-exports"))
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", "5000"))
+EXPORT_MAX_CONCURRENT = int(os.environ.get("EXPORT_MAX_CONCURRENT", "2"))
+EXPORT_TTL_HOURS = float(os.environ.get("EXPORT_TTL_HOURS", "24"))
+XLSX_MAX_ROWS = 1_048_575  # plus the header row
+
+MEDIA_TYPES = {
+    ExportFormat.CSV: "text/csv",
+    ExportFormat.XLSX: "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ExportFormat.PARQUET: "application/vnd.apache.parquet",
+}
+# Formats backed by an optional package
+FORMAT_PACKAGES = {ExportFormat.XLSX: "openpyxl", ExportFormat.PARQUET: "pyarrow"}
+
+# (column, type) in file order; types are str, date, datetime and float
+COLUMNS: Dict[ExportKind, List[Tuple[str, str]]] = {
+    ExportKind.ATTENDANCE: [
+        ("date", "date"),
+        ("employee_id", "str"),
+        ("employee_code", "str"),
+        ("employee_name", "str"),
+        ("status", "str"),
+        ("shift_type", "str"),
+        ("clock_in", "datetime"),
+        ("clock_out", "datetime"),
+        ("working_hours", "float"),
+        ("overtime_hours", "float"),
+        ("break_hours", "float"),
+        ("notes", "str"),
+        ("id", "str"),
+    ],
+    ExportKind.LEAVES: [
+        ("start_date", "date"),
+        ("end_date", "date"),
+        ("employee_id", "str"),
+        ("employee_code", "str"),
+        ("employee_name", "str"),
+        ("leave_type", "str"),
+        ("status", "str"),
+        ("days_count", "float"),
+        ("reason", "str"),
+        ("approved_by", "str"),
+        ("approved_at", "datetime"),
+        ("created_at", "datetime"),
+        ("id", "str"),
+    ],
+}
+
+def format_available(fmt: ExportFormat) -> bool:
+    package = FORMAT_PACKAGES.get(fmt)
+    return package is None or importlib.util.find_spec(package) is not None
+
+# --- reading ---
+
+def _leave_query(company_id: str, start: Optional[date], end: Optional[date]) -> dict:
+    # Leaves overlapping [start, end]; each bound may be an $or (dual-format dates)
+    query = {"company_id": company_id, "is_deleted": False}
+    bounds = [b for b in (date_range("start_date", end=end), date_range("end_date", start=start)) if b]
+    if bounds:
+        query["$and"] = bounds
+    return query
+
+def _source(db: AsyncIOMotorDatabase, kind: ExportKind, company_id: str, start: Optional[date], end: Optional[date]):
+    if kind == ExportKind.ATTENDANCE:
+        pipeline = attendance_store.record_pipeline({"company_id": company_id, "is_deleted": False}, start, end)
+        pipeline.append({"$sort": {"date": 1, "id": 1}})
+        return db[attendance_store.collection].aggregate(pipeline, allowDiskUse=True, batchSize=EXPORT_CHUNK_SIZE)
+    cursor = db.leaves.find(_leave_query(company_id, start, end), {"_id": 0})
+    return cursor.sort([("start_date", 1), ("id", 1)]).batch_size(EXPORT_CHUNK_SIZE)
+
+async def count_rows(db: AsyncIOMotorDatabase, kind: ExportKind, company_id: str, start: Optional[date], end: Optional[date]) -> int:
+    if kind == ExportKind.ATTENDANCE:
+        pipeline = attendance_store.record_pipeline({"company_id": company_id, "is_deleted": False}, start, end)
+        result = await db[attendance_store.collection].aggregate([*pipeline, {"$count": "rows"}]).to_list(1)
+        return result[0]["rows"] if result else 0
+    return await db.leaves.count_documents(_leave_query(company_id, start, end))
+
+class _Employees:
+    """employee id -> (code, name), loaded for each chunk's new ids only."""
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self._db = db
+        self._known: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+
+    async def load(self, employee_ids: Set[str]):
+        missing = [employee_id for employee_id in employee_ids if employee_id not in self._known]
+        if not missing:
+            return
+        projection = {"_id": 0, "id": 1, "employee_code": 1, "first_name": 1, "last_name": 1}
+        async for e in self._db.employees.find({"id": {"$in": missing}}, projection):
+            name = " ".join(part for part in (e.get("first_name"), e.get("last_name")) if part)
+            self._known[e["id"]] = (e.get("employee_code"), name or None)
+        for employee_id in missing:
+            self._known.setdefault(employee_id, (None, None))
+
+    def get(self, employee_id: str) -> Tuple[Optional[str], Optional[str]]:
+        return self._known.get(employee_id, (None, None))
+
+def _cell(value, kind: str):
+    if value is None:
+        return None
+    if kind == "date":
+        return to_bson_date(value).date()
+    if kind == "datetime":
+        return parse_datetime(value).astimezone(timezone.utc)
+    if kind == "float":
+        return float(value)
+    return value.value if isinstance(value, Enum) else str(value)
+
+async def row_chunks(
+    db: AsyncIOMotorDatabase,
+    kind: ExportKind,
+    company_id: str,
+    start: Optional[date],
+    end: Optional[date],
+) -> AsyncIterator[List[list]]:
+    """Typed rows in COLUMNS[kind] order, EXPORT_CHUNK_SIZE at a time."""
+    columns = COLUMNS[kind]
+    employees = _Employees(db)
+    chunk: List[dict] = []
+
+    async def rows() -> List[list]:
+        await employees.load({doc["employee_id"] for doc in chunk})
+        out = []
+        for doc in chunk:
+            code, name = employees.get(doc["employee_id"])
+            doc = {**doc, "employee_code": code, "employee_name": name}
+            out.append([_cell(doc.get(column), column_type) for column, column_type in columns])
+        return out
+
+    async for doc in _source(db, kind, company_id, start, end):
+        chunk.append(doc)
+        if len(chunk) >= EXPORT_CHUNK_SIZE:
+            yield await rows()
+            chunk = []
+    if chunk:
+        yield await rows()
+
+# --- writing ---
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+def csv_chunk(rows: List[list]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([[_text(v) for v in row] for row in rows])
+    return buffer.getvalue()
+
+async def csv_stream(
+    db: AsyncIOMotorDatabase,
+    kind: ExportKind,
+    company_id: str,
+    start: Optional[date],
+    end: Optional[date],
+) -> AsyncIterator[bytes]:
+    yield csv_chunk([[column for column, _ in COLUMNS[kind]]]).encode()
+    async for rows in row_chunks(db, kind, company_id, start, end):
+        yield csv_chunk(rows).encode()
+
+class CsvWriter:
+    def __init__(self, path: str, kind: ExportKind):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._file.write(csv_chunk([[column for column, _ in COLUMNS[kind]]]))
+
+    def write(self, rows: List[list]):
+        self._file.write(csv_chunk(rows))
+
+    def close(self):
+        self._file.close()
+
+class XlsxWriter:
+    def __init__(self, path: str, kind: ExportKind):
+        from openpyxl import Workbook
+        self._path = path
+        self._kind = kind
+        self._workbook = Workbook(write_only=True)
+        self._sheets = 0
+        self._new_sheet()
+
+    def _new_sheet(self):
+        self._sheets += 1
+        title = self._kind.value if self._sheets == 1 else f"{self._kind.value} {self._sheets}"
+        self._sheet = self._workbook.create_sheet(title)
+        self._sheet.append([column for column, _ in COLUMNS[self._kind]])
+        self._sheet_rows = 0
+
+    def write(self, rows: List[list]):
+        for row in rows:
+            if self._sheet_rows >= XLSX_MAX_ROWS:
+                self._new_sheet()
+            # Excel has no time zones; timestamps are written as naive UTC
+            self._sheet.append([v.replace(tzinfo=None) if isinstance(v, datetime) else v for v in row])
+            self._sheet_rows += 1
+
+    def close(self):
+        self._workbook.save(self._path)
+
+class ParquetWriter:
+    def __init__(self, path: str, kind: ExportKind):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._pa = pa
+        types = {"str": pa.string(), "date": pa.date32(), "datetime": pa.timestamp("ms", tz="UTC"), "float": pa.float64()}
+        self._schema = pa.schema([(column, types[column_type]) for column, column_type in COLUMNS[kind]])
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write(self, rows: List[list]):
+        arrays = [
+            self._pa.array([row[i] for row in rows], type=field.type)
+            for i, field in enumerate(self._schema)
+        ]
+        self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+WRITERS = {ExportFormat.CSV: CsvWriter, ExportFormat.XLSX: XlsxWriter, ExportFormat.PARQUET: ParquetWriter}
+
+def export_path(job: dict) -> str:
+    return os.path.join(EXPORT_DIR, f"{job['id']}.{job['format']}")
+
+def download_name(job: dict) -> str:
+    start = job.get("start_date")
+    end = job.get("end_date")
+    span = "_".join(_cell(d, "date").isoformat() if d else "all" for d in (start, end))
+    return f"{job['kind']}_{span}.{job['format']}"
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def purge_expired_files():
+    """Delete export files older than EXPORT_TTL_HOURS (their jobs have expired too)."""
+    cutoff = time.time() - EXPORT_TTL_HOURS * 3600
+    try:
+        entries = list(os.scandir(EXPORT_DIR))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            _remove(entry.path)
+
+# --- background jobs ---
+
+class ExportRunner:
+    """Runs export jobs in the background of this worker, a bounded number at a time."""
+    def __init__(self, max_concurrent: int):
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="export")
+        self._tasks: Set[asyncio.Task] = set()
+
+    def submit(self, db: AsyncIOMotorDatabase, job: dict):
+        task = asyncio.create_task(self._run(db, job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _update(self, db: AsyncIOMotorDatabase, job_id: str, **changes):
+        await db.export_jobs.update_one({"id": job_id}, {"$set": {**changes, "updated_at": utc_now()}})
+
+    async def _run(self, db: AsyncIOMotorDatabase, job: dict):
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            path = export_path(job)
+            partial = path + ".part"
+            try:
+                await loop.run_in_executor(self._executor, purge_expired_files)
+                total = await count_rows(db, job["kind"], job["company_id"], job.get("start_date"), job.get("end_date"))
+                await self._update(db, job["id"], status=ExportStatus.RUNNING, started_at=utc_now(), rows_total=total)
+                rows = await self._write(db, job, partial)
+                os.replace(partial, path)
+            except asyncio.CancelledError:
+                _remove(partial)
+                await self._update(db, job["id"], status=ExportStatus.FAILED, error="Interrupted by a server restart", finished_at=utc_now())
+                raise
+            except Exception as e:
+                logger.exception("Export %s failed", job["id"])
+                _remove(partial)
+                await self._update(db, job["id"], status=ExportStatus.FAILED, error=str(e), finished_at=utc_now())
+            else:
+                await self._update(
+                    db, job["id"], status=ExportStatus.COMPLETED, rows_written=rows,
+                    file_size=os.path.getsize(path), finished_at=utc_now()
+                )
+
+    async def _write(self, db: AsyncIOMotorDatabase, job: dict, path: str) -> int:
+        loop = asyncio.get_running_loop()
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        writer = await loop.run_in_executor(self._executor, WRITERS[ExportFormat(job["format"])], path, ExportKind(job["kind"]))
+        written = 0
+        try:
+            async for rows in row_chunks(db, ExportKind(job["kind"]), job["company_id"], job.get("start_date"), job.get("end_date")):
+                await loop.run_in_executor(self._executor, writer.write, rows)
+                written += len(rows)
+                await self._update(db, job["id"], rows_written=written)
+        finally:
+            await loop.run_in_executor(self._executor, writer.close)
+        return written
+
+    async def shutdown(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._executor.shutdown(wait=False)
+
+export_runner = ExportRunner(EXPORT_MAX_CONCURRENT)
@@ -1,3 +1,4 @@
+import os
 import uuid
 from datetime import datetime, date
 from typing import Any, Dict
@@ -19,6 +20,13 @@ def calculate_working_hours(clock_in: datetime, clock_out: datetime) -> float:
     hours = delta.total_seconds() / 3600
     return round(hours, 2)
 
+STANDARD_WORKING_HOURS = float(os.environ.get("STANDARD_WORKING_HOURS", 8))
+
+def calculate_overtime_hours(working_hours: float, standard_hours: float = STANDARD_WORKING_HOURS) -> float:
+    if not working_hours:
+        return 0.0
+    return round(max(0.0, working_hours - standard_hours), 2)
+
 def calculate_days_between(start_date: date, end_date: date) -> float:
     delta = end_date - start_date
     return delta.days + 1
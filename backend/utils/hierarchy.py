@@ -0,0 +1,198 @@
+"""
+Manager hierarchy as a materialised path.
+
+Each employee stores `manager_path`, the ids of every manager above them from
+the top of the chart down to their direct manager, and `manager_depth`
+(len(manager_path)). With a multikey index on (company_id, manager_path,
+manager_depth) every hierarchy question is a single indexed query:
+
+- all reports of X:         {"manager_path": X}
+- reports within N levels:  {"manager_path": X, "manager_depth": {"$lte": depth(X) + N}}
+- approval chain of Y:      the employees whose ids are in Y.manager_path
+- headcount per manager:    $unwind manager_path, $group
+
+Paths are set on create, re-parented subtrees are rewritten with one
+pipeline update in update_employee, and the whole hierarchy of a company can
+be recomputed (e.g. after an import, or to repair concurrent moves) with:
+
+    python -m utils.hierarchy --company-id <id>
+"""
+from fastapi import HTTPException, status
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+async def manager_path_for(
+    db: AsyncIOMotorDatabase,
+    company_id: str,
+    manager_id: Optional[str],
+    employee_id: Optional[str] = None,
+) -> List[str]:
+    """
+    Path for an employee reporting to manager_id. Rejects managers from
+    another company and, when employee_id is given, moves that would create
+    a cycle.
+    """
+    if not manager_id:
+        return []
+    if manager_id == employee_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="An employee cannot be their own manager"
+        )
+    manager = await db.employees.find_one(
+        {"id": manager_id, "company_id": company_id, "is_deleted": False},
+        {"_id": 0, "manager_path": 1}
+    )
+    if not manager:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid manager_id. The manager does not exist or does not belong to this company."
+        )
+    path = manager.get("manager_path") or []
+    if employee_id and employee_id in path:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid manager_id. The manager reports to this employee."
+        )
+    return path + [manager_id]
+
+async def move_subtree(db: AsyncIOMotorDatabase, company_id: str, employee_id: str, new_path: List[str]) -> int:
+    """Rewrite the paths of everyone below employee_id after it moved to new_path."""
+    prefix = new_path + [employee_id]
+    result = await db.employees.update_many(
+        {"company_id": company_id, "manager_path": employee_id},
+        [
+            {"$set": {"manager_path": {"$concatArrays": [
+                prefix,
+                {"$slice": [
+                    "$manager_path",
+                    {"$add": [{"$indexOfArray": ["$manager_path", employee_id]}, 1]},
+                    {"$max": [{"$size": "$manager_path"}, 1]},
+                ]},
+            ]}}},
+            {"$set": {"manager_depth": {"$size": "$manager_path"}}},
+        ]
+    )
+    return result.modified_count
+
+def reports_query(employee: dict, depth: Optional[int] = None) -> dict:
+    query = {"company_id": employee["company_id"], "manager_path": employee["id"], "is_deleted": False}
+    if depth is not None:
+        query["manager_depth"] = {"$lte": employee.get("manager_depth", 0) + depth}
+    return query
+
+async def approval_chain(db: AsyncIOMotorDatabase, employee: dict, projection: dict) -> List[dict]:
+    """Managers of `employee`, nearest first."""
+    path = employee.get("manager_path") or []
+    if not path:
+        return []
+    managers = await db.employees.find(
+        {"company_id": employee["company_id"], "id": {"$in": path}, "is_deleted": False},
+        projection
+    ).to_list(len(path))
+    by_id = {m["id"]: m for m in managers}
+    return [by_id[manager_id] for manager_id in reversed(path) if manager_id in by_id]
+
+async def headcount(db: AsyncIOMotorDatabase, employee: dict) -> dict:
+    """Reports of one employee, in total and per level below them."""
+    base = employee.get("manager_depth", 0)
+    rows = await db.employees.aggregate([
+        {"$match": reports_query(employee)},
+        {"$group": {"_id": "$manager_depth", "count": {"$sum": 1}}},
+    ]).to_list(None)
+    counts = {row["_id"] - base: row["count"] for row in rows}
+    by_level = [counts.get(level, 0) for level in range(1, max(counts, default=0) + 1)]
+    return {
+        "employee_id": employee["id"],
+        "direct_reports": by_level[0] if by_level else 0,
+        "total_reports": sum(by_level),
+        "by_level": by_level,
+    }
+
+async def headcount_rollup(db: AsyncIOMotorDatabase, company_id: str) -> List[dict]:
+    """Direct and total reports for every manager in a company, in one aggregation."""
+    return await db.employees.aggregate([
+        {"$match": {"company_id": company_id, "is_deleted": False, "manager_depth": {"$gt": 0}}},
+        {"$project": {"_id": 0, "manager_path": 1, "manager_id": 1}},
+        {"$unwind": "$manager_path"},
+        {"$group": {
+            "_id": "$manager_path",
+            "total_reports": {"$sum": 1},
+            "direct_reports": {"$sum": {"$cond": [{"$eq": ["$manager_id", "$manager_path"]}, 1, 0]}},
+        }},
+        {"$project": {"_id": 0, "employee_id": "$_id", "direct_reports": 1, "total_reports": 1}},
+        {"$sort": {"total_reports": -1, "employee_id": 1}},
+    ]).to_list(None)
+
+def compute_paths(managers: Dict[str, Optional[str]]) -> Dict[str, List[str]]:
+    """
+    Paths for {employee_id: manager_id}. Managers outside the map end the
+    chain; a cycle is broken at the employee where it is detected.
+    """
+    paths: Dict[str, List[str]] = {}
+    for start in managers:
+        chain = []
+        seen = set()
+        node = start
+        while node is not None and node not in paths:
+            if node in seen:
+                logger.warning("Manager cycle through %s; treating it as top of chart", node)
+                managers[node] = None
+                chain = chain[:chain.index(node) + 1]
+                break
+            seen.add(node)
+            chain.append(node)
+            manager = managers.get(node)
+            node = manager if manager in managers else None
+        # Resolve from the top of the chain down
+        for employee_id in reversed(chain):
+            manager = managers.get(employee_id)
+            paths[employee_id] = paths[manager] + [manager] if manager in paths else []
+    return paths
+
+async def rebuild_hierarchy(db: AsyncIOMotorDatabase, company_id: str, batch_size: int = 1000) -> int:
+    """Recompute manager_path/manager_depth for a company; returns documents changed."""
+    docs = await db.employees.find(
+        {"company_id": company_id, "is_deleted": False},
+        {"_id": 0, "id": 1, "manager_id": 1, "manager_path": 1}
+    ).to_list(None)
+    current = {doc["id"]: doc.get("manager_path") for doc in docs}
+    paths = compute_paths({doc["id"]: doc.get("manager_id") for doc in docs})
+
+    operations = [
+        UpdateOne({"id": employee_id}, {"$set": {"manager_path": path, "manager_depth": len(path)}})
+        for employee_id, path in paths.items() if current.get(employee_id) != path
+    ]
+    changed = 0
+    for start in range(0, len(operations), batch_size):
+        result = await db.employees.bulk_write(operations[start:start + batch_size], ordered=False)
+        changed += result.modified_count
+    return changed
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from utils.database import connect_to_mongo, close_mongo_connection
+
+    parser = argparse.ArgumentParser(description="Recompute employee manager paths")
+    parser.add_argument("--company-id", required=True)
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+    logging.basicConfig(level=logging.INFO)
+
+    async def main():
+        db = connect_to_mongo()
+        try:
+            count = await rebuild_hierarchy(db, args.company_id)
+        finally:
+            close_mongo_connection()
+        print(f"Updated manager paths on {count} employees")
+
+    asyncio.run(main())
@@ -0,0 +1,246 @@
+"""
+Index definitions for every collection the API queries.
+
+The declarations below are applied at startup (see server.py) and can also
+be managed from the command line:
+
+    python -m utils.indexes              # report drift only
+    python -m utils.indexes --apply      # create missing / changed indexes
+    python -m utils.indexes --apply --drop-extra
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+from typing import Dict, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+NOT_DELETED = {"is_deleted": False}
+
+def _index(keys, name: str, unique: bool = False, partial: dict = None, expire_after: int = None) -> IndexModel:
+    options = {"name": name}
+    if unique:
+        options["unique"] = True
+    if partial:
+        options["partialFilterExpression"] = partial
+    if expire_after is not None:
+        options["expireAfterSeconds"] = expire_after
+    return IndexModel(keys, **options)
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        _index([("id", ASCENDING)], "users_id", unique=True),
+        _index([("email", ASCENDING)], "users_email_active", unique=True, partial=NOT_DELETED),
+        _index([("company_id", ASCENDING)], "users_company", partial=NOT_DELETED),
+    ],
+    "companies": [
+        _index([("id", ASCENDING)], "companies_id", unique=True),
+        _index([("code", ASCENDING)], "companies_code", unique=True),
+    ],
+    "branches": [
+        _index([("id", ASCENDING)], "branches_id", unique=True),
+        _index([("company_id", ASCENDING)], "branches_company", partial=NOT_DELETED),
+    ],
+    "departments": [
+        _index([("id", ASCENDING)], "departments_id", unique=True),
+        _index([("company_id", ASCENDING), ("code", ASCENDING)], "departments_company_code", partial=NOT_DELETED),
+        _index([("company_id", ASCENDING), ("branch_id", ASCENDING)], "departments_company_branch", partial=NOT_DELETED),
+    ],
+    "teams": [
+        _index([("id", ASCENDING)], "teams_id", unique=True),
+        _index([("company_id", ASCENDING), ("department_id", ASCENDING)], "teams_company_department", partial=NOT_DELETED),
+    ],
+    "employees": [
+        _index([("id", ASCENDING)], "employees_id", unique=True),
+        _index([("company_id", ASCENDING), ("employee_code", ASCENDING)], "employees_company_code", unique=True, partial=NOT_DELETED),
+        _index([("company_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], "employees_company_created", partial=NOT_DELETED),
+        _index([("company_id", ASCENDING), ("department_id", ASCENDING)], "employees_company_department", partial=NOT_DELETED),
+        _index([("company_id", ASCENDING), ("employment_status", ASCENDING)], "employees_company_status", partial=NOT_DELETED),
+        _index([("manager_id", ASCENDING)], "employees_manager", partial=NOT_DELETED),
+        # Reporting-chain queries on the materialised manager path (utils/hierarchy.py)
+        _index([("company_id", ASCENDING), ("manager_path", ASCENDING), ("manager_depth", ASCENDING)], "employees_company_manager_path", partial=NOT_DELETED),
+        # Typeahead: anchored regex over normalised name/email/code keys (utils/employee_search.py)
+        _index([("company_id", ASCENDING), ("search_keys", ASCENDING)], "employees_company_search_keys", partial=NOT_DELETED),
+        IndexModel(
+            [("company_id", ASCENDING), ("first_name", TEXT), ("last_name", TEXT), ("email", TEXT), ("employee_code", TEXT), ("designation", TEXT)],
+            name="employees_text",
+            weights={"first_name": 10, "last_name": 10, "employee_code": 10, "email": 5, "designation": 2},
+            default_language="none",
+            partialFilterExpression=NOT_DELETED,
+        ),
+    ],
+    "attendance": [
+        _index([("id", ASCENDING)], "attendance_id", unique=True),
+        # One record per employee per day; clock-in upserts rely on this
+        _index([("employee_id", ASCENDING), ("date", ASCENDING)], "attendance_employee_day", unique=True, partial=NOT_DELETED),
+        _index([("employee_id", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)], "attendance_employee_date", partial=NOT_DELETED),
+        _index([("company_id", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)], "attendance_company_date", partial=NOT_DELETED),
+    ],
+    # ATTENDANCE_STORAGE=buckets (see utils/attendance_store.py)
+    "attendance_buckets": [
+        _index([("employee_id", ASCENDING), ("month", ASCENDING)], "attendance_buckets_employee_month", unique=True),
+        _index([("company_id", ASCENDING), ("month", ASCENDING)], "attendance_buckets_company_month"),
+        _index([("days.id", ASCENDING)], "attendance_buckets_day_id", unique=True),
+    ],
+    "attendance_rollups": [
+        _index([("company_id", ASCENDING), ("employee_id", ASCENDING), ("year", ASCENDING), ("month", ASCENDING)], "attendance_rollups_key", unique=True),
+        _index([("company_id", ASCENDING), ("year", ASCENDING), ("month", ASCENDING), ("employee_id", ASCENDING), ("id", ASCENDING)], "attendance_rollups_company_period"),
+    ],
+    "leaves": [
+        _index([("id", ASCENDING)], "leaves_id", unique=True),
+        _index([("company_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], "leaves_company_created", partial=NOT_DELETED),
+        _index([("company_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], "leaves_company_status_created", partial=NOT_DELETED),
+        _index([("employee_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], "leaves_employee_created", partial=NOT_DELETED),
+        # Approval inbox: only pending leaves are indexed, so it stays small
+        _index([("employee_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], "leaves_pending_employee",
+               partial={"is_deleted": False, "status": "pending"}),
+        # Interval lookups for overlap checks: equality on employee, range on start_date, end_date filtered in the index
+        _index([("employee_id", ASCENDING), ("start_date", ASCENDING), ("end_date", ASCENDING)], "leaves_employee_interval", partial=NOT_DELETED),
+        # Exports (utils/exports.py) read a company's leaves in start_date order
+        _index([("company_id", ASCENDING), ("start_date", ASCENDING), ("id", ASCENDING)], "leaves_company_start", partial=NOT_DELETED),
+    ],
+    "leave_balances": [
+        _index([("employee_id", ASCENDING), ("year", ASCENDING), ("leave_type", ASCENDING)], "leave_balances_employee_year_type", unique=True),
+        _index([("company_id", ASCENDING), ("year", ASCENDING), ("leave_type", ASCENDING)], "leave_balances_company_year_type"),
+    ],
+    "holidays": [
+        _index([("id", ASCENDING)], "holidays_id", unique=True),
+        _index([("company_id", ASCENDING), ("date", ASCENDING), ("id", ASCENDING)], "holidays_company_date", unique=True, partial=NOT_DELETED),
+    ],
+    "leave_ledger": [
+        # Idempotency key: one usage/reversal per leave, one carry per balance
+        _index([("key", ASCENDING)], "leave_ledger_key", unique=True),
+        _index([("employee_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], "leave_ledger_employee_created"),
+        _index([("company_id", ASCENDING), ("year", ASCENDING), ("employee_id", ASCENDING)], "leave_ledger_company_year_employee"),
+    ],
+    "export_jobs": [
+        _index([("id", ASCENDING)], "export_jobs_id", unique=True),
+        _index([("company_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], "export_jobs_company_created"),
+        # Jobs are removed once they expire; their files are purged by utils/exports.py
+        _index([("expires_at", ASCENDING)], "export_jobs_expiry", expire_after=0),
+    ],
+    "events": [
+        # Read in _id order (the default _id index); kept for EVENT_RETENTION_DAYS
+        _index([("expires_at", ASCENDING)], "events_expiry", expire_after=0),
+    ],
+    "webhooks": [
+        _index([("id", ASCENDING)], "webhooks_id", unique=True),
+        _index([("company_id", ASCENDING), ("created_at", ASCENDING)], "webhooks_company_created", partial=NOT_DELETED),
+    ],
+}
+
+def _normalise(spec: dict) -> dict:
+    """Reduce an index document to the options we manage, for comparison."""
+    key = [(k, int(v) if isinstance(v, (int, float)) else v) for k, v in spec["key"]]
+    weights = spec.get("weights")
+    text_fields = [k for k, v in key if v == TEXT and k != "_fts"]
+    if text_fields:
+        # The server stores text indexes as _fts/_ftsx placeholders plus a weights map
+        first = key.index((text_fields[0], TEXT))
+        key = [kv for kv in key[:first] if kv[1] != TEXT] + [("_fts", TEXT), ("_ftsx", 1)] + [kv for kv in key[first:] if kv[1] != TEXT]
+        weights = {field: (weights or {}).get(field, 1) for field in text_fields}
+    return {
+        "key": key,
+        "unique": bool(spec.get("unique", False)),
+        "partialFilterExpression": spec.get("partialFilterExpression"),
+        "expireAfterSeconds": spec.get("expireAfterSeconds"),
+        "weights": {k: int(v) for k, v in weights.items()} if weights else None,
+    }
+
+async def check_index_drift(db: AsyncIOMotorDatabase) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Compare the declared indexes with what exists in the database.
+    Returns {collection: {"missing": [...], "changed": [...], "extra": [...]}}
+    for every collection that has drifted.
+    """
+    drift = {}
+    for collection, models in INDEXES.items():
+        existing = await db[collection].index_information()
+        existing.pop("_id_", None)
+
+        report = {"missing": [], "changed": [], "extra": []}
+        declared_names = set()
+        for model in models:
+            declared = model.document
+            declared_names.add(declared["name"])
+            current = existing.get(declared["name"])
+            if current is None:
+                report["missing"].append(declared["name"])
+            elif _normalise(current) != _normalise({**declared, "key": list(declared["key"].items())}):
+                report["changed"].append(declared["name"])
+
+        report["extra"] = sorted(set(existing) - declared_names)
+        if any(report.values()):
+            drift[collection] = report
+    return drift
+
+async def ensure_indexes(db: AsyncIOMotorDatabase, drop_extra: bool = False) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Create missing indexes and rebuild ones whose definition changed.
+    Extra (undeclared) indexes are only reported unless drop_extra is set.
+    Returns the drift that was found before applying.
+    """
+    drift = await check_index_drift(db)
+    for collection, report in drift.items():
+        models = {m.document["name"]: m for m in INDEXES[collection]}
+
+        for name in report["changed"]:
+            logger.warning("Rebuilding index %s.%s (definition changed)", collection, name)
+            await db[collection].drop_index(name)
+
+        to_create = [models[name] for name in report["missing"] + report["changed"]]
+        if to_create:
+            try:
+                await db[collection].create_indexes(to_create)
+                logger.info("Created indexes on %s: %s", collection, [m.document["name"] for m in to_create])
+            except OperationFailure as e:
+                # Typically a unique index over existing duplicates; keep the app running.
+                logger.error("Failed to create indexes on %s: %s", collection, e)
+
+        for name in report["extra"]:
+            if drop_extra:
+                logger.warning("Dropping undeclared index %s.%s", collection, name)
+                await db[collection].drop_index(name)
+            else:
+                logger.warning("Undeclared index %s.%s (left in place)", collection, name)
+    return drift
+
+def format_drift(drift: Dict[str, Dict[str, List[str]]]) -> str:
+    if not drift:
+        return "All indexes match the declared definitions."
+    lines = []
+    for collection, report in sorted(drift.items()):
+        for kind in ("missing", "changed", "extra"):
+            for name in report[kind]:
+                lines.append(f"{collection}: {kind} {name}")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from utils.database import connect_to_mongo, close_mongo_connection
+
+    parser = argparse.ArgumentParser(description="Manage MongoDB indexes for Nexus HR")
+    parser.add_argument("--apply", action="store_true", help="create missing or changed indexes")
+    parser.add_argument("--drop-extra", action="store_true", help="drop indexes that are not declared (requires --apply)")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+    logging.basicConfig(level=logging.INFO)
+
+    async def main():
+        db = connect_to_mongo()
+        try:
+            if args.apply:
+                drift = await ensure_indexes(db, drop_extra=args.drop_extra)
+            else:
+                drift = await check_index_drift(db)
+            print(format_drift(drift))
+            return 1 if drift and not args.apply else 0
+        finally:
+            close_mongo_connection()
+
+    raise SystemExit(asyncio.run(main()))
@@ -0,0 +1,166 @@
+"""
+Approval inbox and batched leave decisions.
+
+The inbox of a manager is the pending leaves of their reports: the report
+ids come from the manager_path index (see utils/hierarchy.py) and the leaves
+from a partial index holding only pending leaves, so both queries stay small
+however many decided leaves a company accumulates.
+
+apply_decisions() handles hundreds of approve/reject decisions with a fixed
+number of round trips:
+
+1. one find for the leaves, one for the reporting scope, one for balances;
+2. approvals that the balances cannot cover are refused up front;
+3. one bulk_write moves the leaves out of pending, guarded on status so a
+   leave decided concurrently elsewhere is skipped;
+4. one bulk_write debits the balances and one insert_many posts the ledger
+   entries (utils.leave_ledger.debit_leaves); approvals whose balance changed
+   in the meantime go back to pending;
+5. one insert_many publishes an event per decided leave.
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from models.leave import Leave, LeaveStatus, LeaveDecision
+from utils.helpers import generate_id
+from utils.codec import utc_now, parse_datetime
+from utils.leave_ledger import balance_key, needs_balance, debit_leaves
+from utils.events import event, publish_many
+from typing import Dict, List, Optional, Set
+
+def pending_query(company_id: Optional[str] = None, employee_ids: Optional[List[str]] = None) -> dict:
+    # Matches the partial filter of the leaves_pending_employee index
+    query = {"is_deleted": False, "status": LeaveStatus.PENDING.value}
+    if company_id:
+        query["company_id"] = company_id
+    if employee_ids is not None:
+        query["employee_id"] = {"$in": employee_ids}
+    return query
+
+async def report_ids(db: AsyncIOMotorDatabase, company_id: str, manager_id: str, depth: Optional[int] = None) -> List[str]:
+    """Ids of manager_id's reports, down to `depth` levels (all levels when None)."""
+    query = {"company_id": company_id, "manager_path": manager_id, "is_deleted": False}
+    if depth is not None:
+        manager = await db.employees.find_one({"id": manager_id}, {"_id": 0, "manager_depth": 1})
+        query["manager_depth"] = {"$lte": (manager or {}).get("manager_depth", 0) + depth}
+    return await db.employees.distinct("id", query)
+
+async def _decidable_employees(db: AsyncIOMotorDatabase, current_user: dict, employee_ids: List[str]) -> Optional[Set[str]]:
+    """Employees whose leaves current_user may decide, among employee_ids; None means no restriction."""
+    if current_user["role"] != "manager":
+        return None
+    if not current_user.get("employee_id"):
+        return set()
+    return set(await db.employees.distinct("id", {
+        "id": {"$in": employee_ids},
+        "company_id": current_user["company_id"],
+        "manager_path": current_user["employee_id"],
+    }))
+
+async def _fit_balances(db: AsyncIOMotorDatabase, approvals: List[dict]) -> Set[str]:
+    """
+    Ids of approvals that the current balances cannot cover, oldest requests
+    served first. Leave types without a balance are not limited.
+    """
+    tracked = [leave for leave in approvals if needs_balance(leave)]
+    if not tracked:
+        return set()
+    available = {
+        (b["employee_id"], b["year"], b["leave_type"]): b["balance"]
+        async for b in db.leave_balances.find(
+            {"employee_id": {"$in": list({leave["employee_id"] for leave in tracked})}},
+            {"_id": 0, "employee_id": 1, "year": 1, "leave_type": 1, "balance": 1}
+        )
+    }
+    refused = set()
+    for leave in sorted(tracked, key=lambda leave: (parse_datetime(leave["created_at"]), leave["id"])):
+        key = balance_key(leave)
+        if key not in available:
+            continue
+        if available[key] >= leave["days_count"]:
+            available[key] -= leave["days_count"]
+        else:
+            refused.add(leave["id"])
+    return refused
+
+async def apply_decisions(db: AsyncIOMotorDatabase, decisions: List[LeaveDecision], current_user: dict) -> dict:
+    report = {"total": len(decisions), "approved": 0, "rejected": 0, "failed": 0, "errors": []}
+
+    def fail(leave_id: str, error: str):
+        report["failed"] += 1
+        report["errors"].append({"leave_id": leave_id, "error": error})
+
+    by_id: Dict[str, LeaveDecision] = {}
+    for decision in decisions:
+        if decision.leave_id in by_id:
+            fail(decision.leave_id, "Duplicate decision for this leave")
+        else:
+            by_id[decision.leave_id] = decision
+
+    query = {"id": {"$in": list(by_id)}, "is_deleted": False}
+    if current_user["role"] != "super_admin":
+        query["company_id"] = current_user["company_id"]
+    leaves = {leave["id"]: leave async for leave in db.leaves.find(query, {"_id": 0})}
+    allowed = await _decidable_employees(db, current_user, list({leave["employee_id"] for leave in leaves.values()}))
+
+    candidates = []
+    for leave_id in by_id:
+        leave = leaves.get(leave_id)
+        if not leave:
+            fail(leave_id, "Leave request not found")
+        elif allowed is not None and leave["employee_id"] not in allowed:
+            fail(leave_id, "Not one of your reports")
+        elif leave["status"] != LeaveStatus.PENDING.value:
+            fail(leave_id, f"Leave is already {leave['status']}")
+        else:
+            candidates.append(leave)
+
+    refused = await _fit_balances(db, [leave for leave in candidates if by_id[leave["id"]].status == LeaveStatus.APPROVED.value])
+    for leave_id in refused:
+        fail(leave_id, "Insufficient leave balance")
+    candidates = [leave for leave in candidates if leave["id"] not in refused]
+    if not candidates:
+        return report
+
+    # Claim the leaves; the batch id tells us afterwards which updates won
+    batch_id = generate_id()
+    now = utc_now()
+    operations = []
+    changed = {}
+    for leave in candidates:
+        decision = by_id[leave["id"]]
+        changes = {"status": decision.status, "updated_at": now, "decision_batch": batch_id}
+        if decision.status == LeaveStatus.APPROVED.value:
+            changes.update(approved_by=current_user["sub"], approved_at=now)
+        else:
+            changes["rejection_reason"] = decision.rejection_reason
+        changed[leave["id"]] = {**leave, **changes}
+        operations.append(UpdateOne({"id": leave["id"], "status": LeaveStatus.PENDING.value, "is_deleted": False}, {"$set": changes}))
+    result = await db.leaves.bulk_write(operations, ordered=False)
+    if result.modified_count < len(operations):
+        claimed = set(await db.leaves.distinct("id", {"id": {"$in": [leave["id"] for leave in candidates]}, "decision_batch": batch_id}))
+        for leave in candidates:
+            if leave["id"] not in claimed:
+                fail(leave["id"], "Leave was changed concurrently")
+        candidates = [leave for leave in candidates if leave["id"] in claimed]
+
+    approvals = [leave for leave in candidates if by_id[leave["id"]].status == LeaveStatus.APPROVED.value]
+    unpaid = await debit_leaves(db, approvals, batch_id, current_user["sub"])
+    if unpaid:
+        await db.leaves.bulk_write([
+            UpdateOne(
+                {"id": leave_id, "decision_batch": batch_id, "status": LeaveStatus.APPROVED.value},
+                {"$set": {"status": LeaveStatus.PENDING.value, "approved_by": None, "approved_at": None, "updated_at": utc_now()}}
+            )
+            for leave_id in unpaid
+        ], ordered=False)
+        for leave_id in unpaid:
+            fail(leave_id, "Insufficient leave balance")
+
+    await publish_many(db, [
+        event(f"leave.{by_id[leave['id']].status}", leave["company_id"], leave["id"], changed[leave["id"]], Leave)
+        for leave in candidates if leave["id"] not in unpaid
+    ])
+
+    report["approved"] = len(approvals) - len(unpaid)
+    report["rejected"] = len(candidates) - len(approvals)
+    return report
@@ -0,0 +1,62 @@
+"""
+Working-day arithmetic for leave requests.
+
+A leave's days_count is the number of the company's working days (its
+`working_days`, Monday-Friday by default) between start_date and end_date
+inclusive, minus the company holidays that fall on one of them. Counting is
+O(1) in the length of the leave plus one indexed query for the holidays in
+range.
+
+Overlap checks rely on the (employee_id, start_date, end_date) index: two
+leaves overlap when one starts on or before the other ends and ends on or
+after it starts.
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from models.company import DEFAULT_WORKING_DAYS
+from models.leave import LeaveStatus
+from utils.codec import date_range
+from datetime import date, datetime
+from typing import Iterable, Optional, Set, Union
+
+# Leaves in these states block overlapping requests
+ACTIVE_LEAVE_STATUSES = [LeaveStatus.PENDING.value, LeaveStatus.APPROVED.value]
+
+def _as_date(value: Union[date, datetime, str]) -> date:
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+def count_working_days(start: date, end: date, working_days: Iterable[int], holidays: Iterable[date] = ()) -> float:
+    """Working days in [start, end], excluding holidays."""
+    if end < start:
+        return 0.0
+    weekdays = set(working_days)
+    weeks, extra = divmod((end - start).days + 1, 7)
+    days = weeks * len(weekdays)
+    days += sum(1 for offset in range(extra) if (start.weekday() + offset) % 7 in weekdays)
+    days -= sum(1 for holiday in set(holidays) if start <= holiday <= end and holiday.weekday() in weekdays)
+    return float(days)
+
+async def holidays_between(db: AsyncIOMotorDatabase, company_id: str, start: date, end: date) -> Set[date]:
+    query = {"company_id": company_id, "is_deleted": False, **date_range("date", start, end)}
+    return {_as_date(h["date"]) async for h in db.holidays.find(query, {"_id": 0, "date": 1})}
+
+async def leave_days(db: AsyncIOMotorDatabase, company_id: str, start: date, end: date) -> float:
+    company = await db.companies.find_one({"id": company_id}, {"_id": 0, "working_days": 1})
+    working_days = (company or {}).get("working_days") or DEFAULT_WORKING_DAYS
+    return count_working_days(start, end, working_days, await holidays_between(db, company_id, start, end))
+
+def overlap_query(employee_id: str, start: date, end: date, exclude_id: Optional[str] = None) -> dict:
+    """Active leaves of employee_id sharing at least one day with [start, end]."""
+    query = {
+        "employee_id": employee_id,
+        "is_deleted": False,
+        "status": {"$in": ACTIVE_LEAVE_STATUSES},
+        # Each bound may be an $or (dual-format dates), so combine with $and
+        "$and": [date_range("start_date", end=end), date_range("end_date", start=start)],
+    }
+    if exclude_id:
+        query["id"] = {"$ne": exclude_id}
+    return query
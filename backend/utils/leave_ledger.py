@@ -0,0 +1,416 @@
+"""
+Leave ledger and materialised balances.
+
+Every change to a balance is appended to `leave_ledger` with its signed
+effect in days (allocations and reversals positive, usage and carry-out
+negative). `leave_balances` holds the running totals, maintained with $inc:
+
+    balance = total_allocated + carried_forward - used - carried_out
+
+Debits are guarded with {"balance": {"$gte": days}} so a balance can never go
+negative, however many approvals race. A leave type is only tracked for an
+employee once it has a balance, i.e. once days were allocated or carried in:
+until then approvals are not limited and their usage is only recorded in
+the ledger, and the first allocation takes it into account. The balance update and the ledger
+insert are separate writes; ledger entries carry a unique idempotency key,
+and the reconciliation job first posts any usage/reversal entries missing for
+approved/cancelled leaves, then rebuilds balances from the ledger:
+
+    python -m utils.leave_ledger --company-id <id> [--year 2025]
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from models.leave import LeaveType, LeaveStatus, LedgerEntryKind
+from utils.helpers import generate_id
+from utils.codec import utc_now
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+LEDGER_COLLECTION = "leave_ledger"
+DUPLICATE_KEY = 11000
+
+BALANCE_TOTALS = ("total_allocated", "used", "balance", "carried_forward", "carried_out")
+
+# Leave types that do not draw on a balance
+UNTRACKED_LEAVE_TYPES = {LeaveType.UNPAID}
+
+def leave_year(leave: dict) -> int:
+    return leave["start_date"].year if not isinstance(leave["start_date"], str) else int(leave["start_date"][:4])
+
+def _is_tracked(leave_type) -> bool:
+    return LeaveType(leave_type) not in UNTRACKED_LEAVE_TYPES
+
+def _balance_filter(employee_id: str, year: int, leave_type) -> dict:
+    return {"employee_id": employee_id, "year": year, "leave_type": LeaveType(leave_type).value}
+
+def ledger_entry(
+    key: str,
+    kind: LedgerEntryKind,
+    employee_id: str,
+    company_id: str,
+    year: int,
+    leave_type,
+    days: float,
+    leave_id: Optional[str] = None,
+    note: Optional[str] = None,
+    created_by: Optional[str] = None,
+) -> dict:
+    return {
+        "id": generate_id(),
+        "key": key,
+        "employee_id": employee_id,
+        "company_id": company_id,
+        "year": year,
+        "leave_type": LeaveType(leave_type).value,
+        "kind": kind.value,
+        "days": days,
+        "leave_id": leave_id,
+        "note": note,
+        "created_by": created_by,
+        "created_at": utc_now(),
+    }
+
+async def post_entry(db: AsyncIOMotorDatabase, *args, **kwargs) -> bool:
+    """Append a ledger entry; returns False if one with the same key exists."""
+    try:
+        await db[LEDGER_COLLECTION].insert_one(ledger_entry(*args, **kwargs))
+        return True
+    except DuplicateKeyError:
+        return False
+
+async def post_entries(db: AsyncIOMotorDatabase, entries: List[dict]) -> int:
+    """Append many ledger entries, skipping keys already posted. Returns the number inserted."""
+    if not entries:
+        return 0
+    try:
+        result = await db[LEDGER_COLLECTION].insert_many(entries, ordered=False)
+        return len(result.inserted_ids)
+    except BulkWriteError as e:
+        if any(error["code"] != DUPLICATE_KEY for error in e.details["writeErrors"]):
+            raise
+        return e.details["nInserted"]
+
+def _balance_upsert(employee_id: str, company_id: str, year: int, leave_type, increments: dict) -> UpdateOne:
+    now = utc_now()
+    return UpdateOne(
+        _balance_filter(employee_id, year, leave_type),
+        {
+            "$inc": increments,
+            "$set": {"updated_at": now},
+            "$setOnInsert": {
+                "id": generate_id(), "company_id": company_id, "created_at": now,
+                **{field: 0.0 for field in BALANCE_TOTALS if field not in increments},
+            },
+        },
+        upsert=True
+    )
+
+async def allocate(
+    db: AsyncIOMotorDatabase,
+    employee_id: str,
+    company_id: str,
+    year: int,
+    leave_type,
+    days: float,
+    note: Optional[str] = None,
+    created_by: Optional[str] = None,
+) -> dict:
+    """Grant days to a balance. Returns the balance."""
+    if days <= 0:
+        # A withdrawal would bypass the guard that keeps balances from going negative
+        raise ValueError("Allocated days must be positive")
+    result = await db.leave_balances.bulk_write([
+        _balance_upsert(employee_id, company_id, year, leave_type, {"total_allocated": days, "balance": days})
+    ])
+    if result.upserted_count:
+        # Leave approved while the type was untracked counts against the new balance
+        match = {**_balance_filter(employee_id, year, leave_type), "kind": {"$in": [LedgerEntryKind.USAGE.value, LedgerEntryKind.REVERSAL.value]}}
+        used = -sum([entry["days"] async for entry in db[LEDGER_COLLECTION].find(match, {"_id": 0, "days": 1})])
+        if used:
+            await db.leave_balances.update_one(
+                _balance_filter(employee_id, year, leave_type), {"$inc": {"used": used, "balance": -used}}
+            )
+    await post_entry(
+        db, f"allocation:{generate_id()}", LedgerEntryKind.ALLOCATION,
+        employee_id, company_id, year, leave_type, days, note=note, created_by=created_by
+    )
+    return await db.leave_balances.find_one(_balance_filter(employee_id, year, leave_type), {"_id": 0})
+
+async def debit_leave(db: AsyncIOMotorDatabase, leave: dict, created_by: Optional[str] = None) -> bool:
+    """
+    Deduct an approved leave from its balance. Returns False, changing
+    nothing, when the balance is too small. Without a balance the type is
+    untracked for the employee: only the usage entry is posted.
+    """
+    days = leave["days_count"]
+    if not needs_balance(leave):
+        return True
+    year = leave_year(leave)
+    balance_filter = _balance_filter(leave["employee_id"], year, leave["leave_type"])
+    result = await db.leave_balances.update_one(
+        {**balance_filter, "balance": {"$gte": days}},
+        {"$inc": {"used": days, "balance": -days}, "$set": {"updated_at": utc_now()}}
+    )
+    if result.modified_count == 0 and await db.leave_balances.find_one(balance_filter, {"_id": 1}):
+        return False
+    await post_entry(
+        db, f"usage:{leave['id']}", LedgerEntryKind.USAGE, leave["employee_id"], leave["company_id"],
+        year, leave["leave_type"], -days, leave_id=leave["id"], created_by=created_by
+    )
+    return True
+
+def balance_key(leave: dict) -> Tuple[str, int, str]:
+    return (leave["employee_id"], leave_year(leave), LeaveType(leave["leave_type"]).value)
+
+def needs_balance(leave: dict) -> bool:
+    return _is_tracked(leave["leave_type"]) and leave["days_count"] > 0
+
+async def debit_leaves(
+    db: AsyncIOMotorDatabase,
+    leaves: List[dict],
+    batch_id: str,
+    created_by: Optional[str] = None,
+) -> Set[str]:
+    """
+    debit_leave() for many approved leaves: one guarded $inc per balance in a
+    single bulk_write, then one insert_many into the ledger. A balance that
+    cannot cover all of its leaves is left alone; leaves without a balance
+    only get their usage entry. Returns the ids of the leaves that were not
+    debited.
+    """
+    groups: Dict[Tuple[str, int, str], List[dict]] = defaultdict(list)
+    for leave in leaves:
+        if needs_balance(leave):
+            groups[balance_key(leave)].append(leave)
+    if not groups:
+        return set()
+
+    now = utc_now()
+    totals = {key: sum(leave["days_count"] for leave in group) for key, group in groups.items()}
+    operations = [
+        UpdateOne(
+            {**_balance_filter(*key), "balance": {"$gte": total}},
+            {"$inc": {"used": total, "balance": -total}, "$set": {"updated_at": now, "last_batch_id": batch_id}}
+        )
+        for key, total in totals.items()
+    ]
+    result = await db.leave_balances.bulk_write(operations, ordered=False)
+    applied = set(groups)
+    if result.modified_count < len(operations):
+        # The result has no per-operation detail; the batch id marks the balances we debited
+        refused = {
+            (b["employee_id"], b["year"], b["leave_type"])
+            async for b in db.leave_balances.find(
+                {"employee_id": {"$in": list({key[0] for key in groups})}, "last_batch_id": {"$ne": batch_id}},
+                {"_id": 0, "employee_id": 1, "year": 1, "leave_type": 1}
+            )
+        }
+        applied = set(groups) - refused
+
+    await post_entries(db, [
+        ledger_entry(f"usage:{leave['id']}", LedgerEntryKind.USAGE, leave["employee_id"], leave["company_id"],
+                     key[1], key[2], -leave["days_count"], leave_id=leave["id"], created_by=created_by)
+        for key in applied for leave in groups[key]
+    ])
+    return {leave["id"] for key, group in groups.items() if key not in applied for leave in group}
+
+async def credit_leave(db: AsyncIOMotorDatabase, leave: dict, created_by: Optional[str] = None) -> bool:
+    """
+    Give back the days of a cancelled, previously approved leave. Only a
+    leave whose usage was posted is credited, and only once: the reversal
+    entry is upserted on its key and the balance moves only when it was
+    inserted. Returns whether the balance was credited.
+    """
+    if not needs_balance(leave):
+        return False
+    if not await db[LEDGER_COLLECTION].find_one({"key": f"usage:{leave['id']}"}, {"_id": 0, "days": 1}):
+        return False
+    days = leave["days_count"]
+    year = leave_year(leave)
+    entry = ledger_entry(
+        f"reversal:{leave['id']}", LedgerEntryKind.REVERSAL, leave["employee_id"], leave["company_id"],
+        year, leave["leave_type"], days, leave_id=leave["id"], created_by=created_by
+    )
+    try:
+        result = await db[LEDGER_COLLECTION].update_one({"key": entry["key"]}, {"$setOnInsert": entry}, upsert=True)
+    except DuplicateKeyError:
+        # A concurrent cancellation inserted it first
+        return False
+    if result.upserted_id is None:
+        return False
+    await db.leave_balances.update_one(
+        _balance_filter(leave["employee_id"], year, leave["leave_type"]),
+        {"$inc": {"used": -days, "balance": days}, "$set": {"updated_at": utc_now()}}
+    )
+    return True
+
+async def carry_forward(
+    db: AsyncIOMotorDatabase,
+    company_id: Optional[str],
+    from_year: int,
+    leave_type,
+    max_days: float,
+    created_by: Optional[str] = None,
+) -> dict:
+    """
+    Move up to max_days of each remaining balance into the next year.
+    A balance is only carried once (guarded on carried_out == 0).
+    """
+    query = {**({"company_id": company_id} if company_id else {}), "year": from_year,
+             "leave_type": LeaveType(leave_type).value, "balance": {"$gt": 0}, "carried_out": {"$in": [0, None]}}
+    employees = 0
+    total = 0.0
+    async for source in db.leave_balances.find(query, {"_id": 0}):
+        days = round(min(source["balance"], max_days), 2)
+        result = await db.leave_balances.update_one(
+            {"id": source["id"], "balance": {"$gte": days}, "carried_out": {"$in": [0, None]}},
+            {"$inc": {"balance": -days, "carried_out": days}, "$set": {"updated_at": utc_now()}}
+        )
+        if result.modified_count == 0:
+            continue
+        await db.leave_balances.bulk_write([
+            _balance_upsert(source["employee_id"], source["company_id"], from_year + 1, leave_type,
+                            {"carried_forward": days, "balance": days})
+        ])
+        args = (source["employee_id"], source["company_id"])
+        await post_entry(db, f"carry_out:{source['id']}", LedgerEntryKind.CARRY_OUT, *args, from_year, leave_type, -days, created_by=created_by)
+        await post_entry(db, f"carry_in:{source['id']}", LedgerEntryKind.CARRY_IN, *args, from_year + 1, leave_type, days, created_by=created_by)
+        employees += 1
+        total += days
+    return {"employees": employees, "days": round(total, 2)}
+
+# --- reconciliation ---
+
+async def _post_missing_leave_entries(db: AsyncIOMotorDatabase, company_id: str, year: Optional[int], batch_size: int) -> int:
+    """Ledger entries for approved/cancelled leaves whose balance write was not followed by one."""
+    query = {"company_id": company_id, "is_deleted": False,
+             "status": {"$in": [LeaveStatus.APPROVED.value, LeaveStatus.CANCELLED.value]},
+             "leave_type": {"$nin": [t.value for t in UNTRACKED_LEAVE_TYPES]}}
+
+    async def post_missing(leaves: List[dict]) -> int:
+        # One lookup per batch for the keys already posted
+        keys = [key for leave in leaves for key in (f"usage:{leave['id']}", f"reversal:{leave['id']}")]
+        posted_keys = set(await db[LEDGER_COLLECTION].distinct("key", {"key": {"$in": keys}}))
+        entries = []
+        for leave in leaves:
+            usage_key, reversal_key = f"usage:{leave['id']}", f"reversal:{leave['id']}"
+            args = (leave["employee_id"], company_id, leave_year(leave), leave["leave_type"])
+            if usage_key not in posted_keys and leave["status"] == LeaveStatus.APPROVED.value:
+                entries.append(ledger_entry(usage_key, LedgerEntryKind.USAGE, *args, -leave["days_count"],
+                                            leave_id=leave["id"], note="reconciliation"))
+            elif usage_key in posted_keys and reversal_key not in posted_keys and leave["status"] == LeaveStatus.CANCELLED.value:
+                entries.append(ledger_entry(reversal_key, LedgerEntryKind.REVERSAL, *args, leave["days_count"],
+                                            leave_id=leave["id"], note="reconciliation"))
+        return await post_entries(db, entries)
+
+    posted = 0
+    batch = []
+    async for leave in db.leaves.find(query, {"_id": 0}).batch_size(batch_size):
+        if year is not None and leave_year(leave) != year:
+            continue
+        batch.append(leave)
+        if len(batch) == batch_size:
+            posted += await post_missing(batch)
+            batch = []
+    if batch:
+        posted += await post_missing(batch)
+    return posted
+
+def _totals_pipeline(match: dict) -> List[dict]:
+    def total(*kinds, sign=1):
+        return {"$sum": {"$cond": [{"$in": ["$kind", [k.value for k in kinds]]}, {"$multiply": ["$days", sign]}, 0]}}
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": {"employee_id": "$employee_id", "year": "$year", "leave_type": "$leave_type"},
+            "company_id": {"$first": "$company_id"},
+            "total_allocated": total(LedgerEntryKind.ALLOCATION, LedgerEntryKind.ADJUSTMENT),
+            "used": total(LedgerEntryKind.USAGE, LedgerEntryKind.REVERSAL, sign=-1),
+            "carried_forward": total(LedgerEntryKind.CARRY_IN),
+            "carried_out": total(LedgerEntryKind.CARRY_OUT, sign=-1),
+            "balance": {"$sum": "$days"},
+        }},
+    ]
+
+def _round(value):
+    return round(value, 2) if isinstance(value, float) else value
+
+def _batches(items: List[str], size: int) -> Iterable[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+async def reconcile_balances(
+    db: AsyncIOMotorDatabase,
+    company_id: str,
+    year: Optional[int] = None,
+    batch_size: int = 500,
+) -> dict:
+    """
+    Rebuild leave_balances for a company from the ledger, batch_size
+    employees at a time. Returns counts of posted entries and corrected balances.
+    """
+    posted = await _post_missing_leave_entries(db, company_id, year, batch_size)
+
+    scope = {"company_id": company_id, **({"year": year} if year is not None else {})}
+    employee_ids = sorted(await db[LEDGER_COLLECTION].distinct("employee_id", scope))
+    corrected = 0
+    for batch in _batches(employee_ids, batch_size):
+        match = {**scope, "employee_id": {"$in": batch}}
+        rows = await db[LEDGER_COLLECTION].aggregate(_totals_pipeline(match)).to_list(None)
+        current = {
+            (b["employee_id"], b["year"], b["leave_type"]): b
+            async for b in db.leave_balances.find(match, {"_id": 0})
+        }
+        now = utc_now()
+        operations = []
+        for row in rows:
+            key = row.pop("_id")
+            totals = {field: _round(value) for field, value in row.items() if field != "company_id"}
+            existing = current.get((key["employee_id"], key["year"], key["leave_type"]))
+            if not existing and not (totals["total_allocated"] or totals["carried_forward"]):
+                # Usage of a type never allocated to the employee stays untracked
+                continue
+            if existing and all(_round(existing.get(field) or 0) == value for field, value in totals.items()):
+                continue
+            if existing:
+                logger.info("Correcting leave balance %s: %s", key, totals)
+            operations.append(UpdateOne(
+                key,
+                {"$set": {**totals, "updated_at": now},
+                 "$setOnInsert": {"id": generate_id(), "company_id": row["company_id"], "created_at": now}},
+                upsert=True
+            ))
+        if operations:
+            await db.leave_balances.bulk_write(operations, ordered=False)
+            corrected += len(operations)
+    return {"posted_entries": posted, "corrected_balances": corrected}
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from utils.database import connect_to_mongo, close_mongo_connection
+
+    parser = argparse.ArgumentParser(description="Rebuild leave balances from the leave ledger")
+    parser.add_argument("--company-id", required=True)
+    parser.add_argument("--year", type=int)
+    parser.add_argument("--batch-size", type=int, default=500, help="employees per batch")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+    logging.basicConfig(level=logging.INFO)
+
+    async def main():
+        db = connect_to_mongo()
+        try:
+            result = await reconcile_balances(db, args.company_id, args.year, args.batch_size)
+        finally:
+            close_mongo_connection()
+        print(f"Posted {result['posted_entries']} missing ledger entries, corrected {result['corrected_balances']} balances")
+
+    asyncio.run(main())
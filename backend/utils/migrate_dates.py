@@ -0,0 +1,133 @@
+"""
+Online migration of ISO-string dates to native BSON datetimes.
+
+Documents are converted in _id order, one batch at a time. Each update is
+guarded on the original string values, so a document modified by the API
+between read and write is simply picked up again on the next pass. The API
+keeps working throughout because STORAGE_DATE_COMPAT makes queries match both
+formats; once a run reports nothing left to convert, set
+STORAGE_DATE_COMPAT=false.
+
+    python -m utils.migrate_dates [--collection attendance] [--batch-size 1000] [--pause 0.05] [--dry-run]
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from utils.codec import to_bson_date, to_bson_datetime
+from typing import Dict, List, Optional
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMPS = ["created_at", "updated_at"]
+
+# collection -> {"dates": calendar date fields, "datetimes": timestamp fields}
+DATE_FIELDS: Dict[str, Dict[str, List[str]]] = {
+    "users": {"dates": [], "datetimes": TIMESTAMPS},
+    "companies": {"dates": [], "datetimes": TIMESTAMPS},
+    "branches": {"dates": [], "datetimes": TIMESTAMPS},
+    "departments": {"dates": [], "datetimes": TIMESTAMPS},
+    "teams": {"dates": [], "datetimes": TIMESTAMPS},
+    "employees": {
+        "dates": ["date_of_birth", "date_of_joining", "date_of_leaving", "passport_expiry", "visa_expiry"],
+        "datetimes": TIMESTAMPS,
+    },
+    "attendance": {"dates": ["date"], "datetimes": ["clock_in", "clock_out"] + TIMESTAMPS},
+    "attendance_rollups": {"dates": [], "datetimes": TIMESTAMPS},
+    "leaves": {"dates": ["start_date", "end_date"], "datetimes": ["approved_at"] + TIMESTAMPS},
+    "leave_balances": {"dates": [], "datetimes": TIMESTAMPS},
+}
+
+def _convert(doc: dict, fields: Dict[str, List[str]]) -> dict:
+    changes = {}
+    for field in fields["dates"]:
+        if isinstance(doc.get(field), str):
+            changes[field] = to_bson_date(doc[field])
+    for field in fields["datetimes"]:
+        if isinstance(doc.get(field), str):
+            changes[field] = to_bson_datetime(doc[field])
+    return changes
+
+async def migrate_collection(
+    db: AsyncIOMotorDatabase,
+    name: str,
+    batch_size: int = 1000,
+    pause: float = 0.05,
+    dry_run: bool = False,
+) -> dict:
+    """Convert one collection; returns counts of scanned, converted and failed documents."""
+    fields = DATE_FIELDS[name]
+    all_fields = fields["dates"] + fields["datetimes"]
+    pending = {"$or": [{field: {"$type": "string"}} for field in all_fields]}
+    stats = {"scanned": 0, "converted": 0, "failed": 0}
+
+    last_id = None
+    while True:
+        query = pending if last_id is None else {"$and": [pending, {"_id": {"$gt": last_id}}]}
+        batch = await db[name].find(query, {field: 1 for field in all_fields}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+        stats["scanned"] += len(batch)
+
+        operations = []
+        for doc in batch:
+            try:
+                changes = _convert(doc, fields)
+            except ValueError as e:
+                stats["failed"] += 1
+                logger.warning("%s %s: unparseable date (%s)", name, doc["_id"], e)
+                continue
+            if changes:
+                guard = {"_id": doc["_id"], **{field: doc[field] for field in changes}}
+                operations.append(UpdateOne(guard, {"$set": changes}))
+
+        if operations and not dry_run:
+            result = await db[name].bulk_write(operations, ordered=False)
+            stats["converted"] += result.modified_count
+        elif dry_run:
+            stats["converted"] += len(operations)
+
+        logger.info("%s: scanned %d, converted %d", name, stats["scanned"], stats["converted"])
+        if pause:
+            await asyncio.sleep(pause)
+    return stats
+
+async def migrate_all(
+    db: AsyncIOMotorDatabase,
+    collections: Optional[List[str]] = None,
+    batch_size: int = 1000,
+    pause: float = 0.05,
+    dry_run: bool = False,
+) -> Dict[str, dict]:
+    results = {}
+    for name in collections or list(DATE_FIELDS):
+        results[name] = await migrate_collection(db, name, batch_size, pause, dry_run)
+    return results
+
+if __name__ == "__main__":
+    import argparse
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from utils.database import connect_to_mongo, close_mongo_connection
+
+    parser = argparse.ArgumentParser(description="Convert ISO-string dates to native BSON datetimes")
+    parser.add_argument("--collection", action="append", choices=sorted(DATE_FIELDS), help="repeatable; defaults to all")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds to sleep between batches")
+    parser.add_argument("--dry-run", action="store_true", help="count documents that would change")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+    logging.basicConfig(level=logging.INFO)
+
+    async def main():
+        db = connect_to_mongo()
+        try:
+            results = await migrate_all(db, args.collection, args.batch_size, args.pause, args.dry_run)
+        finally:
+            close_mongo_connection()
+        for name, stats in results.items():
+            print(f"{name}: {stats}")
+
+    asyncio.run(main())
@@ -0,0 +1,157 @@
+"""
+Per-company cache of the organisation structure (branches, departments, teams).
+
+The structure changes rarely but is read on almost every page load and when
+departments are validated. Each company's structure is loaded in one go into
+an immutable OrgSnapshot. Its version is a content hash, so every worker
+computes the same version for the same data and it can be used as an ETag.
+
+Consistency:
+- write handlers in routes/companies.py call invalidate() after every write;
+- a change stream on the three collections invalidates other workers;
+- entries also expire after ORG_CACHE_TTL seconds, which bounds staleness
+  when change streams are unavailable (standalone mongod).
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure, PyMongoError
+from utils.cache import TTLCache
+from typing import Dict, List, Optional
+import asyncio
+import hashlib
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+ORG_COLLECTIONS = ("branches", "departments", "teams")
+# "The $changeStream stage is only supported on replica sets"
+CHANGE_STREAMS_UNSUPPORTED = 40573
+
+class OrgSnapshot:
+    """Read-only view of one company's structure. Documents are in created_at order."""
+    def __init__(self, company_id: str, branches: List[dict], departments: List[dict], teams: List[dict]):
+        self.company_id = company_id
+        self.branches = branches
+        self.departments = departments
+        self.teams = teams
+        self.branches_by_id = {b["id"]: b for b in branches}
+        self.departments_by_id = {d["id"]: d for d in departments}
+        self.teams_by_id = {t["id"]: t for t in teams}
+        self.version = self._version()
+
+    def _version(self) -> str:
+        digest = hashlib.sha1()
+        for name in ORG_COLLECTIONS:
+            for doc in getattr(self, name):
+                digest.update(f"{name}:{doc['id']}:{doc.get('updated_at')};".encode())
+        return digest.hexdigest()[:16]
+
+    def departments_in_branch(self, branch_id: str) -> List[dict]:
+        return [d for d in self.departments if d.get("branch_id") == branch_id]
+
+    def teams_in_department(self, department_id: str) -> List[dict]:
+        return [t for t in self.teams if t.get("department_id") == department_id]
+
+class OrgCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize, ttl)
+        # Bumped by invalidate(); a load that started before an invalidation is not stored
+        self._generations: Dict[str, int] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._watcher: Optional[asyncio.Task] = None
+
+    async def get(self, db: AsyncIOMotorDatabase, company_id: str) -> OrgSnapshot:
+        snapshot = self._cache.get(company_id)
+        if snapshot is not None:
+            return snapshot
+        # One load per company at a time; concurrent callers wait for it
+        lock = self._locks.setdefault(company_id, asyncio.Lock())
+        async with lock:
+            snapshot = self._cache.get(company_id)
+            if snapshot is None:
+                generation = self._generations.setdefault(company_id, 0)
+                snapshot = await self._load(db, company_id)
+                if self._generations[company_id] == generation:
+                    self._cache.set(company_id, snapshot)
+        return snapshot
+
+    async def _load(self, db: AsyncIOMotorDatabase, company_id: str) -> OrgSnapshot:
+        query = {"company_id": company_id, "is_deleted": False}
+        sort = [("created_at", 1), ("id", 1)]
+        branches, departments, teams = await asyncio.gather(*[
+            db[name].find(query, {"_id": 0}).sort(sort).to_list(None) for name in ORG_COLLECTIONS
+        ])
+        return OrgSnapshot(company_id, branches, departments, teams)
+
+    def invalidate(self, company_id: Optional[str] = None):
+        """Drop one company's snapshot, or every snapshot when company_id is None."""
+        if company_id is None:
+            for key in list(self._generations):
+                self._generations[key] += 1
+            self._cache.clear()
+            return
+        self._generations[company_id] = self._generations.get(company_id, 0) + 1
+        self._cache.delete(company_id)
+
+    async def branch_exists(self, db: AsyncIOMotorDatabase, company_id: str, branch_id: str) -> bool:
+        snapshot = await self.get(db, company_id)
+        if branch_id in snapshot.branches_by_id:
+            return True
+        # A miss may just mean another worker created it moments ago; confirm before rejecting
+        branch = await db.branches.find_one({"id": branch_id, "company_id": company_id, "is_deleted": False}, {"_id": 1})
+        if branch:
+            self.invalidate(company_id)
+        return branch is not None
+
+    # --- cross-worker invalidation ---
+
+    def start_watcher(self, db: AsyncIOMotorDatabase):
+        if self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch(db))
+
+    async def stop_watcher(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+
+    async def _watch(self, db: AsyncIOMotorDatabase):
+        pipeline = [{"$match": {"ns.coll": {"$in": list(ORG_COLLECTIONS)}}}]
+        delay = 1
+        while True:
+            try:
+                async with db.watch(pipeline, full_document="updateLookup") as stream:
+                    # Anything may have changed while we were not watching
+                    self.invalidate()
+                    delay = 1
+                    async for change in stream:
+                        # Deletes carry no document; drop everything for those
+                        company_id = (change.get("fullDocument") or {}).get("company_id")
+                        self.invalidate(company_id)
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAMS_UNSUPPORTED:
+                    logger.info("Change streams need a replica set; org cache relies on its TTL across workers")
+                    return
+                logger.warning("Org cache change stream failed (%s); retrying in %ss", e, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+            except PyMongoError as e:
+                logger.warning("Org cache change stream unavailable (%s); retrying in %ss, TTL still applies", e, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+            except Exception:
+                logger.exception("Org cache watcher stopped; TTL still applies")
+                return
+
+    def stats(self) -> dict:
+        return {**self._cache.stats(), "watching": self._watcher is not None and not self._watcher.done()}
+
+org_cache = OrgCache(
+    maxsize=int(os.environ.get("ORG_CACHE_SIZE", 1000)),
+    ttl=float(os.environ.get("ORG_CACHE_TTL", 300)),
+)
@@ -0,0 +1,198 @@
+from fastapi import HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pydantic import BaseModel
+from bson import json_util
+from typing import List, Optional, Tuple, Type, Union
+from utils.helpers import serialize_datetime
+from utils.codec import DATE_COMPAT, parse_datetime
+from utils.serialization import serializer_for, document_response
+from datetime import datetime
+import base64
+import binascii
+import json
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+class PageParams:
+    """
+    Query parameters shared by every list endpoint.
+    - limit/cursor: keyset pagination; the next cursor is returned in the X-Next-Cursor header.
+    - stream: return every matching document as NDJSON instead of a single page.
+    """
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+        cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
+        stream: bool = Query(False, description="Stream all results as NDJSON"),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.stream = stream
+
+def encode_cursor(values: list) -> str:
+    raw = json_util.dumps(values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json_util.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, binascii.Error):
+        values = None
+    if not isinstance(values, list) or len(values) != 2:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+    return values
+
+def _keyset_filter(sort_field: str, direction: int, last_value, last_id: str) -> dict:
+    op = "$gt" if direction > 0 else "$lt"
+    if sort_field == "id":
+        return {"id": {op: last_id}}
+    branches = [
+        {sort_field: {op: last_value}},
+        {sort_field: last_value, "id": {op: last_id}},
+    ]
+    # While dates may be stored as strings or BSON dates, both kinds share one
+    # sort order (strings before dates) but $gt/$lt only compare within a type.
+    if DATE_COMPAT:
+        if direction > 0 and isinstance(last_value, str):
+            branches.append({sort_field: {"$type": "date"}})
+        elif direction < 0 and isinstance(last_value, datetime):
+            branches.append({sort_field: {"$type": "string"}})
+    return {"$or": branches}
+
+def _sort_spec(sort_field: str, direction: int) -> List[Tuple[str, int]]:
+    # "id" is the tiebreaker that makes the order total
+    if sort_field == "id":
+        return [("id", direction)]
+    return [(sort_field, direction), ("id", direction)]
+
+def _json_default(obj):
+    value = serialize_datetime(obj)
+    return value if value is not obj else str(obj)
+
+async def _ndjson_lines(cursor, model: Optional[Type[BaseModel]] = None):
+    if model is not None:
+        encode = serializer_for(model).dumps
+    else:
+        encode = lambda doc: json.dumps(doc, default=_json_default).encode()
+    buffer = []
+    async for doc in cursor:
+        buffer.append(encode(doc))
+        if len(buffer) >= STREAM_BATCH_SIZE:
+            yield b"\n".join(buffer) + b"\n"
+            buffer = []
+    if buffer:
+        yield b"\n".join(buffer) + b"\n"
+
+async def fetch_page(
+    collection: AsyncIOMotorCollection,
+    query: dict,
+    sort: Tuple[str, int],
+    page: PageParams,
+    projection: Optional[dict] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Fetch one page ordered by (sort field, id).
+    Returns the documents and the cursor for the next page (None on the last page).
+    """
+    sort_field, direction = sort
+    projection = projection if projection is not None else {"_id": 0}
+    if "id" not in projection and any(v for v in projection.values()):
+        projection = {**projection, "id": 1}
+    if sort_field not in projection and any(v for v in projection.values()):
+        projection = {**projection, sort_field: 1}
+
+    if page.cursor:
+        last_value, last_id = decode_cursor(page.cursor)
+        query = {"$and": [query, _keyset_filter(sort_field, direction, last_value, last_id)]}
+
+    docs = await collection.find(query, projection).sort(_sort_spec(sort_field, direction)).limit(page.limit + 1).to_list(page.limit + 1)
+
+    next_cursor = None
+    if len(docs) > page.limit:
+        docs = docs[:page.limit]
+        last = docs[-1]
+        next_cursor = encode_cursor([last.get(sort_field), last["id"]])
+    return docs, next_cursor
+
+async def paginate(
+    collection: AsyncIOMotorCollection,
+    query: dict,
+    sort: Tuple[str, int],
+    page: PageParams,
+    response: Response,
+    projection: Optional[dict] = None,
+    model: Optional[Type[BaseModel]] = None,
+) -> Union[List[dict], Response]:
+    """
+    Serve a list endpoint either as one keyset page (cursor in X-Next-Cursor)
+    or, when page.stream is set, as NDJSON straight from the Motor cursor.
+    With `model`, documents are encoded directly in that model's shape (see
+    utils/serialization.py) instead of being validated by response_model.
+    """
+    if page.stream:
+        sort_field, direction = sort
+        cursor = collection.find(query, projection if projection is not None else {"_id": 0})
+        cursor = cursor.sort(_sort_spec(sort_field, direction)).batch_size(STREAM_BATCH_SIZE)
+        return StreamingResponse(_ndjson_lines(cursor, model), media_type=NDJSON_MEDIA_TYPE)
+
+    docs, next_cursor = await fetch_page(collection, query, sort, page, projection)
+    if model is not None:
+        return document_response(model, docs, headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return docs
+
+def _memory_sort_value(value):
+    # Timestamps may be strings or datetimes (naive or aware) depending on their source
+    if isinstance(value, (str, datetime)):
+        try:
+            return parse_datetime(value)
+        except ValueError:
+            pass
+    return value
+
+def _memory_sort_key(value, doc_id: str) -> tuple:
+    # Missing values sort first, as null does in MongoDB, and are never compared with real ones
+    value = _memory_sort_value(value)
+    return (value is not None, value, doc_id)
+
+def paginate_documents(
+    docs: List[dict],
+    sort: Tuple[str, int],
+    page: PageParams,
+    model: Type[BaseModel],
+) -> Response:
+    """
+    paginate() for documents already in memory (e.g. from a cache), with the
+    same keyset cursors and NDJSON streaming. `docs` may be in any order.
+    """
+    sort_field, direction = sort
+
+    def key(doc):
+        return _memory_sort_key(doc.get(sort_field), doc["id"])
+
+    docs = sorted(docs, key=key, reverse=direction < 0)
+    if page.stream:
+        encode = serializer_for(model).dumps
+        lines = [encode(doc) + b"\n" for doc in docs]
+        return StreamingResponse(iter(lines), media_type=NDJSON_MEDIA_TYPE)
+
+    if page.cursor:
+        last_value, last_id = decode_cursor(page.cursor)
+        last = _memory_sort_key(last_value, last_id)
+        docs = [doc for doc in docs if (key(doc) > last if direction > 0 else key(doc) < last)]
+
+    next_cursor = None
+    if len(docs) > page.limit:
+        docs = docs[:page.limit]
+        next_cursor = encode_cursor([docs[-1].get(sort_field), docs[-1]["id"]])
+    return document_response(model, docs, headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None)
@@ -0,0 +1,65 @@
+"""
+Sparse fieldsets for list endpoints.
+
+`?fields=` takes a comma-separated list of field names and/or preset names.
+It is resolved to a response model holding only those fields, and that model's
+fields become the MongoDB projection, so unrequested data is never read from
+the server, decoded or encoded.
+"""
+from fastapi import HTTPException, status
+from pydantic import BaseModel, ConfigDict, create_model
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Type
+
+def _parse(fields: str) -> List[str]:
+    return [name.strip() for name in fields.split(",") if name.strip()]
+
+@lru_cache(maxsize=256)
+def sparse_model(model: Type[BaseModel], names: FrozenSet[str]) -> Type[BaseModel]:
+    """Copy of `model` restricted to `names`, every field optional."""
+    definitions = {
+        name: (Optional[model.model_fields[name].annotation], None)
+        for name in model.model_fields if name in names
+    }
+    return create_model(
+        f"{model.__name__}Fields",
+        __config__=ConfigDict(extra="ignore"),
+        **definitions,
+    )
+
+def resolve_fields(
+    fields: Optional[str],
+    model: Type[BaseModel],
+    presets: Dict[str, Type[BaseModel]],
+) -> Optional[Type[BaseModel]]:
+    """
+    Response model for a `fields=` value, or None for the full model.
+    A lone preset name returns the preset model itself; anything else is
+    built from `model` and always includes "id".
+    """
+    if not fields:
+        return None
+    tokens = _parse(fields)
+    if len(tokens) == 1 and tokens[0] in presets:
+        return presets[tokens[0]]
+
+    names = {"id"}
+    unknown = []
+    for token in tokens:
+        if token in presets:
+            names.update(presets[token].model_fields)
+        elif token in model.model_fields:
+            names.add(token)
+        else:
+            unknown.append(token)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}"
+        )
+    return sparse_model(model, frozenset(names))
+
+def projection_for(model: Type[BaseModel]) -> dict:
+    projection = {"_id": 0}
+    projection.update({name: 1 for name in model.model_fields})
+    return projection
@@ -0,0 +1,86 @@
+"""
+Fast response encoding for trusted documents.
+
+Documents read from MongoDB (or built by the handlers themselves) were
+validated on the way in, so validating them again into a model and then once
+more through response_model only burns CPU. DocumentSerializer shapes a raw
+document to a model's fields (defaults for missing keys, extra keys dropped,
+calendar dates stored as midnight datetimes rendered as dates) and orjson
+encodes the result directly.
+
+Only use this for data the application wrote; request bodies still go
+through the Pydantic models.
+"""
+from fastapi import status
+from fastapi.responses import Response
+from pydantic import BaseModel
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Iterable, List, Optional, Tuple, Type, Union, get_args
+import orjson
+
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NAIVE_UTC
+
+def _is_date_field(annotation: Any) -> bool:
+    # date (or Optional[date]) but not datetime, which subclasses date
+    candidates = get_args(annotation) or (annotation,)
+    return date in candidates and datetime not in candidates
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    return str(obj)
+
+def dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS)
+
+class DocumentSerializer:
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        self.fields: List[Tuple[str, Any, bool]] = []
+        for name, field in model.model_fields.items():
+            default = None if field.is_required() or field.default_factory else field.default
+            self.fields.append((name, default, _is_date_field(field.annotation)))
+        self._factories = {
+            name: field.default_factory
+            for name, field in model.model_fields.items() if field.default_factory
+        }
+
+    def prepare(self, doc: dict) -> dict:
+        out = {}
+        for name, default, is_date in self.fields:
+            if name in doc:
+                value = doc[name]
+                if is_date and isinstance(value, datetime):
+                    value = value.date()
+            elif name in self._factories:
+                value = self._factories[name]()
+            else:
+                value = default
+            out[name] = value
+        return out
+
+    def dumps(self, doc: dict) -> bytes:
+        return dumps(self.prepare(doc))
+
+    def dumps_many(self, docs: Iterable[dict]) -> bytes:
+        return dumps([self.prepare(doc) for doc in docs])
+
+@lru_cache(maxsize=None)
+def serializer_for(model: Type[BaseModel]) -> DocumentSerializer:
+    return DocumentSerializer(model)
+
+def document_response(
+    model: Type[BaseModel],
+    content: Union[dict, List[dict]],
+    status_code: int = status.HTTP_200_OK,
+    headers: Optional[dict] = None,
+) -> Response:
+    """
+    JSON response for one document or a list of documents, shaped like `model`.
+    Returning a Response skips the route's response_model validation, which
+    stays on the decorator for the OpenAPI schema.
+    """
+    serializer = serializer_for(model)
+    body = serializer.dumps_many(content) if isinstance(content, list) else serializer.dumps(content)
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
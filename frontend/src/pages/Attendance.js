@@ -23,7 +23,7 @@ const Attendance = () => {
     try {
       const [attendanceData, employeesData] = await Promise.all([
         attendanceService.getAttendance(),
-        employeeService.getEmployees(),
+        employeeService.getEmployees({ fields: 'summary' }),
       ]);
       setAttendanceRecords(attendanceData);
       setEmployees(employeesData);
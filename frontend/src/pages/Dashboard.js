@@ -1,9 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import Layout from '../components/Layout';
 import { useAuth } from '../context/AuthContext';
-import { employeeService } from '../services/employeeService';
-import { attendanceService } from '../services/attendanceService';
-import { leaveService } from '../services/leaveService';
+import { dashboardService } from '../services/dashboardService';
 import { Users, Clock, Calendar, TrendingUp } from 'lucide-react';
 import { BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer, PieChart, Pie, Cell } from 'recharts';
 
@@ -23,17 +21,13 @@ const Dashboard = () => {
 
   const loadDashboardData = async () => {
     try {
-      const [employees, attendance, leaves] = await Promise.all([
-        employeeService.getEmployees(),
-        attendanceService.getAttendance(),
-        leaveService.getLeaves({ status: 'pending' }),
-      ]);
+      const summary = await dashboardService.getSummary();
 
       setStats({
-        totalEmployees: employees.length,
-        activeEmployees: employees.filter((e) => e.employment_status === 'active').length,
-        todayAttendance: attendance.length,
-        pendingLeaves: leaves.length,
+        totalEmployees: summary.total_employees,
+        activeEmployees: summary.active_employees,
+        todayAttendance: summary.today_attendance,
+        pendingLeaves: summary.pending_leaves,
       });
     } catch (error) {
       console.error('Error loading dashboard:', error);
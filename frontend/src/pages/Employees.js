@@ -1,4 +1,4 @@
-import React, { useEffect, useState, useMemo } from 'react';
+import React, { useEffect, useState } from 'react';
 import Layout from '../components/Layout';
 import { employeeService } from '../services/employeeService';
 import { companyService } from '../services/companyService';
@@ -38,6 +38,7 @@ const Employees = () => {
   const [departments, setDepartments] = useState([]);
   const [loading, setLoading] = useState(true);
   const [searchTerm, setSearchTerm] = useState('');
+  const [searchResults, setSearchResults] = useState(null);
   
   // Modal State Management
   const [dialogMode, setDialogMode] = useState(null); // 'add' | 'edit' | 'view'
@@ -121,14 +122,31 @@ const Employees = () => {
     }
   };
 
-  const filteredEmployees = useMemo(() => {
-    return employees.filter((emp) =>
-      emp.first_name?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      emp.last_name?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      emp.email?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      emp.employee_code?.toLowerCase().includes(searchTerm.toLowerCase())
-    );
-  }, [employees, searchTerm]);
+  // Server-side search (debounced); the table shows the loaded page when the box is empty
+  useEffect(() => {
+    const term = searchTerm.trim();
+    if (!term) {
+      setSearchResults(null);
+      return undefined;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const user = JSON.parse(localStorage.getItem('user'));
+        const params = user?.company_id ? { company_id: user.company_id } : {};
+        const results = await employeeService.searchEmployees(term, params);
+        if (!cancelled) setSearchResults(results);
+      } catch (error) {
+        if (!cancelled) toast.error(getErrorMessage(error));
+      }
+    }, 200);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchTerm]);
+
+  const filteredEmployees = searchResults ?? employees;
 
   if (loading) {
     return (
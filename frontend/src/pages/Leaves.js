@@ -32,7 +32,7 @@ const Leaves = () => {
     try {
       const [leavesData, employeesData] = await Promise.all([
         leaveService.getLeaves(),
-        employeeService.getEmployees(),
+        employeeService.getEmployees({ fields: 'summary' }),
       ]);
       setLeaves(leavesData);
       setEmployees(employeesData);
@@ -46,17 +46,12 @@ const Leaves = () => {
   const handleSubmit = async (e) => {
     e.preventDefault();
     try {
-      const startDate = new Date(formData.start_date);
-      const endDate = new Date(formData.end_date);
-      const daysCount = Math.ceil((endDate - startDate) / (1000 * 60 * 60 * 24)) + 1;
-
       await leaveService.createLeave({
         employee_id: user.employee_id,
         company_id: user.company_id,
         leave_type: formData.leave_type,
         start_date: formData.start_date,
         end_date: formData.end_date,
-        days_count: daysCount,
         reason: formData.reason,
       });
       toast.success('Leave request submitted successfully');
@@ -32,4 +32,24 @@ api.interceptors.response.use(
   }
 );
 
+// List endpoints return one page at a time, with the next page's cursor in X-Next-Cursor.
+// Follows the cursor until it runs out and returns every item. With an explicit
+// limit or cursor, only that page is fetched.
+const MAX_PAGE_SIZE = 1000;
+
+export async function getAllPages(url, params = {}) {
+  if (params.limit || params.cursor) {
+    const response = await api.get(url, { params });
+    return response.data;
+  }
+  const items = [];
+  let cursor;
+  do {
+    const response = await api.get(url, { params: { ...params, limit: MAX_PAGE_SIZE, cursor } });
+    items.push(...response.data);
+    cursor = response.headers['x-next-cursor'];
+  } while (cursor);
+  return items;
+}
+
 export default api;
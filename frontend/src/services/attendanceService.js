@@ -1,4 +1,4 @@
-import api from './api';
+import api, { getAllPages } from './api';
 
 export const attendanceService = {
   async clockIn(data) {
@@ -12,10 +12,49 @@ export const attendanceService = {
   },
 
   async getAttendance(params = {}) {
-    const response = await api.get('/attendance', { params });
+    return getAllPages('/attendance', params);
+  },
+
+  async getAttendanceReport(params) {
+    const response = await api.get('/attendance/report', { params });
     return response.data;
   },
 
+  // Live board over Server-Sent Events; onEvent(type, data) gets 'snapshot' and 'delta'.
+  // EventSource cannot send the bearer token, so the stream is read with fetch. Returns a stop function.
+  watchBoard(params, onEvent) {
+    const controller = new AbortController();
+    const query = new URLSearchParams(params || {}).toString();
+    const url = `${api.defaults.baseURL}/attendance/board${query ? `?${query}` : ''}`;
+    const token = localStorage.getItem('token');
+
+    (async () => {
+      const response = await fetch(url, {
+        headers: token ? { Authorization: `Bearer ${token}` } : {},
+        signal: controller.signal,
+      });
+      const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+      let buffer = '';
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += value;
+        let end;
+        while ((end = buffer.indexOf('\n\n')) !== -1) {
+          const block = buffer.slice(0, end);
+          buffer = buffer.slice(end + 2);
+          const type = block.match(/^event: (.*)$/m);
+          const data = block.match(/^data: (.*)$/m);
+          if (type && data) onEvent(type[1], JSON.parse(data[1]));
+        }
+      }
+    })().catch((error) => {
+      if (error.name !== 'AbortError') console.error('Attendance board stream failed', error);
+    });
+
+    return () => controller.abort();
+  },
+
   async getAttendanceById(id) {
     const response = await api.get(`/attendance/${id}`);
     return response.data;
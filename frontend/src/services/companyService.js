@@ -1,10 +1,9 @@
-import api from './api';
+import api, { getAllPages } from './api';
 
 export const companyService = {
   // --- COMPANY ENDPOINTS ---
   async getCompanies() {
-    const response = await api.get('/companies');
-    return response.data;
+    return getAllPages('/companies');
   },
 
   async getCompany(id) {
@@ -24,8 +23,7 @@ export const companyService = {
 
   // --- BRANCH ENDPOINTS ---
   async getBranches(companyId) {
-    const response = await api.get(`/companies/${companyId}/branches`);
-    return response.data;
+    return getAllPages(`/companies/${companyId}/branches`);
   },
 
   async createBranch(companyId, data) {
@@ -35,8 +33,7 @@ export const companyService = {
 
   // --- DEPARTMENT ENDPOINTS ---
   async getDepartments(companyId) {
-    const response = await api.get(`/companies/${companyId}/departments`);
-    return response.data;
+    return getAllPages(`/companies/${companyId}/departments`);
   },
 
   async createDepartment(companyId, data) {
@@ -56,12 +53,25 @@ export const companyService = {
 
   // --- TEAM ENDPOINTS ---
   async getTeams(companyId) {
-    const response = await api.get(`/companies/${companyId}/teams`);
-    return response.data;
+    return getAllPages(`/companies/${companyId}/teams`);
   },
 
   async createTeam(companyId, data) {
     const response = await api.post(`/companies/${companyId}/teams`, data);
     return response.data;
   },
-};
\ No newline at end of file
+  // --- HOLIDAY ENDPOINTS ---
+  async getHolidays(companyId, year) {
+    return getAllPages(`/companies/${companyId}/holidays`, { year });
+  },
+
+  async createHoliday(companyId, data) {
+    const response = await api.post(`/companies/${companyId}/holidays`, data);
+    return response.data;
+  },
+
+  async deleteHoliday(companyId, holidayId) {
+    const response = await api.delete(`/companies/${companyId}/holidays/${holidayId}`);
+    return response.data;
+  },
+};
@@ -0,0 +1,8 @@
+import api from './api';
+
+export const dashboardService = {
+  async getSummary(params = {}) {
+    const response = await api.get('/dashboard/summary', { params });
+    return response.data;
+  },
+};
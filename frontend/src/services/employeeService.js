@@ -1,8 +1,12 @@
-import api from './api';
+import api, { getAllPages } from './api';
 
 export const employeeService = {
   async getEmployees(params = {}) {
-    const response = await api.get('/employees', { params });
+    return getAllPages('/employees', params);
+  },
+
+  async searchEmployees(q, params = {}) {
+    const response = await api.get('/employees/search', { params: { q, ...params } });
     return response.data;
   },
 
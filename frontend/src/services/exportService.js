@@ -0,0 +1,27 @@
+import api, { getAllPages } from './api';
+
+export const exportService = {
+  async createExport(data) {
+    const response = await api.post('/exports', data);
+    return response.data;
+  },
+
+  async getExports(params = {}) {
+    return getAllPages('/exports', params);
+  },
+
+  async getExport(id) {
+    const response = await api.get(`/exports/${id}`);
+    return response.data;
+  },
+
+  async downloadExport(id) {
+    const response = await api.get(`/exports/${id}/download`, { responseType: 'blob' });
+    return response.data;
+  },
+
+  async streamCsv(params) {
+    const response = await api.get('/exports/stream', { params, responseType: 'blob' });
+    return response.data;
+  },
+};
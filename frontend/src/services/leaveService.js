@@ -1,9 +1,8 @@
-import api from './api';
+import api, { getAllPages } from './api';
 
 export const leaveService = {
   async getLeaves(params = {}) {
-    const response = await api.get('/leaves', { params });
-    return response.data;
+    return getAllPages('/leaves', params);
   },
 
   async getLeave(id) {
@@ -21,6 +20,22 @@ export const leaveService = {
     return response.data;
   },
 
+  async getApprovalInbox(params = {}) {
+    return getAllPages('/leaves/inbox', params);
+  },
+
+  async decideLeaves(decisions) {
+    const response = await api.post('/leaves/decisions', { decisions });
+    return response.data;
+  },
+
+  async getLeaveDays(startDate, endDate) {
+    const response = await api.get('/leaves/days', {
+      params: { start_date: startDate, end_date: endDate },
+    });
+    return response.data;
+  },
+
   async getLeaveBalance(employeeId, year) {
     const response = await api.get(`/leaves/balance/${employeeId}`, {
       params: { year },
@@ -0,0 +1,36 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "nexushr_test")
+os.environ.setdefault("MONGO_ENSURE_INDEXES", "false")
+os.environ.setdefault("ORG_CACHE_WATCH", "false")
+os.environ.setdefault("EVENTS_ENABLED", "false")
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "1")
+
+@pytest.fixture
+def client(monkeypatch):
+    """API client backed by an in-memory MongoDB."""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from fastapi.testclient import TestClient
+    import utils.database as database
+
+    class InMemoryClient(mongomock_motor.AsyncMongoMockClient):
+        def __init__(self, url, **kwargs):
+            super().__init__()
+
+    monkeypatch.setattr(database, "AsyncIOMotorClient", InMemoryClient)
+    import server
+    from utils.auth import token_cache
+    from utils.entity_cache import entity_cache
+    from utils.cache import LocalBackend
+    token_cache.clear()
+    entity_cache.backend = LocalBackend(1000, 60)
+    with TestClient(server.app) as test_client:
+        yield test_client
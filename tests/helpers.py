@@ -0,0 +1,32 @@
+"""Request helpers shared by the API tests."""
+
+def login(client, email, password="password123"):
+    response = client.post("/api/auth/login", json={"email": email, "password": password})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def register(client, email, role, company_id=None, employee_id=None, password="password123"):
+    response = client.post("/api/auth/register", json={
+        "email": email, "password": password, "role": role,
+        "company_id": company_id, "employee_id": employee_id,
+    })
+    assert response.status_code == 201, response.text
+    return response.json()
+
+def super_admin(client, email="root@example.com"):
+    """Register a super admin and return their Authorization header."""
+    register(client, email, "super_admin")
+    return login(client, email)
+
+def create_company(client, admin, name="Acme", code="ACME"):
+    response = client.post("/api/companies", headers=admin, json={"name": name, "code": code, "country": "US"})
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+def create_employee(client, admin, company_id, code, **fields):
+    response = client.post("/api/employees", headers=admin, json={
+        "employee_code": code, "company_id": company_id, "first_name": code, "last_name": "Test",
+        "email": f"{code.lower()}@example.com", **fields,
+    })
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
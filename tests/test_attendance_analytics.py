@@ -0,0 +1,83 @@
+from datetime import date, datetime, timezone
+
+import pandas as pd
+import pytest
+
+from utils.attendance_analytics import employee_metrics, rollup, working_calendar, RECORD_FIELDS, EMPLOYEE_FIELDS
+
+START = date(2025, 3, 3)  # Monday
+END = date(2025, 3, 9)
+SHIFT_STARTS = {"morning": 540.0, "night": 1320.0}
+
+def _records(*rows):
+    return pd.DataFrame([dict(zip(RECORD_FIELDS, row)) for row in rows], columns=list(RECORD_FIELDS))
+
+def _employees(*rows):
+    return pd.DataFrame([
+        {"id": employee_id, "first_name": employee_id, "last_name": None, "department_id": department_id,
+         "branch_id": None, "date_of_joining": joined}
+        for employee_id, department_id, joined in rows
+    ], columns=list(EMPLOYEE_FIELDS))
+
+def _leaves(*rows):
+    return pd.DataFrame(rows, columns=["employee_id", "start_date", "end_date"])
+
+def _metrics(records, employees, leaves, start=START, end=END, until=None):
+    calendar = working_calendar(start, end, [0, 1, 2, 3, 4], [])
+    return employee_metrics(records, employees, leaves, calendar, start, "UTC", 8.0, SHIFT_STARTS, 10.0, until=until)
+
+def _at(day, hour, minute=0):
+    return datetime(2025, 3, day, hour, minute, tzinfo=timezone.utc)
+
+def test_night_shift_clock_in_after_midnight_is_late_not_early():
+    records = _records(
+        ("e1", _at(3, 22, 5), _at(4, 6), "night", "present", None),   # within the grace period
+        ("e1", _at(5, 0, 30), _at(5, 8), "night", "present", None),   # 150 minutes late, on the next day
+        ("e1", _at(5, 21, 50), _at(6, 6), "night", "present", None),  # early
+    )
+    metrics = _metrics(records, _employees(("e1", None, None)), _leaves())
+    row = metrics.loc["e1"]
+    assert (row["arrivals"], row["late_arrivals"]) == (3, 1)
+    assert row["late_minutes"] == pytest.approx(150)
+
+def test_leave_straddling_the_range_counts_only_days_inside_it():
+    leaves = _leaves(("e1", "2025-02-27", "2025-03-04"), ("e1", "2025-03-07", "2025-03-12"))
+    metrics = _metrics(_records(), _employees(("e1", None, None)), leaves)
+    # Mon and Tue, then Fri; the weekend is not a working day
+    assert metrics.loc["e1", "leave_days"] == 3
+    assert metrics.loc["e1", "absent_days"] == 2
+
+def test_joining_inside_the_range_limits_expected_days():
+    metrics = _metrics(_records(), _employees(("e1", None, "2025-03-05"), ("e2", None, "2020-01-01")), _leaves())
+    assert metrics.loc["e1", "expected_days"] == 3
+    assert metrics.loc["e2", "expected_days"] == 5
+
+def test_expected_days_stop_at_until():
+    employees = _employees(("e1", None, None))
+    records = _records(("e1", _at(3, 9), _at(3, 17), "morning", "present", None))
+    metrics = _metrics(records, employees, _leaves(("e1", "2025-03-06", "2025-03-06")), until=date(2025, 3, 4))
+    row = metrics.loc["e1"]
+    assert (row["expected_days"], row["leave_days"], row["absent_days"]) == (2, 0, 1)
+    assert _metrics(records, employees, _leaves(), until=date(2025, 3, 1)).loc["e1", "expected_days"] == 0
+
+def test_empty_range_rolls_up_to_nothing():
+    employees = _employees()
+    metrics = _metrics(_records(), employees, _leaves())
+    totals, rows = rollup(metrics, employees, "department", {})
+    assert rows == []
+    assert totals["employees"] == 0 and totals["absenteeism_rate"] == 0
+
+def test_rollup_counts_are_integers():
+    employees = _employees(("e1", "d1", None), ("e2", "d1", None), ("e3", None, None))
+    records = _records(
+        ("e1", _at(3, 9, 30), _at(3, 18), "morning", "present", None),
+        ("e2", _at(3, 9), _at(3, 17), "morning", "half_day", 4.0),
+    )
+    totals, rows = rollup(_metrics(records, employees, _leaves()), employees, "department", {"d1": "Sales"})
+    assert totals["employees"] == 3 and isinstance(totals["employees"], int)
+    sales = next(row for row in rows if row["group_id"] == "d1")
+    assert sales["name"] == "Sales"
+    for field in ("employees", "records", "arrivals", "late_arrivals"):
+        assert isinstance(sales[field], int), field
+    assert (sales["employees"], sales["records"], sales["late_arrivals"]) == (2, 2, 1)
+    assert sales["late_rate"] == 0.5
@@ -0,0 +1,26 @@
+from tests.helpers import create_company, create_employee, login, register, super_admin
+
+def _setup(client):
+    admin = super_admin(client)
+    company_id = create_company(client, admin)
+    ids = [create_employee(client, admin, company_id, code) for code in ("EMP", "OTHER")]
+    for employee_id in ids:
+        assert client.post("/api/attendance/clock-in", headers=admin, json={"employee_id": employee_id, "company_id": company_id}).status_code == 200
+    return company_id, ids
+
+def _year(client, headers, **params):
+    from datetime import date
+    return client.get("/api/attendance/rollups", headers=headers, params={"year": date.today().year, **params})
+
+def test_employee_sees_only_own_rollups(client):
+    company_id, (own_id, other_id) = _setup(client)
+    register(client, "emp@example.com", "employee", company_id, own_id)
+    employee = login(client, "emp@example.com")
+
+    assert [r["employee_id"] for r in _year(client, employee).json()] == [own_id]
+    assert [r["employee_id"] for r in _year(client, employee, employee_id=other_id).json()] == [own_id]
+
+def test_employee_without_profile_is_refused(client):
+    company_id, _ = _setup(client)
+    register(client, "nobody@example.com", "employee", company_id)
+    assert _year(client, login(client, "nobody@example.com")).status_code == 403
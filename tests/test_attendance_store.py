@@ -0,0 +1,50 @@
+import asyncio
+import json
+from datetime import date, timedelta
+
+import pytest
+from fastapi import Response
+from pydantic import BaseModel
+
+from utils.attendance_store import BucketStore
+from utils.codec import to_bson_date, utc_now
+from utils.pagination import PageParams, NEXT_CURSOR_HEADER
+
+class Record(BaseModel):
+    id: str
+    employee_id: str
+
+def _records():
+    records = []
+    for employee_id in ("e1", "e2"):
+        for offset in range(0, 60, 7):
+            day = date(2025, 3, 28) - timedelta(days=offset)
+            records.append({
+                "id": f"{employee_id}-{day}", "employee_id": employee_id, "company_id": "c1",
+                "date": to_bson_date(day), "status": "present", "created_at": utc_now(), "updated_at": utc_now(),
+            })
+    return records
+
+async def _pages(db, store, match, limit):
+    ids, cursor = [], None
+    while True:
+        response = await store.list(db, match, None, None, PageParams(limit=limit, cursor=cursor, stream=False), Response(), Record)
+        ids += [r["id"] for r in json.loads(response.body)]
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return ids
+
+def test_bucket_pages_follow_the_cursor_across_months():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    db = mongomock_motor.AsyncMongoMockClient()["nexushr_test"]
+    store = BucketStore()
+    records = _records()
+    # Written the way clock-in writes them; mongomock cannot run merge_operations' update pipeline
+    for record in records:
+        assert asyncio.run(store.clock_in(db, record))
+
+    expected = [r["id"] for r in sorted(records, key=lambda r: (r["date"], r["id"]), reverse=True)]
+    assert asyncio.run(_pages(db, store, {"company_id": "c1", "is_deleted": False}, 3)) == expected
+
+    own = [i for i in expected if i.startswith("e1-")]
+    assert asyncio.run(_pages(db, store, {"employee_id": "e1", "is_deleted": False}, 4)) == own
@@ -0,0 +1,73 @@
+from tests.helpers import create_company, create_employee, login, register, super_admin
+
+def _setup(client):
+    admin = super_admin(client)
+    company_id = create_company(client, admin)
+    employee_id = create_employee(client, admin, company_id, "EMP")
+    register(client, "emp@example.com", "employee", company_id, employee_id)
+    return admin, employee_id, login(client, "emp@example.com")
+
+def test_deleting_employee_revokes_issued_tokens(client):
+    admin, employee_id, employee = _setup(client)
+    assert client.get("/api/auth/me", headers=employee).status_code == 200
+
+    assert client.delete(f"/api/employees/{employee_id}", headers=admin).status_code == 204
+    assert client.get("/api/auth/me", headers=employee).status_code == 401
+    response = client.post("/api/auth/login", json={"email": "emp@example.com", "password": "password123"})
+    assert response.status_code != 200
+
+def test_employment_status_toggles_sign_in(client):
+    admin, employee_id, employee = _setup(client)
+
+    response = client.put(f"/api/employees/{employee_id}", headers=admin, json={"employment_status": "terminated"})
+    assert response.status_code == 200, response.text
+    assert client.get("/api/auth/me", headers=employee).status_code == 401
+
+    client.put(f"/api/employees/{employee_id}", headers=admin, json={"employment_status": "active"})
+    assert client.get("/api/auth/me", headers=employee).status_code == 200
+
+def test_role_change_applies_to_issued_tokens(client):
+    _, _, employee = _setup(client)
+    assert client.get("/api/webhooks", headers=employee).status_code == 403
+
+    client.portal.call(_promote, "emp@example.com")
+    assert client.get("/api/webhooks", headers=employee).status_code == 200
+
+async def _promote(email):
+    import utils.database as database
+    from utils.entity_cache import entity_cache, user_tag
+    db = database.get_database()
+    user = await db.users.find_one_and_update({"email": email}, {"$set": {"role": "company_admin"}})
+    await entity_cache.invalidate(user_tag(user["id"]))
+
+def test_deactivation_reaches_other_workers_through_events(client):
+    import utils.database as database
+    from utils.auth import decode_token_cached, subscribe_token_cache, token_cache
+    from utils.entity_cache import cached_user, on_entity_event
+    from utils.events import EventBus, EVENT_COLLECTION
+
+    admin, employee_id, employee = _setup(client)
+    user_id = client.get("/api/auth/me", headers=employee).json()["id"]
+    assert client.delete(f"/api/employees/{employee_id}", headers=admin).status_code == 204
+
+    async def other_worker():
+        db = database.get_database()
+        published = await db[EVENT_COLLECTION].find_one({"type": "user.updated", "entity_id": user_id})
+        # Another worker still holds the account as active and the token as verified
+        await db.users.update_one({"id": user_id}, {"$set": {"is_active": True}})
+        decode_token_cached(employee["Authorization"].split()[1])
+        stale = await cached_user(db, user_id)
+        await db.users.update_one({"id": user_id}, {"$set": {"is_active": False}})
+
+        bus = EventBus()
+        bus.subscribe(on_entity_event, ["user.updated"])
+        subscribe_token_cache(bus)
+        await bus.dispatch(published)
+        tokens = token_cache.delete_where(lambda _, payload: payload.get("sub") == user_id)
+        return published, stale, await cached_user(db, user_id), tokens
+
+    published, stale, fresh, tokens = client.portal.call(other_worker)
+    assert published["data"]["is_active"] is False
+    assert stale["is_active"] is True
+    assert fresh["is_active"] is False
+    assert tokens == 0
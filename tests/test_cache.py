@@ -0,0 +1,110 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from utils.cache import LocalBackend, RedisBackend, ReadThroughCache
+
+fakeredis = pytest.importorskip("fakeredis")
+
+class Loader:
+    def __init__(self, value, delay=0.0):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self.value
+
+def _workers(count=2):
+    """Caches of separate workers sharing one Redis server."""
+    server = fakeredis.FakeServer()
+    return server, [ReadThroughCache(RedisBackend(fakeredis.FakeAsyncRedis(server=server), "test"), 60) for _ in range(count)]
+
+def test_redis_serves_loaded_values_with_their_dates():
+    async def run():
+        _, (cache,) = _workers(1)
+        value = {"id": "e1", "created_at": datetime(2025, 3, 1, 9, 30, tzinfo=timezone.utc)}
+        loader = Loader(value)
+        assert await cache.get_or_load("employee:e1", ["employee:e1"], loader) == value
+        assert await cache.get_or_load("employee:e1", ["employee:e1"], loader) == value
+        assert loader.calls == 1
+        assert (cache.hits, cache.misses) == (1, 1)
+    asyncio.run(run())
+
+def test_tag_invalidation_reaches_every_worker():
+    async def run():
+        _, (first, second) = _workers()
+        loader = Loader({"id": "e1"})
+        await first.get_or_load("employee:e1", ["employee:e1", "company:c1"], loader)
+        await second.get_or_load("employee:e1", ["employee:e1", "company:c1"], loader)
+        assert loader.calls == 1
+
+        await second.invalidate("company:c1")
+        await first.get_or_load("employee:e1", ["employee:e1", "company:c1"], loader)
+        assert loader.calls == 2
+        # Unrelated tags leave the entry alone
+        await second.invalidate("company:c2")
+        await second.get_or_load("employee:e1", ["employee:e1", "company:c1"], loader)
+        assert loader.calls == 2
+    asyncio.run(run())
+
+def test_invalidation_during_a_load_wins():
+    async def run():
+        _, (first, second) = _workers()
+
+        async def stale():
+            await second.invalidate("employee:e1")
+            return {"id": "e1", "name": "old"}
+        await first.get_or_load("employee:e1", ["employee:e1"], stale)
+        fresh = Loader({"id": "e1", "name": "new"})
+        assert await first.get_or_load("employee:e1", ["employee:e1"], fresh) == {"id": "e1", "name": "new"}
+        assert fresh.calls == 1
+    asyncio.run(run())
+
+def test_missing_documents_are_not_cached():
+    async def run():
+        _, (cache,) = _workers(1)
+        loader = Loader(None)
+        assert await cache.get_or_load("employee:e1", ["employee:e1"], loader) is None
+        assert await cache.get_or_load("employee:e1", ["employee:e1"], loader) is None
+        assert loader.calls == 2
+    asyncio.run(run())
+
+def test_one_worker_loads_while_the_others_wait():
+    async def run():
+        _, (first, second) = _workers()
+        loader = Loader({"id": "e1"}, delay=0.2)
+        results = await asyncio.gather(
+            first.get_or_load("employee:e1", ["employee:e1"], loader),
+            second.get_or_load("employee:e1", ["employee:e1"], loader),
+        )
+        assert results == [{"id": "e1"}, {"id": "e1"}]
+        assert loader.calls == 1
+    asyncio.run(run())
+
+def test_redis_outage_falls_back_to_the_loader():
+    async def run():
+        server, (cache,) = _workers(1)
+        server.connected = False
+        loader = Loader({"id": "e1"})
+        assert await cache.get_or_load("employee:e1", ["employee:e1"], loader) == {"id": "e1"}
+        await cache.invalidate("employee:e1")
+        assert loader.calls == 1
+        assert cache.backend.errors > 0
+    asyncio.run(run())
+
+def test_local_backend_shares_concurrent_loads_and_honours_tags():
+    async def run():
+        cache = ReadThroughCache(LocalBackend(100, 60), 60)
+        loader = Loader({"id": "e1"}, delay=0.05)
+        await asyncio.gather(*[cache.get_or_load("employee:e1", ["employee:e1"], loader) for _ in range(5)])
+        assert loader.calls == 1
+
+        await cache.invalidate("employee:e1")
+        await cache.get_or_load("employee:e1", ["employee:e1"], loader)
+        assert loader.calls == 2
+    asyncio.run(run())
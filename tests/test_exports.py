@@ -0,0 +1,48 @@
+import asyncio
+import csv
+
+import pytest
+
+import utils.exports as exports
+from utils.codec import to_bson_date, utc_now
+
+def _job(kind, start, end):
+    return {
+        "id": f"job-{kind}", "company_id": "c1", "kind": kind, "format": "csv",
+        "start_date": to_bson_date(start), "end_date": to_bson_date(end), "status": "queued",
+        "created_at": utc_now(),
+    }
+
+def test_background_export_includes_legacy_string_dates_on_the_bounds(tmp_path, monkeypatch):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    monkeypatch.setattr(exports, "EXPORT_DIR", str(tmp_path))
+    db = mongomock_motor.AsyncMongoMockClient()["nexushr_test"]
+
+    async def run():
+        await db.attendance.insert_many([
+            {"id": f"a-{day}", "company_id": "c1", "employee_id": "e1", "date": day, "status": "present", "is_deleted": False}
+            for day in ("2024-12-31", "2025-01-01", "2025-01-15", "2025-01-31", "2025-02-01")
+        ])
+        await db.leaves.insert_many([
+            {"id": "ends-on-start", "company_id": "c1", "employee_id": "e1", "leave_type": "annual", "status": "approved",
+             "start_date": "2024-12-30", "end_date": "2025-01-01", "days_count": 3, "is_deleted": False},
+            {"id": "before", "company_id": "c1", "employee_id": "e1", "leave_type": "annual", "status": "approved",
+             "start_date": "2024-12-20", "end_date": "2024-12-31", "days_count": 8, "is_deleted": False},
+        ])
+        runner = exports.ExportRunner(1)
+        jobs = [_job("attendance", "2025-01-01", "2025-01-31"), _job("leaves", "2025-01-01", "2025-01-31")]
+        try:
+            for job in jobs:
+                await db.export_jobs.insert_one(dict(job))
+                await runner._run(db, job)
+        finally:
+            await runner.shutdown()
+        return [await db.export_jobs.find_one({"id": job["id"]}, {"_id": 0}) for job in jobs]
+
+    attendance, leaves = asyncio.run(run())
+    assert attendance["status"] == "completed", attendance.get("error")
+    with open(exports.export_path(attendance), newline="") as f:
+        assert sorted(row["id"] for row in csv.DictReader(f)) == ["a-2025-01-01", "a-2025-01-15", "a-2025-01-31"]
+    assert leaves["status"] == "completed", leaves.get("error")
+    with open(exports.export_path(leaves), newline="") as f:
+        assert [row["id"] for row in csv.DictReader(f)] == ["ends-on-start"]
@@ -0,0 +1,15 @@
+from tests.helpers import login, register, super_admin
+
+def test_health_check_is_public_and_minimal(client):
+    response = client.get("/api/health-check")
+    assert response.status_code == 200
+    assert "token_cache" not in response.json()
+
+def test_health_stats_are_for_super_admins(client):
+    root = super_admin(client)
+    register(client, "admin@example.com", "company_admin")
+    assert client.get("/api/health-check/stats").status_code in (401, 403)
+    assert client.get("/api/health-check/stats", headers=login(client, "admin@example.com")).status_code == 403
+    response = client.get("/api/health-check/stats", headers=root)
+    assert response.status_code == 200
+    assert set(response.json()) == {"token_cache", "org_cache", "entity_cache", "attendance_board"}
@@ -0,0 +1,47 @@
+from tests.helpers import create_company, create_employee, login, register, super_admin
+
+def _setup_team(client):
+    admin = super_admin(client)
+    company_id = create_company(client, admin)
+    manager_id = create_employee(client, admin, company_id, "MGR")
+    report_id = create_employee(client, admin, company_id, "REP", manager_id=manager_id)
+    outsider_id = create_employee(client, admin, company_id, "OUT")
+    register(client, "mgr@example.com", "manager", company_id, manager_id)
+    register(client, "rep@example.com", "employee", company_id, report_id)
+    return company_id, manager_id, report_id, outsider_id
+
+def _request_leave(client, headers, company_id, employee_id):
+    response = client.post("/api/leaves", headers=headers, json={
+        "company_id": company_id, "employee_id": employee_id, "leave_type": "unpaid",
+        "start_date": "2030-01-07", "end_date": "2030-01-08", "reason": "Personal",
+    })
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+def test_manager_sees_and_decides_report_leave(client):
+    company_id, _, report_id, outsider_id = _setup_team(client)
+    employee = login(client, "rep@example.com")
+    leave_id = _request_leave(client, employee, company_id, report_id)
+    other_leave_id = _request_leave(client, employee, company_id, outsider_id)
+
+    manager = login(client, "mgr@example.com")
+    inbox = client.get("/api/leaves/inbox", headers=manager)
+    assert inbox.status_code == 200
+    assert [leave["id"] for leave in inbox.json()] == [leave_id]
+
+    report = client.post("/api/leaves/decisions", headers=manager, json={"decisions": [
+        {"leave_id": leave_id, "status": "approved"},
+        {"leave_id": other_leave_id, "status": "approved"},
+    ]}).json()
+    assert report["approved"] == 1
+    assert report["errors"] == [{"leave_id": other_leave_id, "error": "Not one of your reports"}]
+
+def test_token_without_employee_claim_resolves_from_user_record(client):
+    from utils.auth import create_access_token
+
+    company_id, _, report_id, _ = _setup_team(client)
+    user = client.get("/api/auth/me", headers=login(client, "mgr@example.com")).json()
+    legacy = create_access_token({"sub": user["id"], "email": user["email"], "role": "manager", "company_id": company_id})
+    headers = {"Authorization": f"Bearer {legacy}"}
+    leave_id = _request_leave(client, headers, company_id, report_id)
+    assert [leave["id"] for leave in client.get("/api/leaves/inbox", headers=headers).json()] == [leave_id]
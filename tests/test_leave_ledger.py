@@ -0,0 +1,138 @@
+from tests.helpers import create_company, create_employee, login, register, super_admin
+
+def _setup(client):
+    admin = super_admin(client)
+    company_id = create_company(client, admin)
+    ids = [create_employee(client, admin, company_id, code) for code in ("EMP", "OTHER")]
+    register(client, "emp@example.com", "employee", company_id, ids[0])
+    return admin, company_id, ids
+
+def _allocate(client, headers, employee_id, days):
+    return client.post("/api/leaves/balance/allocate", headers=headers, json={
+        "employee_id": employee_id, "year": 2030, "leave_type": "annual", "days": days,
+    })
+
+def test_employee_reads_own_balance_and_ledger_only(client):
+    admin, _, (own_id, other_id) = _setup(client)
+    assert _allocate(client, admin, own_id, 10).status_code == 200
+    employee = login(client, "emp@example.com")
+
+    balances = client.get(f"/api/leaves/balance/{own_id}?year=2030", headers=employee)
+    assert balances.status_code == 200
+    assert balances.json()[0]["balance"] == 10
+    assert client.get(f"/api/leaves/ledger/{own_id}", headers=employee).status_code == 200
+    assert client.get(f"/api/leaves/balance/{other_id}", headers=employee).status_code == 403
+    assert client.get(f"/api/leaves/ledger/{other_id}", headers=employee).status_code == 403
+
+def test_negative_allocation_is_rejected(client):
+    admin, _, (own_id, _) = _setup(client)
+    assert _allocate(client, admin, own_id, -5).status_code == 422
+
+def test_credit_requires_posted_usage_and_applies_once(client):
+    import utils.database as database
+    from utils.leave_ledger import allocate, debit_leave, credit_leave, reconcile_balances
+
+    _, company_id, (own_id, _) = _setup(client)
+    leave = {"id": "leave-1", "employee_id": own_id, "company_id": company_id, "leave_type": "annual",
+             "days_count": 2, "start_date": "2030-03-04"}
+
+    async def scenario():
+        db = database.get_database()
+        await allocate(db, own_id, company_id, 2030, "annual", 10)
+        never_debited = await credit_leave(db, leave)
+        assert await debit_leave(db, leave)
+        first, second = await credit_leave(db, leave), await credit_leave(db, leave)
+        balance = await db.leave_balances.find_one({"employee_id": own_id, "year": 2030})
+        result = await reconcile_balances(db, company_id, 2030)
+        return never_debited, first, second, balance, result
+
+    never_debited, first, second, balance, result = client.portal.call(scenario)
+    assert (never_debited, first, second) == (False, True, False)
+    assert (balance["balance"], balance["used"]) == (10, 0)
+    assert result == {"posted_entries": 0, "corrected_balances": 0}
+
+def test_reconcile_posts_missing_usage_in_batches(client):
+    import utils.database as database
+    from utils.codec import to_bson_date
+    from utils.leave_ledger import allocate, reconcile_balances, LEDGER_COLLECTION
+
+    _, company_id, (own_id, _) = _setup(client)
+
+    async def scenario():
+        db = database.get_database()
+        await allocate(db, own_id, company_id, 2030, "annual", 20)
+        await db.leaves.insert_many([
+            {"id": f"leave-{i}", "employee_id": own_id, "company_id": company_id, "leave_type": "annual",
+             "days_count": 1, "start_date": to_bson_date("2030-02-01"), "status": "approved", "is_deleted": False}
+            for i in range(5)
+        ])
+        result = await reconcile_balances(db, company_id, 2030, batch_size=2)
+        usage = await db[LEDGER_COLLECTION].count_documents({"kind": "usage"})
+        balance = await db.leave_balances.find_one({"employee_id": own_id, "year": 2030})
+        return result, usage, balance["balance"]
+
+    result, usage, balance = client.portal.call(scenario)
+    assert result["posted_entries"] == 5
+    assert usage == 5
+    assert balance == 15
+
+def test_leave_without_allocation_is_approved_and_counted_later(client):
+    import utils.database as database
+    from utils.leave_ledger import allocate, debit_leave, reconcile_balances, LEDGER_COLLECTION
+
+    admin, company_id, (own_id, other_id) = _setup(client)
+    response = client.post("/api/leaves", headers=admin, json={
+        "company_id": company_id, "employee_id": own_id, "leave_type": "maternity",
+        "start_date": "2030-01-07", "end_date": "2030-01-08", "reason": "Birth",
+    })
+    assert response.status_code == 201, response.text
+    report = client.post("/api/leaves/decisions", headers=admin, json={"decisions": [
+        {"leave_id": response.json()["id"], "status": "approved"},
+    ]}).json()
+    assert report["approved"] == 1, report
+
+    leave = {"id": "leave-1", "employee_id": other_id, "company_id": company_id, "leave_type": "annual",
+             "days_count": 3, "start_date": "2030-03-04"}
+
+    async def scenario():
+        db = database.get_database()
+        debited = await debit_leave(db, leave)
+        untracked = await db.leave_balances.count_documents({})
+        result = await reconcile_balances(db, company_id, 2030)
+        usage = await db[LEDGER_COLLECTION].count_documents({"kind": "usage"})
+        balance = await allocate(db, other_id, company_id, 2030, "annual", 10)
+        return debited, untracked, result, usage, balance
+
+    debited, untracked, result, usage, balance = client.portal.call(scenario)
+    assert debited and untracked == 0
+    assert result["corrected_balances"] == 0
+    assert usage == 2
+    assert (balance["balance"], balance["used"]) == (7, 3)
+
+def test_allocated_balance_still_limits_approvals(client):
+    import utils.database as database
+    from utils.leave_ledger import allocate, debit_leave
+
+    _, company_id, (own_id, _) = _setup(client)
+    leave = {"id": "leave-1", "employee_id": own_id, "company_id": company_id, "leave_type": "annual",
+             "days_count": 3, "start_date": "2030-03-04"}
+
+    async def scenario():
+        db = database.get_database()
+        await allocate(db, own_id, company_id, 2030, "annual", 2)
+        return await debit_leave(db, leave)
+
+    assert client.portal.call(scenario) is False
+
+def test_reconcile_keeps_balances_equal_to_two_decimals(client):
+    import utils.database as database
+    from utils.leave_ledger import allocate, reconcile_balances
+
+    _, company_id, (own_id, _) = _setup(client)
+
+    async def scenario():
+        db = database.get_database()
+        await allocate(db, own_id, company_id, 2030, "annual", 2.3333)
+        return [await reconcile_balances(db, company_id, 2030) for _ in range(2)]
+
+    assert [result["corrected_balances"] for result in client.portal.call(scenario)] == [0, 0]
@@ -0,0 +1,31 @@
+import json
+
+from utils.pagination import PageParams, paginate_documents, NEXT_CURSOR_HEADER
+from pydantic import BaseModel
+from typing import Optional
+
+class Item(BaseModel):
+    id: str
+    created_at: Optional[str] = None
+
+def _page(docs, sort, limit, cursor=None):
+    response = paginate_documents(docs, sort, PageParams(limit=limit, cursor=cursor, stream=False), Item)
+    return [doc["id"] for doc in json.loads(response.body)], response.headers.get(NEXT_CURSOR_HEADER)
+
+def test_documents_missing_the_sort_field_sort_first_like_mongo():
+    docs = [
+        {"id": "c", "created_at": "2024-01-02T00:00:00+00:00"},
+        {"id": "b"},
+        {"id": "a", "created_at": "2024-01-01T00:00:00+00:00"},
+        {"id": "d", "created_at": None},
+    ]
+    assert _page(docs, ("created_at", 1), 10)[0] == ["b", "d", "a", "c"]
+    assert _page(docs, ("created_at", -1), 10)[0] == ["c", "a", "d", "b"]
+
+def test_cursor_pages_through_missing_values():
+    docs = [{"id": "a", "created_at": "2024-01-01T00:00:00+00:00"}, {"id": "b"}, {"id": "c"}]
+    first, cursor = _page(docs, ("created_at", 1), 1)
+    second, cursor = _page(docs, ("created_at", 1), 1, cursor)
+    third, cursor = _page(docs, ("created_at", 1), 1, cursor)
+    assert first + second + third == ["b", "c", "a"]
+    assert cursor is None
@@ -0,0 +1,179 @@
+import asyncio
+import json
+from datetime import timedelta
+
+import httpx
+import pytest
+from bson import ObjectId
+
+import utils.events as events
+from utils.codec import utc_now
+from tests.helpers import create_company, super_admin
+
+PUBLIC_URL = "https://93.184.216.34/hooks"
+
+@pytest.fixture
+def db():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    return mongomock_motor.AsyncMongoMockClient()["nexushr_test"]
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    async def sleep(_):
+        pass
+    monkeypatch.setattr(events.asyncio, "sleep", sleep)
+
+def _hook(hook_id, company_id="c1", event_types=(), url=PUBLIC_URL, **fields):
+    return {"id": hook_id, "company_id": company_id, "url": f"{url}/{hook_id}", "event_types": list(event_types),
+            "secret": f"secret-{hook_id}", "active": True, "failures": 0, "is_deleted": False, **fields}
+
+def _settled_events(*specs):
+    """Outbox documents old enough to be read, oldest first."""
+    docs = []
+    for i, (event_type, company_id) in enumerate(specs):
+        doc = events.event(event_type, company_id, f"entity-{i}", {"n": i})
+        doc["_id"] = ObjectId.from_datetime(utc_now() - timedelta(seconds=60 - i))
+        docs.append(doc)
+    return docs
+
+def _dispatcher(handler):
+    dispatcher = events.WebhookDispatcher()
+    dispatcher._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return dispatcher
+
+async def _start(db, dispatcher, docs):
+    """Take the lease positioned before `docs` and publish them."""
+    await dispatcher._lease(db)
+    await dispatcher._advance(db, ObjectId.from_datetime(utc_now() - timedelta(minutes=5)))
+    await db[events.EVENT_COLLECTION].insert_many(docs)
+
+def test_one_signed_delivery_per_matching_hook(db):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200)
+
+    async def run():
+        await db.webhooks.insert_many([
+            _hook("all"),
+            _hook("leaves", event_types=["leave.approved"]),
+            _hook("other-company", company_id="c2"),
+            _hook("inactive", active=False),
+        ])
+        dispatcher = _dispatcher(handler)
+        await _start(db, dispatcher, _settled_events(("employee.updated", "c1"), ("leave.approved", "c1")))
+        await dispatcher.step(db)
+        await dispatcher.stop()
+        return await db.webhooks.find_one({"id": "all"})
+
+    hook = asyncio.run(run())
+    by_hook = {request.url.path.rsplit("/", 1)[1]: request for request in requests}
+    assert sorted(by_hook) == ["all", "leaves"]
+    for hook_id, request in by_hook.items():
+        assert request.headers[events.SIGNATURE_HEADER] == events.sign(f"secret-{hook_id}", request.content)
+    assert [e["type"] for e in json.loads(by_hook["all"].content)["events"]] == ["employee.updated", "leave.approved"]
+    assert [e["type"] for e in json.loads(by_hook["leaves"].content)["events"]] == ["leave.approved"]
+    assert hook["last_delivery_at"] is not None
+
+def test_position_does_not_advance_when_a_post_raises(db):
+    async def run():
+        await db.webhooks.insert_one(_hook("all"))
+        dispatcher = _dispatcher(lambda request: httpx.Response(200))
+        docs = _settled_events(("employee.updated", "c1"))
+        await _start(db, dispatcher, docs)
+        before = (await db.event_cursors.find_one({"_id": events.WebhookDispatcher.consumer}))["position"]
+
+        async def broken(*args):
+            raise RuntimeError("database unavailable")
+        dispatcher._post = broken
+        with pytest.raises(RuntimeError):
+            await dispatcher.step(db)
+        after = (await db.event_cursors.find_one({"_id": events.WebhookDispatcher.consumer}))["position"]
+        await dispatcher.stop()
+        return before, after, docs[-1]["_id"]
+
+    before, after, last = asyncio.run(run())
+    assert after == before != last
+
+@pytest.mark.parametrize("status_code, attempts", [(404, 1), (429, 3), (503, 3)])
+def test_retries_only_transient_failures(db, monkeypatch, status_code, attempts):
+    monkeypatch.setattr(events, "WEBHOOK_MAX_ATTEMPTS", 3)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(status_code)
+
+    async def run():
+        await db.webhooks.insert_one(_hook("all"))
+        dispatcher = _dispatcher(handler)
+        await _start(db, dispatcher, _settled_events(("employee.updated", "c1")))
+        await dispatcher.step(db)
+        await dispatcher.stop()
+        return await db.webhooks.find_one({"id": "all"})
+
+    hook = asyncio.run(run())
+    assert len(calls) == attempts
+    assert hook["failures"] == 1 and hook["last_error"] == f"HTTP {status_code}"
+
+def test_hook_is_disabled_after_repeated_failures(db, monkeypatch):
+    monkeypatch.setattr(events, "WEBHOOK_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(events, "WEBHOOK_DISABLE_AFTER", 2)
+
+    def handler(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    async def run():
+        await db.webhooks.insert_one(_hook("all"))
+        dispatcher = _dispatcher(handler)
+        await _start(db, dispatcher, _settled_events(("employee.updated", "c1"), ("employee.updated", "c1")))
+        states = []
+        for doc in await db[events.EVENT_COLLECTION].find().sort("_id", 1).to_list(None):
+            await dispatcher.deliver(db, [doc])
+            states.append(await db.webhooks.find_one({"id": "all"}))
+        await dispatcher.stop()
+        return states
+
+    first, second = asyncio.run(run())
+    assert (first["failures"], first["active"]) == (1, True)
+    assert (second["failures"], second["active"]) == (2, False)
+    assert second["last_error"].startswith("ConnectError")
+
+def test_lease_is_taken_over_only_once_expired(db):
+    async def run():
+        first, second = events.WebhookDispatcher(), events.WebhookDispatcher()
+        held = await first._lease(db)
+        refused = await second._lease(db)
+        await db.event_cursors.update_one({"_id": events.WebhookDispatcher.consumer}, {"$set": {"lease_until": utc_now() - timedelta(seconds=1)}})
+        taken = await second._lease(db)
+        lost = await first._lease(db)
+        return held, refused, taken, lost, second._owner
+
+    held, refused, taken, lost, second_owner = asyncio.run(run())
+    assert held is not None and refused is None and lost is None
+    assert taken["owner"] == second_owner
+
+def test_private_urls_are_refused(client):
+    admin = super_admin(client)
+    company_id = create_company(client, admin)
+    for url in ("http://127.0.0.1:8001/hook", "http://10.0.0.5/hook", "http://169.254.169.254/latest", "http://[::1]/hook"):
+        response = client.post("/api/webhooks", headers=admin, json={"url": url, "company_id": company_id})
+        assert response.status_code == 400, url
+    response = client.post("/api/webhooks", headers=admin, json={"url": PUBLIC_URL, "company_id": company_id})
+    assert response.status_code == 201, response.text
+
+def test_delivery_skips_hosts_that_became_private(db):
+    calls = []
+
+    async def run():
+        await db.webhooks.insert_one(_hook("internal", url="http://127.0.0.1:9000"))
+        dispatcher = _dispatcher(lambda request: calls.append(request) or httpx.Response(200))
+        await _start(db, dispatcher, _settled_events(("employee.updated", "c1")))
+        await dispatcher.step(db)
+        await dispatcher.stop()
+        return await db.webhooks.find_one({"id": "internal"})
+
+    hook = asyncio.run(run())
+    assert calls == []
+    assert hook["failures"] == 1 and "private" in hook["last_error"]